@@ -0,0 +1,232 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+from .database import get_db_connection
+from .metrics import AI_ADMISSION_REJECTIONS, AI_ADMISSION_WAIT
+
+# Upstream generations per worker process; more wait in a bounded FIFO queue
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", "32"))
+AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "10"))
+
+# Per-client token bucket for requests that reach the upstream; 0 disables
+AI_RATE_LIMIT_PER_MINUTE = float(os.getenv("AI_RATE_LIMIT_PER_MINUTE", "20"))
+AI_RATE_LIMIT_BURST = int(os.getenv("AI_RATE_LIMIT_BURST", "5"))
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away instead of waiting for the upstream."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class ConcurrencyLimiter:
+    """Caps concurrent upstream generations and queues a bounded number of callers.
+
+    Callers beyond max_concurrent wait in FIFO order for up to queue_timeout
+    seconds; once max_queue are waiting, further callers are rejected at
+    once with a Retry-After estimated from recent generation times.
+    """
+
+    def __init__(self, max_concurrent: int = AI_MAX_CONCURRENCY, max_queue: int = AI_MAX_QUEUE,
+                 queue_timeout: float = AI_QUEUE_TIMEOUT):
+        if max_concurrent < 1:
+            raise ValueError("AI_MAX_CONCURRENCY must be at least 1")
+
+        self.max_concurrent = max_concurrent
+        self.max_queue = max(max_queue, 0)
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+
+        self._admitted = 0
+        self._queued = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        # Moving average of how long a generation holds its slot
+        self._service_avg: Optional[float] = None
+
+    def retry_after(self) -> float:
+        """Seconds until a slot is likely to free up for a new caller."""
+        service = self._service_avg if self._service_avg is not None else 1.0
+        return max(1.0, service * (len(self._waiters) + 1) / self.max_concurrent)
+
+    def load(self) -> float:
+        """Active plus queued generations as a fraction of the concurrency limit."""
+        return (self._active + len(self._waiters)) / self.max_concurrent
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self._acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - start
+            self._service_avg = held if self._service_avg is None else 0.8 * self._service_avg + 0.2 * held
+            self._release()
+
+    async def _acquire(self) -> None:
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._admit(0.0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self._rejected += 1
+            AI_ADMISSION_REJECTIONS.inc(reason="queue_full")
+            raise AdmissionRejected(503, "AI generation queue is full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queued += 1
+        start = time.monotonic()
+        try:
+            # A releasing caller hands its slot over by resolving the future
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self._timed_out += 1
+            AI_ADMISSION_REJECTIONS.inc(reason="queue_timeout")
+            raise AdmissionRejected(503, "Timed out waiting for an AI generation slot", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled
+                self._release()
+            else:
+                self._discard(waiter)
+            raise
+        self._admit(time.monotonic() - start)
+
+    def _admit(self, waited: float) -> None:
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        AI_ADMISSION_WAIT.observe(waited)
+
+    def _discard(self, waiter: "asyncio.Future[None]") -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "maxConcurrent": self.max_concurrent,
+            "maxQueue": self.max_queue,
+            "queueTimeout": self.queue_timeout,
+            "active": self._active,
+            "queueDepth": len(self._waiters),
+            "admitted": self._admitted,
+            "queued": self._queued,
+            "rejectedQueueFull": self._rejected,
+            "timedOut": self._timed_out,
+            "waitSecondsTotal": round(self._wait_total, 6),
+            "waitSecondsAvg": round(self._wait_total / self._admitted, 6) if self._admitted else 0.0,
+            "waitSecondsMax": round(self._wait_max, 6),
+            "serviceSecondsAvg": round(self._service_avg or 0.0, 6)
+        }
+
+class TokenBucketLimiter:
+    """Per-client token buckets stored in SQLite, so every worker process shares them.
+
+    Each client may make `burst` requests at once, refilled at
+    `per_minute` per minute. Methods block on SQLite, so call them through
+    run_in_db_executor.
+    """
+
+    # Forget full buckets every this many acquisitions (per process)
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, per_minute: float = AI_RATE_LIMIT_PER_MINUTE, burst: int = AI_RATE_LIMIT_BURST):
+        self.per_minute = per_minute
+        self.burst = max(burst, 1)
+        self.rate = per_minute / 60.0
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, client: str) -> float:
+        """Take a token for `client`; return 0 if allowed, else seconds until one is available."""
+        if not self.enabled:
+            return 0.0
+
+        now = time.time()
+        params = {"client": client, "now": now, "rate": self.rate, "burst": self.burst}
+        with get_db_connection() as conn:
+            # Refill and take a token in one statement; no row comes back when
+            # the bucket is empty
+            taken = conn.execute("""
+                INSERT INTO rate_limits (client, tokens, updated_at) VALUES (:client, :burst - 1, :now)
+                ON CONFLICT(client) DO UPDATE SET
+                    tokens = MIN(:burst, tokens + (:now - updated_at) * :rate) - 1,
+                    updated_at = :now
+                WHERE MIN(:burst, tokens + (:now - updated_at) * :rate) >= 1
+                RETURNING tokens
+            """, params).fetchone()
+
+            wait = 0.0
+            if taken is None:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limits WHERE client = ?", (client,)
+                ).fetchone()
+                available = min(self.burst, row["tokens"] + (now - row["updated_at"]) * self.rate)
+                wait = max((1 - available) / self.rate, 0.001)
+
+            with self._lock:
+                if taken is None:
+                    self._limited += 1
+                else:
+                    self._allowed += 1
+                cleanup = (self._allowed + self._limited) % self.CLEANUP_EVERY == 0
+            if cleanup:
+                # A bucket idle long enough to refill is the same as no bucket
+                conn.execute("DELETE FROM rate_limits WHERE updated_at < ?", (now - self.burst / self.rate,))
+            conn.commit()
+
+        if taken is None:
+            AI_ADMISSION_REJECTIONS.inc(reason="rate_limited")
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "perMinute": self.per_minute,
+                "burst": self.burst,
+                "allowed": self._allowed,
+                "limited": self._limited
+            }
+
+def retry_after_header(seconds: float) -> str:
+    """Format a Retry-After value in whole seconds, rounding up."""
+    return str(max(1, math.ceil(seconds)))
+
+# Global instance - lazy initialization
+rate_limiter = None
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    global rate_limiter
+    if rate_limiter is None:
+        rate_limiter = TokenBucketLimiter()
+    return rate_limiter
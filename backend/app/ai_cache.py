@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from .database import get_db_connection
+from .shot_codec import decode_shots, encode_shots
+
+# Cache tuning
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "86400"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "10000"))
+AI_CACHE_MEMORY_ENTRIES = int(os.getenv("AI_CACHE_MEMORY_ENTRIES", "1000"))
+# Distinct cached results kept per request; a hit returns one of them at random
+AI_CACHE_VARIANTS = int(os.getenv("AI_CACHE_VARIANTS", "1"))
+
+def make_cache_key(sport: str, purpose: str, num_shots: int,
+                   min_distance: Optional[float] = None,
+                   max_distance: Optional[float] = None) -> str:
+    """Key identifying equivalent generation requests."""
+    normalized = [
+        sport.strip().lower(),
+        " ".join(purpose.lower().split()),
+        num_shots,
+        float(min_distance) if min_distance is not None else None,
+        float(max_distance) if max_distance is not None else None
+    ]
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+class AIResultCache:
+    """Two-tier cache of AI generation results: in-memory LRU over a SQLite table.
+
+    Methods block on SQLite, so call them through run_in_db_executor.
+    """
+
+    def __init__(self, ttl: float = AI_CACHE_TTL, max_entries: int = AI_CACHE_MAX_ENTRIES,
+                 memory_entries: int = AI_CACHE_MEMORY_ENTRIES, variants: int = AI_CACHE_VARIANTS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.variants = max(variants, 1)
+        
+        # key -> list of (created_at, encoded shots), one per variant
+        self._memory: "OrderedDict[str, List[Tuple[float, bytes]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "memoryHits": 0,
+            "diskHits": 0,
+            "misses": 0,
+            "bypasses": 0,
+            "stores": 0,
+            "evictions": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def record_bypass(self) -> None:
+        self._count("bypasses")
+
+    def _remember(self, key: str, variants: List[Tuple[float, bytes]]) -> None:
+        with self._lock:
+            self._memory[key] = variants
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _pick(self, variants: List[Tuple[float, bytes]]) -> Optional[List[Dict[str, Any]]]:
+        """Pick a random fresh variant once all variants have been collected."""
+        cutoff = time.time() - self.ttl
+        fresh = [shots for created_at, shots in variants if created_at > cutoff]
+        if len(fresh) < self.variants:
+            return None
+        return decode_shots(random.choice(fresh))
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return cached shots for a request key, or None on a miss."""
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            variants = self._memory.get(key)
+            if variants is not None:
+                self._memory.move_to_end(key)
+        
+        if variants is not None:
+            shots = self._pick(variants)
+            if shots is not None:
+                self._count("memoryHits")
+                return shots
+        
+        now = time.time()
+        with get_db_connection() as conn:
+            rows = conn.execute("""
+                SELECT created_at, shots FROM ai_cache
+                WHERE key = ? AND created_at > ?
+                ORDER BY variant
+            """, (key, now - self.ttl)).fetchall()
+            
+            if len(rows) >= self.variants:
+                conn.execute("UPDATE ai_cache SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+        
+        variants = [(row["created_at"], row["shots"]) for row in rows]
+        shots = self._pick(variants)
+        if shots is None:
+            self._count("misses")
+            return None
+        
+        self._remember(key, variants)
+        self._count("diskHits")
+        return shots
+
+    def store(self, key: str, shots: List[Dict[str, Any]]) -> None:
+        """Add a generation result, replacing the oldest variant once all slots are full."""
+        if not self.enabled:
+            return
+        
+        now = time.time()
+        encoded = encode_shots(shots)
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            rows = cursor.execute(
+                "SELECT variant, created_at FROM ai_cache WHERE key = ? ORDER BY variant", (key,)
+            ).fetchall()
+            used = {row["variant"] for row in rows}
+            free = [variant for variant in range(self.variants) if variant not in used]
+            if free:
+                variant = free[0]
+            else:
+                variant = min(rows, key=lambda row: row["created_at"])["variant"]
+            
+            cursor.execute("""
+                INSERT OR REPLACE INTO ai_cache (key, variant, shots, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, variant, encoded, now, now))
+            
+            # Drop expired entries and trim to the size bound, least recently used first
+            cursor.execute("DELETE FROM ai_cache WHERE created_at <= ?", (now - self.ttl,))
+            evicted = cursor.rowcount
+            cursor.execute("""
+                DELETE FROM ai_cache WHERE rowid IN (
+                    SELECT rowid FROM ai_cache
+                    ORDER BY last_used
+                    LIMIT max((SELECT COUNT(*) FROM ai_cache) - ?, 0)
+                )
+            """, (self.max_entries,))
+            evicted += cursor.rowcount
+            
+            variants = [
+                (row["created_at"], row["shots"])
+                for row in cursor.execute(
+                    "SELECT created_at, shots FROM ai_cache WHERE key = ? ORDER BY variant", (key,)
+                )
+            ]
+            conn.commit()
+        
+        self._remember(key, variants)
+        self._count("stores")
+        if evicted:
+            self._count("evictions", evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memoryEntries"] = len(self._memory)
+        stats.update({
+            "ttl": self.ttl,
+            "maxEntries": self.max_entries,
+            "variants": self.variants
+        })
+        return stats
+
+# Global instance - lazy initialization
+ai_cache = None
+
+def get_ai_cache() -> AIResultCache:
+    global ai_cache
+    if ai_cache is None:
+        ai_cache = AIResultCache()
+    return ai_cache
@@ -1,70 +1,213 @@
+import asyncio
+import email.utils
 import json
 import os
+import random
+import re
+import time
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from .models import Shot
+from .generator import GenerationError, check_feasibility
+from .repair import RepairError, repair_next_shot, repair_sequence
+from .court import SHOT_STATES
+from .stream_parser import IncrementalArrayParser
+from .metrics import (
+    AI_PARSE_FAILURES, AI_UPSTREAM_DURATION, AI_UPSTREAM_REQUESTS, AI_UPSTREAM_RETRIES,
+    record_usage, upstream_outcome
+)
+from .admission import AdmissionRejected, ConcurrencyLimiter
+from .hedging import HedgePolicy
 
 class AIGenerationError(Exception):
     """Custom exception for AI generation errors"""
     pass
 
+class AIUpstreamError(AIGenerationError):
+    """The Messages API was unavailable, rate limited or failed after retries."""
+
+    def __init__(self, message: str, status_code: int = 502, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+# Upstream statuses worth retrying: rate limited, overloaded or briefly unavailable
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+# Failures before the request was sent or answered, safe to retry
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+# Sport-specific context and terminology, compiled into each sport's system prompt
+SPORT_CONTEXTS: Dict[str, Dict[str, Any]] = {
+    "badminton": {
+        "court_description": "badminton court with forecourt (front), midcourt (mid), and backcourt (back) areas",
+        "shot_types": "clear, drop, smash, net shot, drive, lift",
+        "tactical_concepts": "attacking from the back, net play, deception, court coverage",
+        "space_description": "Space 1 and Space 2 represent the two halves of the court separated by the net",
+        "shot_constraints": {
+            "smash": "Smashes are powerful attacking shots that typically cannot land in the front court (Front, Mid Front positions). They usually land in Mid, Mid Back, or Back positions due to their steep downward trajectory.",
+            "clear": "Clears are defensive/neutral shots hit high and deep, typically landing in Back or Mid Back positions",
+            "drop": "Drop shots are finesse shots that can land anywhere but are most effective in Mid Front and Front positions",
+            "net": "Net shots must land in Front or Mid Front positions by nature of the shot",
+            "drive": "Drives are fast, flat shots typically landing in Mid to Mid Back positions",
+            "lift": "Lifts are defensive shots from the front court, usually targeting Back or Mid Back positions"
+        }
+    },
+    "tennis": {
+        "court_description": "tennis court with baseline (back), service boxes (mid), and net area (front)",
+        "shot_types": "groundstroke, volley, serve, approach shot, passing shot, lob",
+        "tactical_concepts": "baseline rallies, net approaches, court positioning, point construction",
+        "space_description": "Space 1 and Space 2 represent the two halves of the court separated by the net"
+    },
+    "volleyball": {
+        "court_description": "volleyball court with back row (back), middle (mid), and front row (front) positions",
+        "shot_types": "spike, set, dig, serve, block, tip",
+        "tactical_concepts": "attack patterns, defensive positioning, rotation systems",
+        "space_description": "Space 1 and Space 2 represent the two halves of the court separated by the net"
+    },
+    "table_tennis": {
+        "court_description": "table tennis table with back (far from net), middle, and front (near net) areas",
+        "shot_types": "topspin, backspin, sidespin, smash, push, flick",
+        "tactical_concepts": "spin variation, placement, speed control, footwork patterns",
+        "space_description": "Space 1 and Space 2 represent the two halves of the table separated by the net"
+    },
+    "pickleball": {
+        "court_description": "pickleball court with baseline (back), non-volley zone/kitchen (mid), and net area (front)",
+        "shot_types": "dink, drive, lob, drop shot, volley, serve, third shot drop",
+        "tactical_concepts": "soft game at kitchen, power from baseline, court positioning, patience",
+        "space_description": "Space 1 and Space 2 represent the two halves of the court separated by the net"
+    }
+}
+
 class ClaudeAIService:
-    def __init__(self):
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
+    def __init__(self, api_key: Optional[str] = None, api_url: Optional[str] = None):
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable is required")
         
-        self.api_url = "https://api.anthropic.com/v1/messages"
+        # Overridable so the service can run against a local stub server
+        self.api_url = api_url or os.getenv("ANTHROPIC_API_URL", "https://api.anthropic.com/v1/messages")
         self.model = "claude-sonnet-4-20250514"  # Using Claude Sonnet 4
         
+        # Upstream connection pool settings
+        self.timeout = float(os.getenv("AI_TIMEOUT", "30"))
+        self.max_connections = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = int(os.getenv("AI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+        self.keepalive_expiry = float(os.getenv("AI_KEEPALIVE_EXPIRY", "60"))
+        self.http2 = _env_flag("AI_HTTP2")
+        if self.http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("AI_HTTP2 requested but the 'h2' package is not installed; using HTTP/1.1")
+                self.http2 = False
+        
+        # Upstream calls per generation when responses cannot be repaired
+        self.max_attempts = max(int(os.getenv("AI_MAX_ATTEMPTS", "2")), 1)
+        
+        # Retries of rate-limited, overloaded or dropped requests; an
+        # upstream Retry-After longer than the max delay is passed to the client
+        self.upstream_retries = max(int(os.getenv("AI_UPSTREAM_RETRIES", "2")), 0)
+        self.retry_base_delay = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))
+        self.retry_max_delay = float(os.getenv("AI_RETRY_MAX_DELAY", "10"))
+        
+        # Bounds concurrent generations so bursts queue instead of piling upstream
+        self.limiter = ConcurrencyLimiter()
+        # Sends a second request when the first is slower than usual
+        self.hedging = HedgePolicy()
+        
+        self._client: Optional[httpx.AsyncClient] = None
+        self._requests = 0
+        self._in_flight = 0
+        self._retries = 0
+        self._responses = 0
+        self._repaired_responses = 0
+        self._repaired_shots = 0
+        self._parse_failures = 0
+        self._input_tokens = 0
+        self._cache_read_tokens = 0
+        self._cache_creation_tokens = 0
+        
         # Valid positions
         self.horizontal_positions = ['Left', 'Center Left', 'Center', 'Center Right', 'Right']
         self.depth_positions = ['Back', 'Mid Back', 'Mid', 'Mid Front', 'Front']
+        
+        # The static part of each sport's prompt is built once and sent as a
+        # system block the upstream can cache; requests only add a short tail
+        self.prompt_cache = _env_flag("AI_PROMPT_CACHE", "true")
+        self._system_prompts = {sport: self._compile_system_prompt(sport) for sport in SPORT_CONTEXTS}
 
-    def get_sport_context(self, sport: str) -> Dict[str, Any]:
-        """Get sport-specific context and terminology"""
-        contexts = {
-            "badminton": {
-                "court_description": "badminton court with forecourt (front), midcourt (mid), and backcourt (back) areas",
-                "shot_types": "clear, drop, smash, net shot, drive, lift",
-                "tactical_concepts": "attacking from the back, net play, deception, court coverage",
-                "space_description": "Space 1 and Space 2 represent the two halves of the court separated by the net",
-                "shot_constraints": {
-                    "smash": "Smashes are powerful attacking shots that typically cannot land in the front court (Front, Mid Front positions). They usually land in Mid, Mid Back, or Back positions due to their steep downward trajectory.",
-                    "clear": "Clears are defensive/neutral shots hit high and deep, typically landing in Back or Mid Back positions",
-                    "drop": "Drop shots are finesse shots that can land anywhere but are most effective in Mid Front and Front positions",
-                    "net": "Net shots must land in Front or Mid Front positions by nature of the shot",
-                    "drive": "Drives are fast, flat shots typically landing in Mid to Mid Back positions",
-                    "lift": "Lifts are defensive shots from the front court, usually targeting Back or Mid Back positions"
+    async def start(self) -> None:
+        """Open the shared upstream client (called from the app lifespan)."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                headers={
+                    "Content-Type": "application/json",
+                    "x-api-key": self.api_key,
+                    "anthropic-version": "2023-06-01"
                 }
-            },
-            "tennis": {
-                "court_description": "tennis court with baseline (back), service boxes (mid), and net area (front)",
-                "shot_types": "groundstroke, volley, serve, approach shot, passing shot, lob",
-                "tactical_concepts": "baseline rallies, net approaches, court positioning, point construction",
-                "space_description": "Space 1 and Space 2 represent the two halves of the court separated by the net"
-            },
-            "volleyball": {
-                "court_description": "volleyball court with back row (back), middle (mid), and front row (front) positions",
-                "shot_types": "spike, set, dig, serve, block, tip",
-                "tactical_concepts": "attack patterns, defensive positioning, rotation systems",
-                "space_description": "Space 1 and Space 2 represent the two halves of the court separated by the net"
-            },
-            "table_tennis": {
-                "court_description": "table tennis table with back (far from net), middle, and front (near net) areas",
-                "shot_types": "topspin, backspin, sidespin, smash, push, flick",
-                "tactical_concepts": "spin variation, placement, speed control, footwork patterns",
-                "space_description": "Space 1 and Space 2 represent the two halves of the table separated by the net"
-            },
-            "pickleball": {
-                "court_description": "pickleball court with baseline (back), non-volley zone/kitchen (mid), and net area (front)",
-                "shot_types": "dink, drive, lob, drop shot, volley, serve, third shot drop",
-                "tactical_concepts": "soft game at kitchen, power from baseline, court positioning, patience",
-                "space_description": "Space 1 and Space 2 represent the two halves of the court separated by the net"
-            }
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            await self.start()
+        return self._client
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Upstream connection pool usage for tuning the pool limits."""
+        stats = {
+            "apiUrl": self.api_url,
+            "http2": self.http2,
+            "maxConnections": self.max_connections,
+            "maxKeepaliveConnections": self.max_keepalive_connections,
+            "keepaliveExpiry": self.keepalive_expiry,
+            "requests": self._requests,
+            "inFlight": self._in_flight,
+            "retries": self._retries,
+            "connections": 0,
+            "idleConnections": 0
         }
         
-        return contexts.get(sport.lower(), contexts["badminton"])  # Default to badminton
+        # httpx does not expose its pool publicly; read httpcore's if present
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idleConnections"] = sum(1 for conn in connections if conn.is_idle())
+        
+        return stats
+
+    def get_sport_context(self, sport: str) -> Dict[str, Any]:
+        """Get sport-specific context and terminology"""
+        return SPORT_CONTEXTS.get(sport.lower(), SPORT_CONTEXTS["badminton"])  # Default to badminton
 
     def _format_shot_constraints(self, sport_context: Dict[str, Any]) -> str:
         """Format sport-specific shot constraints for the prompt"""
@@ -78,29 +221,18 @@ class ClaudeAIService:
         
         return "\n".join(formatted)
 
-    def create_generation_prompt(self, sport: str, purpose: str, num_shots: int, 
-                                min_distance: Optional[float] = None, 
-                                max_distance: Optional[float] = None) -> str:
-        """Create a sport-specific prompt for shot sequence generation"""
-        
+    def get_system_prompt(self, sport: str) -> str:
+        """The static, per-sport part of the prompt (precompiled at startup)."""
+        sport = sport.lower()
+        if sport not in self._system_prompts:
+            sport = "badminton"
+        return self._system_prompts[sport]
+
+    def _compile_system_prompt(self, sport: str) -> str:
+        """Build everything in the prompt that does not depend on the request."""
         sport_context = self.get_sport_context(sport)
         
-        distance_constraint = ""
-        if min_distance is not None or max_distance is not None:
-            min_dist = min_distance if min_distance is not None else 0
-            max_dist = max_distance if max_distance is not None else "unlimited"
-            distance_constraint = f"""
-IMPORTANT DISTANCE CONSTRAINTS:
-- Each consecutive shot must be between {min_dist} and {max_dist} grid units apart
-- Distance is calculated using Euclidean distance on a 5x10 continuous grid
-- Space 1: coordinates (0-4, 0-4) where y=4 is front
-- Space 2: coordinates (0-4, 5-9) where y=5 is front (flipped layout)
-- Consider distance carefully when selecting positions
-"""
-
-        prompt = f"""You are an expert {sport} coach creating a strategic shot sequence for training purposes.
-
-TRAINING OBJECTIVE: {purpose}
+        return f"""You are an expert {sport} coach creating strategic shot sequences for training purposes.
 
 SPORT CONTEXT: 
 - Sport: {sport}
@@ -112,11 +244,10 @@ SPORT CONTEXT:
 SPORT-SPECIFIC SHOT CONSTRAINTS:
 {self._format_shot_constraints(sport_context)}
 
-SEQUENCE REQUIREMENTS:
-- Generate exactly {num_shots} shots
+SEQUENCE RULES:
 - Shots must alternate between Space 1 and Space 2 (starting with Space 1)
 - Each shot must have valid positions from the allowed lists below
-- IMPORTANT: Respect sport-specific shot constraints above when selecting positions{distance_constraint}
+- IMPORTANT: Respect sport-specific shot constraints above when selecting positions
 
 POSITION SYSTEM:
 Horizontal positions: {', '.join(self.horizontal_positions)}
@@ -135,7 +266,7 @@ Left CL C CR Right Left CL C CR Right
 ```
 
 STRATEGIC CONSIDERATIONS:
-Based on the training objective "{purpose}", create a sequence that:
+Based on the training objective you are given, create a sequence that:
 1. Supports the specific training goal
 2. Creates realistic {sport} patterns
 3. Provides appropriate challenge progression
@@ -151,11 +282,32 @@ Example format:
 [
   {{"horizontal": "Center", "depth": "Back", "space": 1}},
   {{"horizontal": "Left", "depth": "Front", "space": 2}}
-]
+]"""
 
-Generate the sequence now:"""
+    def create_generation_prompt(self, sport: str, purpose: str, num_shots: int, 
+                                min_distance: Optional[float] = None, 
+                                max_distance: Optional[float] = None) -> str:
+        """Create the per-request part of the prompt, sent after the sport's system prompt"""
+        
+        distance_constraint = ""
+        if min_distance is not None or max_distance is not None:
+            min_dist = min_distance if min_distance is not None else 0
+            max_dist = max_distance if max_distance is not None else "unlimited"
+            distance_constraint = f"""
 
-        return prompt
+IMPORTANT DISTANCE CONSTRAINTS:
+- Each consecutive shot must be between {min_dist} and {max_dist} grid units apart
+- Distance is calculated using Euclidean distance on a 5x10 continuous grid
+- Space 1: coordinates (0-4, 0-4) where y=4 is front
+- Space 2: coordinates (0-4, 5-9) where y=5 is front (flipped layout)
+- Consider distance carefully when selecting positions"""
+
+        return f"""TRAINING OBJECTIVE: {purpose}
+
+SEQUENCE REQUIREMENTS:
+- Generate exactly {num_shots} shots{distance_constraint}
+
+Generate the sequence now:"""
 
     async def generate_sequence(self, sport: str, purpose: str, num_shots: int,
                               min_distance: Optional[float] = None,
@@ -165,108 +317,401 @@ Generate the sequence now:"""
         if not (1 <= num_shots <= 100):
             raise AIGenerationError("Number of shots must be between 1 and 100")
         
+        # Don't spend an upstream call on constraints no sequence can satisfy
+        try:
+            check_feasibility(num_shots, min_distance, max_distance)
+        except GenerationError as e:
+            raise AIGenerationError(str(e))
+        
         prompt = self.create_generation_prompt(sport, purpose, num_shots, min_distance, max_distance)
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 2000,
-                        "messages": [
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ]
-                    }
-                )
+            async with self.limiter.slot():
+                return await self._generate_with_attempts(sport, prompt, num_shots, min_distance, max_distance)
+        except (AIGenerationError, AdmissionRejected):
+            raise
+        except httpx.TimeoutException:
+            raise AIUpstreamError("Request to AI service timed out", status_code=504)
+        except httpx.RequestError as e:
+            raise AIUpstreamError(f"Network error: {str(e)}")
+        except Exception as e:
+            raise AIGenerationError(f"Failed to generate sequence: {str(e)}")
+
+    async def _generate_with_attempts(self, sport: str, prompt: str, num_shots: int,
+                                      min_distance: Optional[float],
+                                      max_distance: Optional[float]) -> List[Shot]:
+        """Request completions until one can be used, hedging a slow one.
+
+        A request still outstanding after the hedge delay gets one identical
+        request alongside it, if the hedge budget allows. The first response
+        that parses wins and the others are cancelled. An unusable response
+        costs another attempt only once nothing else is in flight. Hedges
+        share the generation's admission slot.
+        """
+        loop = asyncio.get_running_loop()
+        started: Dict["asyncio.Task[str]", float] = {}
+        hedges = set()
+        
+        def launch() -> "asyncio.Task[str]":
+            task = asyncio.create_task(self._request_completion(sport, prompt))
+            started[task] = loop.time()
+            return task
+        
+        self.hedging.start_request()
+        pending = {launch()}
+        attempts = 1
+        can_hedge = self.hedging.enabled
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                timeout = None
+                if can_hedge:
+                    oldest = min(started[task] for task in pending)
+                    timeout = max(oldest + self.hedging.delay() - loop.time(), 0.0)
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
                 
-                if response.status_code != 200:
-                    raise AIGenerationError(f"API request failed: {response.status_code} - {response.text}")
+                if not done:
+                    # Nothing back within the hedge delay
+                    can_hedge = False
+                    if self.hedging.try_hedge():
+                        hedge = launch()
+                        hedges.add(hedge)
+                        pending.add(hedge)
+                    continue
                 
-                result = response.json()
-                content = result["content"][0]["text"]
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    self.hedging.observe(loop.time() - started[task])
+                    
+                    # Parse the response, repairing it locally where possible
+                    try:
+                        shots_data = self._parse_and_validate_response(
+                            task.result(), num_shots, min_distance, max_distance
+                        )
+                    except ValueError as e:
+                        self._parse_failures += 1
+                        AI_PARSE_FAILURES.inc(mode="complete")
+                        last_error = e
+                        continue
+                    
+                    if hedges:
+                        self.hedging.finish_hedge(task in hedges)
+                    # Convert to Shot objects
+                    return [Shot(**shot) for shot in shots_data]
                 
-                # Parse and validate the JSON response
-                shots_data = self._parse_and_validate_response(content, num_shots)
+                # Only an unusable response costs another upstream call
+                if not pending and isinstance(last_error, ValueError) and attempts < self.max_attempts:
+                    attempts += 1
+                    pending.add(launch())
+        finally:
+            for task in pending:
+                # A cancelled request took at least this long. A losing hedge
+                # only ran since the hedge delay, so its time says nothing
+                # about upstream latency and would drag the delay down.
+                if task not in hedges:
+                    self.hedging.observe(loop.time() - started[task])
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        if hedges:
+            self.hedging.finish_hedge(False)
+        if last_error is None or isinstance(last_error, ValueError):
+            raise AIGenerationError(f"Failed to generate sequence: {str(last_error)}")
+        raise last_error
+
+    def _build_payload(self, sport: str, prompt: str, stream: bool = False) -> Dict[str, Any]:
+        system = {"type": "text", "text": self.get_system_prompt(sport)}
+        if self.prompt_cache:
+            system["cache_control"] = {"type": "ephemeral"}
+        payload = {
+            "model": self.model,
+            "max_tokens": 2000,
+            "system": [system],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def _request_completion(self, sport: str, prompt: str) -> str:
+        """Send one Messages API request and return the response text."""
+        response, start = await self._send(self._build_payload(sport, prompt), mode="complete")
+        self._record_upstream("complete", "ok", start)
+        
+        result = response.json()
+        self._record_usage(result.get("usage"))
+        return result["content"][0]["text"]
+
+    async def _send(self, payload: Dict[str, Any], mode: str, stream: bool = False):
+        """POST to the Messages API, retrying rate limits, overloads and dropped connections.
+
+        Returns the 200 response (still open when streaming) and the time its
+        attempt started. Failed attempts are recorded here; the caller
+        records the successful one once it has been read.
+        """
+        client = await self._get_client()
+        self._in_flight += 1
+        try:
+            for retry in range(self.upstream_retries + 1):
+                self._requests += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.send(
+                        client.build_request("POST", self.api_url, json=payload), stream=stream
+                    )
+                except asyncio.CancelledError:
+                    # A hedge that lost, or a client that went away
+                    self._record_upstream(mode, "cancelled", start)
+                    raise
+                except httpx.RequestError as e:
+                    outcome = upstream_outcome(error=e)
+                    self._record_upstream(mode, outcome, start)
+                    if retry < self.upstream_retries and isinstance(e, RETRYABLE_ERRORS):
+                        await self._wait_before_retry(mode, outcome, self._backoff_delay(retry))
+                        continue
+                    raise
                 
-                # Convert to Shot objects
-                shots = [Shot(**shot) for shot in shots_data]
+                if response.status_code == 200:
+                    return response, start
                 
-                return shots
+                if stream:
+                    await response.aread()
+                    await response.aclose()
+                outcome = upstream_outcome(response.status_code)
+                self._record_upstream(mode, outcome, start)
                 
-        except httpx.TimeoutException:
-            raise AIGenerationError("Request to AI service timed out")
-        except httpx.RequestError as e:
-            raise AIGenerationError(f"Network error: {str(e)}")
-        except Exception as e:
-            raise AIGenerationError(f"Failed to generate sequence: {str(e)}")
+                retry_after = _parse_retry_after(response.headers.get("retry-after"))
+                if (retry < self.upstream_retries and response.status_code in RETRYABLE_STATUS
+                        and (retry_after is None or retry_after <= self.retry_max_delay)):
+                    delay = self._backoff_delay(retry) if retry_after is None else retry_after + random.uniform(0, self.retry_base_delay)
+                    await self._wait_before_retry(mode, outcome, delay)
+                    continue
+                
+                raise self._upstream_error(response, retry_after)
+        finally:
+            self._in_flight -= 1
+
+    def _backoff_delay(self, retry: int) -> float:
+        """Exponential backoff with full jitter, so retrying callers spread out."""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** retry))
+
+    async def _wait_before_retry(self, mode: str, outcome: str, delay: float) -> None:
+        self._retries += 1
+        AI_UPSTREAM_RETRIES.inc(mode=mode, outcome=outcome)
+        await asyncio.sleep(delay)
+
+    @staticmethod
+    def _upstream_error(response: httpx.Response, retry_after: Optional[float]) -> AIUpstreamError:
+        message = f"API request failed: {response.status_code} - {response.text}"
+        if response.status_code in (429, 503, 529):
+            # Upstream is rate limiting or overloaded: tell the client to come back later
+            return AIUpstreamError(message, status_code=503, retry_after=retry_after)
+        if response.status_code in (408, 504):
+            return AIUpstreamError(message, status_code=504)
+        return AIUpstreamError(message, status_code=502)
+
+    def _record_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        """Count token usage, keeping prompt cache totals for /stats."""
+        record_usage(usage)
+        if usage:
+            self._input_tokens += usage.get("input_tokens") or 0
+            self._cache_read_tokens += usage.get("cache_read_input_tokens") or 0
+            self._cache_creation_tokens += usage.get("cache_creation_input_tokens") or 0
+
+    @staticmethod
+    def _record_upstream(mode: str, outcome: str, start: float) -> None:
+        AI_UPSTREAM_REQUESTS.inc(mode=mode, outcome=outcome)
+        AI_UPSTREAM_DURATION.observe(time.perf_counter() - start, mode=mode, outcome=outcome)
+
+    async def stream_sequence(self, sport: str, purpose: str, num_shots: int,
+                              min_distance: Optional[float] = None,
+                              max_distance: Optional[float] = None) -> AsyncIterator[Shot]:
+        """Generate a shot sequence, yielding each shot as soon as the model produces it.
 
-    def _parse_and_validate_response(self, content: str, expected_shots: int) -> List[Dict[str, Any]]:
-        """Parse and validate the AI response"""
+        The upstream response is streamed and run through an incremental JSON
+        array parser; each shot is repaired against the previous one as it
+        arrives. Missing shots are filled in locally once the stream ends.
+        """
+        if not (1 <= num_shots <= 100):
+            raise AIGenerationError("Number of shots must be between 1 and 100")
+        
         try:
-            # Try to extract JSON from the response
-            content = content.strip()
-            
-            # Find JSON array in the response
-            start_idx = content.find('[')
-            end_idx = content.rfind(']') + 1
-            
-            if start_idx == -1 or end_idx == 0:
-                raise ValueError("No JSON array found in response")
-            
-            json_str = content[start_idx:end_idx]
-            shots_data = json.loads(json_str)
-            
-            if not isinstance(shots_data, list):
-                raise ValueError("Response must be a JSON array")
+            check_feasibility(num_shots, min_distance, max_distance)
+        except GenerationError as e:
+            raise AIGenerationError(str(e))
+        
+        prompt = self.create_generation_prompt(sport, purpose, num_shots, min_distance, max_distance)
+        parser = IncrementalArrayParser()
+        previous_state = None
+        emitted = 0
+        changed = 0
+        
+        try:
+            async with self.limiter.slot():
+                response, start = await self._send(
+                    self._build_payload(sport, prompt, stream=True), mode="stream", stream=True
+                )
+                self._in_flight += 1
+                outcome = "stream_error"
+                try:
+                    async for text in self._iter_stream_text(response):
+                        for raw_shot in parser.feed(text):
+                            previous_state, repaired = repair_next_shot(
+                                raw_shot, emitted, previous_state, num_shots, min_distance, max_distance
+                            )
+                            changed += repaired
+                            emitted += 1
+                            yield Shot(**SHOT_STATES[previous_state])
+                            if emitted == num_shots:
+                                break
+                        # Stop reading (and paying for) tokens once we have every shot
+                        if emitted == num_shots:
+                            break
+                    outcome = "ok"
+                except httpx.RequestError as e:
+                    outcome = upstream_outcome(error=e)
+                    raise
+                except (asyncio.CancelledError, GeneratorExit):
+                    # The client went away before the upstream stream finished
+                    outcome = "cancelled"
+                    raise
+                finally:
+                    await response.aclose()
+                    self._in_flight -= 1
+                    self._record_upstream("stream", outcome, start)
             
-            if len(shots_data) != expected_shots:
-                raise ValueError(f"Expected {expected_shots} shots, got {len(shots_data)}")
+            if emitted == 0:
+                self._parse_failures += 1
+                AI_PARSE_FAILURES.inc(mode="stream")
             
-            # Validate each shot
-            for i, shot in enumerate(shots_data):
-                self._validate_shot(shot, i + 1)
-                
-                # Check space alternation
-                expected_space = (i % 2) + 1
-                if shot.get("space") != expected_space:
-                    raise ValueError(f"Shot {i + 1}: Expected space {expected_space}, got {shot.get('space')}")
+            # Pad a short or truncated response locally
+            while emitted < num_shots:
+                previous_state, _ = repair_next_shot(
+                    None, emitted, previous_state, num_shots, min_distance, max_distance
+                )
+                changed += 1
+                emitted += 1
+                yield Shot(**SHOT_STATES[previous_state])
             
-            return shots_data
+            self._responses += 1
+            if changed:
+                self._repaired_responses += 1
+                self._repaired_shots += changed
+        
+        except (AIGenerationError, AdmissionRejected):
+            raise
+        except httpx.TimeoutException:
+            raise AIUpstreamError("Request to AI service timed out", status_code=504)
+        except httpx.RequestError as e:
+            raise AIUpstreamError(f"Network error: {str(e)}")
+        except RepairError as e:
+            raise AIGenerationError(f"Failed to generate sequence: {str(e)}")
+
+    async def _iter_stream_text(self, response: httpx.Response) -> AsyncIterator[str]:
+        """Yield text deltas from a Messages API server-sent event stream."""
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            try:
+                event = json.loads(line[5:].strip())
+            except json.JSONDecodeError:
+                continue
             
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in response: {str(e)}")
-        except Exception as e:
-            raise ValueError(f"Response validation failed: {str(e)}")
+            if event.get("type") == "content_block_delta":
+                delta = event.get("delta", {})
+                if delta.get("type") == "text_delta":
+                    yield delta.get("text", "")
+            elif event.get("type") == "message_start":
+                # Output tokens are counted from the final message_delta instead
+                usage = dict(event.get("message", {}).get("usage") or {})
+                usage.pop("output_tokens", None)
+                self._record_usage(usage)
+            elif event.get("type") == "message_delta":
+                self._record_usage({"output_tokens": (event.get("usage") or {}).get("output_tokens")})
+            elif event.get("type") == "error":
+                error = event.get("error", {})
+                raise AIGenerationError(f"API stream error: {error.get('message', error)}")
 
-    def _validate_shot(self, shot: Dict[str, Any], shot_number: int) -> None:
-        """Validate a single shot object"""
-        required_fields = ["horizontal", "depth", "space"]
+    def _extract_shots(self, content: str) -> List[Any]:
+        """Pull the list of shot objects out of the response text."""
+        content = content.strip()
         
-        for field in required_fields:
-            if field not in shot:
-                raise ValueError(f"Shot {shot_number}: Missing required field '{field}'")
+        # Find JSON array in the response
+        start_idx = content.find('[')
+        end_idx = content.rfind(']') + 1
         
-        horizontal = shot["horizontal"]
-        depth = shot["depth"]
-        space = shot["space"]
+        if start_idx == -1 or end_idx <= start_idx:
+            # Possibly truncated; salvage whatever complete objects there are
+            json_str = content[start_idx:] if start_idx != -1 else content
+        else:
+            json_str = content[start_idx:end_idx]
+            try:
+                shots_data = json.loads(json_str)
+            except json.JSONDecodeError:
+                shots_data = None
+            if isinstance(shots_data, list):
+                return shots_data
         
-        if horizontal not in self.horizontal_positions:
-            raise ValueError(f"Shot {shot_number}: Invalid horizontal position '{horizontal}'")
+        # Fall back to parsing each flat {...} object on its own
+        shots_data = []
+        for match in re.findall(r"\{[^{}]*\}", json_str):
+            try:
+                shots_data.append(json.loads(match))
+            except json.JSONDecodeError:
+                continue
         
-        if depth not in self.depth_positions:
-            raise ValueError(f"Shot {shot_number}: Invalid depth position '{depth}'")
+        if not shots_data:
+            raise ValueError("No JSON array found in response")
+        return shots_data
+
+    def _parse_and_validate_response(self, content: str, expected_shots: int,
+                                     min_distance: Optional[float] = None,
+                                     max_distance: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Parse the AI response and repair it into a valid sequence.
+
+        Raises ValueError only if no usable shots could be extracted.
+        """
+        shots_data = self._extract_shots(content)
         
-        if space not in [1, 2]:
-            raise ValueError(f"Shot {shot_number}: Invalid space '{space}', must be 1 or 2")
+        try:
+            shots, changed = repair_sequence(shots_data, expected_shots, min_distance, max_distance)
+        except RepairError as e:
+            raise ValueError(f"Response validation failed: {str(e)}")
+        
+        self._responses += 1
+        if changed:
+            self._repaired_responses += 1
+            self._repaired_shots += changed
+        
+        return shots
+
+    def generation_stats(self) -> Dict[str, Any]:
+        return {
+            "responses": self._responses,
+            "repairedResponses": self._repaired_responses,
+            "repairedShots": self._repaired_shots,
+            "parseFailures": self._parse_failures
+        }
+
+    def prompt_cache_stats(self) -> Dict[str, Any]:
+        """Input token split between uncached, cache-read and cache-write tokens."""
+        prompt_tokens = self._input_tokens + self._cache_read_tokens + self._cache_creation_tokens
+        return {
+            "enabled": self.prompt_cache,
+            "inputTokens": self._input_tokens,
+            "cacheReadTokens": self._cache_read_tokens,
+            "cacheCreationTokens": self._cache_creation_tokens,
+            "cacheReadRatio": round(self._cache_read_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+            "systemPromptChars": {sport: len(prompt) for sport, prompt in self._system_prompts.items()}
+        }
 
 # Global instance - lazy initialization
 ai_service = None
@@ -275,4 +720,38 @@ def get_ai_service():
     global ai_service
     if ai_service is None:
         ai_service = ClaudeAIService()
-    return ai_service
\ No newline at end of file
+    return ai_service
+
+async def start_ai_service() -> Optional[ClaudeAIService]:
+    """Create the service and its pooled client if an API key is configured."""
+    try:
+        service = get_ai_service()
+    except ValueError as e:
+        print(f"AI service disabled: {e}")
+        return None
+    await service.start()
+    return service
+
+def get_ai_pool_stats() -> Optional[Dict[str, Any]]:
+    """Upstream pool stats, or None if the AI service was never created."""
+    return ai_service.pool_stats() if ai_service is not None else None
+
+def get_ai_generation_stats() -> Optional[Dict[str, Any]]:
+    return ai_service.generation_stats() if ai_service is not None else None
+
+def get_ai_prompt_cache_stats() -> Optional[Dict[str, Any]]:
+    return ai_service.prompt_cache_stats() if ai_service is not None else None
+
+def get_ai_hedging_stats() -> Optional[Dict[str, Any]]:
+    """Hedged request stats, or None if the service was never created."""
+    return ai_service.hedging.stats() if ai_service is not None else None
+
+def get_ai_admission_stats() -> Optional[Dict[str, Any]]:
+    """Upstream concurrency limiter and queue stats, or None if the service was never created."""
+    return ai_service.limiter.stats() if ai_service is not None else None
+
+async def close_ai_service() -> None:
+    global ai_service
+    if ai_service is not None:
+        await ai_service.close()
+        ai_service = None
\ No newline at end of file
@@ -0,0 +1,49 @@
+from typing import Dict, Tuple, Any
+
+# Valid positions, in grid order (index = grid coordinate)
+HORIZONTAL_POSITIONS = ['Left', 'Center Left', 'Center', 'Center Right', 'Right']
+DEPTH_POSITIONS = ['Back', 'Mid Back', 'Mid', 'Mid Front', 'Front']
+SPACES = [1, 2]
+
+# Every shot is one of 5 x 5 x 2 = 50 states, numbered
+# (space - 1) * 25 + horizontal_index * 5 + depth_index
+STATES_PER_SPACE = len(HORIZONTAL_POSITIONS) * len(DEPTH_POSITIONS)
+NUM_STATES = STATES_PER_SPACE * len(SPACES)
+
+_HORIZONTAL_INDEX = {name: i for i, name in enumerate(HORIZONTAL_POSITIONS)}
+_DEPTH_INDEX = {name: i for i, name in enumerate(DEPTH_POSITIONS)}
+
+def shot_to_state(shot: Dict[str, Any]) -> int:
+    """Map a shot dict to its state number. Raises ValueError for invalid shots."""
+    try:
+        horizontal = _HORIZONTAL_INDEX[shot["horizontal"]]
+        depth = _DEPTH_INDEX[shot["depth"]]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid shot position: {shot!r}")
+    
+    space = shot.get("space")
+    if space not in SPACES:
+        raise ValueError(f"Invalid shot space: {shot!r}")
+    
+    return (space - 1) * STATES_PER_SPACE + horizontal * len(DEPTH_POSITIONS) + depth
+
+def state_space(state: int) -> int:
+    return state // STATES_PER_SPACE + 1
+
+def state_grid(state: int) -> Tuple[int, int]:
+    """Return the (x, y) grid coordinates of a state within its own space."""
+    within = state % STATES_PER_SPACE
+    return within // len(DEPTH_POSITIONS), within % len(DEPTH_POSITIONS)
+
+# Shot dicts for every state, indexed by state number
+SHOT_STATES = tuple(
+    {
+        "horizontal": HORIZONTAL_POSITIONS[state_grid(state)[0]],
+        "depth": DEPTH_POSITIONS[state_grid(state)[1]],
+        "space": state_space(state)
+    }
+    for state in range(NUM_STATES)
+)
+
+def state_to_shot(state: int) -> Dict[str, Any]:
+    return dict(SHOT_STATES[state])
@@ -1,154 +1,1020 @@
+import asyncio
+import base64
+import binascii
+import functools
 import json
 import uuid
 import os
+import queue
 import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Set, Tuple, Union
+from .court import shot_to_state
+from .metrics import time_db_query
+from .models import MAX_SEQUENCE_SHOTS, VALID_SPORTS
+from .shot_codec import ShotCodecError, decode_shots, decode_states, encode_shots, encode_states, states_to_shots
 
 # SQLite database setup
 DATA_DIR = os.getenv("DATA_DIR", ".")
 os.makedirs(DATA_DIR, exist_ok=True)
 DATABASE_PATH = os.path.join(DATA_DIR, "sequences.db")
 
-def init_database():
-    """Initialize the database with required tables."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+# Connection pool tuning
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "128"))
+# One executor thread per pooled connection so threads never queue on the pool
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE)))
+
+# Shots per sequence_chunks row; editing one shot rewrites only its chunk
+SEQUENCE_CHUNK_SHOTS = int(os.getenv("SEQUENCE_CHUNK_SHOTS", "64"))
+# Shots included with a sequence; the rest are read a page at a time
+SEQUENCE_FIRST_PAGE_SHOTS = int(os.getenv("SEQUENCE_FIRST_PAGE_SHOTS", "100"))
+
+if DB_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"Invalid DB_SYNCHRONOUS value: {DB_SYNCHRONOUS}")
+if SEQUENCE_CHUNK_SHOTS < 1:
+    raise ValueError("SEQUENCE_CHUNK_SHOTS must be at least 1")
+if SEQUENCE_FIRST_PAGE_SHOTS < 1:
+    raise ValueError("SEQUENCE_FIRST_PAGE_SHOTS must be at least 1")
+
+# shot_transitions rows counting first shots use this as the previous state,
+# and rows for the model over every sport use this sport
+START_STATE = -1
+ALL_SPORTS = ""
+
+# Chunk keys are spaced this far apart so a full chunk can be split
+# without renumbering the chunks after it
+CHUNK_KEY_GAP = 1 << 20
+# sequences.shots of rows whose shots live in sequence_chunks; legacy rows
+# with positions the codec cannot represent keep their JSON text there
+CHUNKED_SHOTS = b""
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+    pass
+
+class ShotPatchError(ValueError):
+    """Raised for shot edits that cannot be applied to a sequence"""
+    pass
+
+def _connect() -> sqlite3.Connection:
+    """Open a new tuned SQLite connection."""
+    conn = sqlite3.connect(
+        DATABASE_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # Pooled connections move between threads
+        cached_statements=DB_STATEMENT_CACHE_SIZE,
+        # Implicit write transactions take the write lock up front, so with
+        # several worker processes they wait on busy_timeout instead of
+        # failing with SQLITE_BUSY when upgrading a read lock
+        isolation_level="IMMEDIATE"
+    )
+    conn.row_factory = sqlite3.Row
     
+    # WAL lets readers proceed while a writer holds the lock
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    # Negative cache_size is in KiB rather than pages
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections."""
+
+    def __init__(self, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        if size < 1:
+            raise ValueError("Connection pool size must be at least 1")
+        
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        
+        # Checkout statistics for sizing the pool
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, opening a new one while under the size limit."""
+        started = time.perf_counter()
+        conn = None
+        blocked = False
+        
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    conn = _connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+        
+        if conn is None:
+            blocked = True
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeoutError(
+                    f"No database connection available after {self.timeout}s (pool size {self.size})"
+                )
+        
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            if blocked:
+                self._waits += 1
+            if waited > self._wait_max:
+                self._wait_max = waited
+        
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool, discarding any open transaction."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # The connection is unusable; drop it and let the pool reopen one
+            with self._lock:
+                self._in_use -= 1
+                self._opened -= 1
+            conn.close()
+            return
+        
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "inUse": self._in_use,
+                "idle": self._opened - self._in_use,
+                "checkouts": checkouts,
+                "waitedCheckouts": self._waits,
+                "timeouts": self._timeouts,
+                "waitSecondsTotal": round(self._wait_total, 6),
+                "waitSecondsAvg": round(self._wait_total / checkouts, 6) if checkouts else 0.0,
+                "waitSecondsMax": round(self._wait_max, 6)
+            }
+
+# Global pool - lazy initialization
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def close_pool() -> None:
+    """Close pooled connections (called on application shutdown)."""
+    if _pool is not None:
+        _pool.close()
+
+# Bounded executor for running blocking queries off the event loop
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_db_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=DB_EXECUTOR_WORKERS,
+                    thread_name_prefix="sequence-db"
+                )
+    return _executor
+
+def shutdown_db_executor() -> None:
+    """Wait for in-flight queries and stop the executor threads."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """Run a blocking database call on the DB executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+
+def get_pool_stats() -> Dict[str, Any]:
+    return get_pool().stats()
+
+def _migrate_total_shots(cursor: sqlite3.Cursor) -> None:
+    """Promote totalShots to a column and index the listing order."""
+    cursor.execute("ALTER TABLE sequences ADD COLUMN total_shots INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE sequences SET total_shots = json_array_length(shots)")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sequences_created_at
+        ON sequences (created_at DESC, id DESC)
+    """)
+
+def _migrate_binary_shots(cursor: sqlite3.Cursor) -> None:
+    """Re-encode JSON shot lists with the compact binary shot codec."""
+    rows = cursor.execute("SELECT id, shots FROM sequences WHERE typeof(shots) = 'text'").fetchall()
+    
+    encoded = []
+    for row in rows:
+        try:
+            encoded.append((encode_shots(json.loads(row["shots"])), row["id"]))
+        except (ShotCodecError, ValueError):
+            # Leave rows with positions the codec cannot represent as JSON
+            continue
+    
+    cursor.executemany("UPDATE sequences SET shots = ? WHERE id = ?", encoded)
+
+def _migrate_ai_cache(cursor: sqlite3.Cursor) -> None:
+    """Add the persistent tier of the AI result cache."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ai_cache (
+            key TEXT NOT NULL,
+            variant INTEGER NOT NULL,
+            shots BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (key, variant)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache (last_used)")
+
+def _migrate_table_versions(cursor: sqlite3.Cursor) -> None:
+    """Keep a version counter that every write to sequences bumps (for list ETags)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES ('sequences', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS sequences_version_{event.lower()}
+            AFTER {event} ON sequences
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = 'sequences';
+            END
+        """)
+
+def _migrate_rate_limits(cursor: sqlite3.Cursor) -> None:
+    """Add per-client token buckets, shared by every worker process."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            client TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+def _migrate_ai_pool(cursor: sqlite3.Cursor) -> None:
+    """Add the warm pool of pre-generated AI sequences and the demand that sizes it."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ai_pool (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL,
+            shots BLOB NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_pool_key ON ai_pool(key, id)")
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sequences (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            shots TEXT NOT NULL,
-            settings TEXT,
-            metadata TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        CREATE TABLE IF NOT EXISTS ai_pool_demand (
+            key TEXT PRIMARY KEY,
+            sport TEXT NOT NULL,
+            purpose TEXT NOT NULL,
+            num_shots INTEGER NOT NULL,
+            min_distance REAL,
+            max_distance REAL,
+            score REAL NOT NULL,
+            updated_at REAL NOT NULL
         )
     """)
+
+def _migrate_shot_transitions(cursor: sqlite3.Cursor) -> None:
+    """Add shot transition counts for the local generator, backfilled from saved sequences."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shot_transitions (
+            sport TEXT NOT NULL,
+            from_state INTEGER NOT NULL,
+            to_state INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (sport, from_state, to_state)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES ('shot_transitions', 0)")
+    
+    # The only full scan: from here on every write updates the counts
+    counts = Counter()
+    for row in cursor.execute("SELECT shots, settings FROM sequences"):
+        counts.update(_transition_counts(row["shots"], row["settings"]))
+    _train_transitions(cursor, counts)
+
+def _migrate_sequence_chunks(cursor: sqlite3.Cursor) -> None:
+    """Move encoded shot lists into fixed-size chunks that can be rewritten one at a time."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sequence_chunks (
+            sequence_id TEXT NOT NULL,
+            chunk INTEGER NOT NULL,
+            states BLOB NOT NULL,
+            PRIMARY KEY (sequence_id, chunk)
+        ) WITHOUT ROWID
+    """)
     
-    conn.commit()
-    conn.close()
+    rows = cursor.execute("SELECT id, shots FROM sequences WHERE typeof(shots) = 'blob'").fetchall()
+    for row in rows:
+        _write_chunks(cursor, row["id"], decode_states(row["shots"]))
+    cursor.execute("UPDATE sequences SET shots = ? WHERE typeof(shots) = 'blob'", (CHUNKED_SHOTS,))
+
+# Schema migrations, applied in order; the schema version is PRAGMA user_version
+MIGRATIONS = [
+    _migrate_total_shots,
+    _migrate_binary_shots,
+    _migrate_ai_cache,
+    _migrate_table_versions,
+    _migrate_rate_limits,
+    _migrate_ai_pool,
+    _migrate_shot_transitions,
+    _migrate_sequence_chunks,
+]
+
+def init_database():
+    """Initialize the database with required tables and apply pending migrations.
+
+    Uses its own connection rather than the pool, so it can run in a
+    process that later forks (the gunicorn master) without handing open
+    connections to the workers.
+    """
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        
+        # Every worker calls this at import; skip the write lock once migrated
+        if cursor.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS):
+            return
+        
+        # Serialize concurrent initializers on the write lock
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        # Baseline schema; later changes (such as shots holding a codec BLOB) are migrations
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sequences (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                shots TEXT NOT NULL,
+                settings TEXT,
+                metadata TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for migration in MIGRATIONS[version:]:
+            migration(cursor)
+        cursor.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        
+        conn.commit()
+    finally:
+        conn.close()
 
 def get_db_connection():
-    """Get a database connection with row factory."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Check out a pooled database connection (use as a context manager)."""
+    return get_pool().connection()
+
+def check_database() -> float:
+    """Run a trivial query against the sequences table, returning its duration in seconds."""
+    start = time.perf_counter()
+    with get_db_connection() as conn:
+        conn.execute("SELECT 1 FROM sequences LIMIT 1").fetchall()
+    return time.perf_counter() - start
+
+def encode_cursor(created_at: str, sequence_id: str) -> str:
+    """Encode a listing position as an opaque keyset cursor."""
+    raw = f"{created_at}|{sequence_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a keyset cursor into (created_at, id). Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, sequence_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid pagination cursor")
+    return created_at, sequence_id
+
+# Maximum IDs bound into a single IN (...) query
+BATCH_QUERY_SIZE = 500
+
+def _stored_states(shots: Union[bytes, str, List[Dict]]) -> List[int]:
+    """State numbers of a shot list, given as dicts or as a stored shots column."""
+    if isinstance(shots, bytes):
+        return list(decode_states(shots))
+    if isinstance(shots, str):
+        shots = json.loads(shots)
+    return [shot_to_state(shot) for shot in shots]
+
+def _sequence_sport(settings: Union[None, str, Dict]) -> Optional[str]:
+    """The known sport a sequence's settings name, if any."""
+    if isinstance(settings, str):
+        settings = json.loads(settings)
+    sport = (settings or {}).get("sport")
+    if isinstance(sport, str) and sport.strip().lower() in VALID_SPORTS:
+        return sport.strip().lower()
+    return None
+
+def _transition_counts(shots: Union[bytes, str, List[Dict]], settings: Union[None, str, Dict],
+                       sign: int = 1) -> Counter:
+    """Shot transition counts one sequence adds (sign=1) or removes (sign=-1).
+
+    Legacy rows with positions the codec cannot represent count for nothing.
+    """
+    counts = Counter()
+    try:
+        states = _stored_states(shots)
+    except (ShotCodecError, ValueError):
+        return counts
+    sport = _sequence_sport(settings)
+    for previous, state in zip([START_STATE] + states[:-1], states):
+        counts[(ALL_SPORTS, previous, state)] += sign
+        if sport:
+            counts[(sport, previous, state)] += sign
+    return counts
+
+def _train_transitions(cursor: sqlite3.Cursor, counts: Counter) -> None:
+    """Apply transition count changes in the caller's transaction, for the local generator."""
+    changes = [(sport, previous, state, count) for (sport, previous, state), count in counts.items() if count]
+    if not changes:
+        return
+    cursor.executemany("""
+        INSERT INTO shot_transitions (sport, from_state, to_state, count) VALUES (?, ?, ?, ?)
+        ON CONFLICT(sport, from_state, to_state) DO UPDATE SET count = count + excluded.count
+    """, changes)
+    cursor.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'shot_transitions'")
+
+def _write_chunks(cursor: sqlite3.Cursor, sequence_id: str, states: bytes) -> None:
+    """Store a whole shot list as consecutive chunks of SEQUENCE_CHUNK_SHOTS shots."""
+    cursor.executemany("INSERT INTO sequence_chunks (sequence_id, chunk, states) VALUES (?, ?, ?)", [
+        (sequence_id, number * CHUNK_KEY_GAP, encode_states(states[start:start + SEQUENCE_CHUNK_SHOTS]))
+        for number, start in enumerate(range(0, len(states), SEQUENCE_CHUNK_SHOTS))
+    ])
+
+def _join_chunks(rows: Iterable[sqlite3.Row]) -> bytes:
+    """Concatenate the state bytes of one sequence's chunk rows, given in any order."""
+    return b"".join(decode_states(row["states"]) for row in sorted(rows, key=lambda row: row["chunk"]))
+
+def _read_states(cursor: sqlite3.Cursor, sequence_id: str, offset: int = 0, limit: Optional[int] = None) -> bytes:
+    """State bytes of a chunked sequence's shots, or of `limit` shots from `offset`.
+
+    Walks the chunk directory to find the chunks covering the range, then
+    loads only those, so memory and I/O follow the range, not the sequence.
+    """
+    if offset == 0 and limit is None:
+        return _join_chunks(cursor.execute(
+            "SELECT chunk, states FROM sequence_chunks WHERE sequence_id = ? ORDER BY chunk", (sequence_id,)
+        ).fetchall())
+    
+    first = last = None
+    start = skip = 0
+    for row in cursor.execute(
+        "SELECT chunk, length(states) - 1 AS size FROM sequence_chunks WHERE sequence_id = ? ORDER BY chunk",
+        (sequence_id,)
+    ):
+        if first is None:
+            if start + row["size"] <= offset:
+                start += row["size"]
+                continue
+            first, skip = row["chunk"], offset - start
+        last = row["chunk"]
+        start += row["size"]
+        if limit is not None and start >= offset + limit:
+            break
+    if first is None:
+        return b""
+    
+    states = b"".join(decode_states(row["states"]) for row in cursor.execute(
+        "SELECT states FROM sequence_chunks WHERE sequence_id = ? AND chunk BETWEEN ? AND ? ORDER BY chunk",
+        (sequence_id, first, last)
+    ))
+    return states[skip:skip + limit if limit is not None else None]
+
+def _stored_shots(shots: Union[bytes, str], states: bytes) -> Union[bytes, str]:
+    """A row's shots as codec bytes, from its chunks, or as legacy JSON text."""
+    return shots if isinstance(shots, str) else encode_states(states)
+
+class _ChunkEditor:
+    """Edits a chunked sequence in place, rewriting only the chunks edits touch.
+
+    The chunk directory (each chunk's key and size) is read up front and
+    chunk contents on first use. Use it under the write lock and call
+    flush() before committing.
+    """
+
+    def __init__(self, cursor: sqlite3.Cursor, sequence_id: str):
+        self.cursor = cursor
+        self.sequence_id = sequence_id
+        rows = cursor.execute(
+            "SELECT chunk, length(states) - 1 AS size FROM sequence_chunks WHERE sequence_id = ? ORDER BY chunk",
+            (sequence_id,)
+        ).fetchall()
+        self._keys = [row["chunk"] for row in rows]
+        self._sizes = [row["size"] for row in rows]
+        self._chunks: Dict[int, bytearray] = {}
+        self._dirty: Set[int] = set()
+        self._removed: Set[int] = set()
+        self.total = sum(self._sizes)
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """(directory position, offset in that chunk) of the shot at `index`."""
+        for position, size in enumerate(self._sizes):
+            if index < size:
+                return position, index
+            index -= size
+        raise IndexError(index)
+
+    def _chunk(self, position: int) -> bytearray:
+        key = self._keys[position]
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            row = self.cursor.execute(
+                "SELECT states FROM sequence_chunks WHERE sequence_id = ? AND chunk = ?", (self.sequence_id, key)
+            ).fetchone()
+            chunk = self._chunks[key] = bytearray(decode_states(row["states"]))
+        return chunk
+
+    def get(self, index: int) -> int:
+        position, offset = self._locate(index)
+        return self._chunk(position)[offset]
+
+    def insert(self, index: int, state: int) -> None:
+        if not self._keys:
+            self._keys.append(0)
+            self._sizes.append(0)
+            self._chunks[0] = bytearray()
+        
+        if index == self.total:
+            position = len(self._keys) - 1
+            offset = self._sizes[position]
+        else:
+            position, offset = self._locate(index)
+        chunk = self._chunk(position)
+        chunk.insert(offset, state)
+        self._sizes[position] += 1
+        self._dirty.add(self._keys[position])
+        self.total += 1
+        
+        if len(chunk) > SEQUENCE_CHUNK_SHOTS:
+            # A shot added after a full chunk starts a new one, so appends
+            # leave full chunks behind; other inserts split the chunk in half
+            self._split(position, SEQUENCE_CHUNK_SHOTS if offset == SEQUENCE_CHUNK_SHOTS else len(chunk) // 2)
+
+    def replace(self, index: int, state: int) -> None:
+        position, offset = self._locate(index)
+        self._chunk(position)[offset] = state
+        self._dirty.add(self._keys[position])
+
+    def delete(self, index: int) -> None:
+        position, offset = self._locate(index)
+        chunk = self._chunk(position)
+        del chunk[offset]
+        self.total -= 1
+        
+        self._sizes[position] -= 1
+        self._dirty.add(self._keys[position])
+        # Fold small neighbours together so deletes don't leave a trail of tiny chunks
+        if position + 1 < len(self._keys) and len(chunk) + self._sizes[position + 1] <= SEQUENCE_CHUNK_SHOTS // 2:
+            chunk.extend(self._chunk(position + 1))
+            self._sizes[position] = len(chunk)
+            self._drop(position + 1)
+        if not chunk:
+            self._drop(position)
+
+    def _drop(self, position: int) -> None:
+        key = self._keys.pop(position)
+        self._sizes.pop(position)
+        self._chunks.pop(key, None)
+        self._dirty.discard(key)
+        self._removed.add(key)
+
+    def _split(self, position: int, at: int) -> None:
+        key = self._keys[position]
+        following = self._keys[position + 1] if position + 1 < len(self._keys) else key + 2 * CHUNK_KEY_GAP
+        new_key = (key + following) // 2
+        if new_key == key:
+            # Repeated splits used up the gap; renumber this sequence's chunks
+            self._renumber()
+            self._split(position, at)
+            return
+        
+        chunk = self._chunks[key]
+        self._chunks[new_key] = chunk[at:]
+        del chunk[at:]
+        self._keys.insert(position + 1, new_key)
+        self._sizes[position] = len(chunk)
+        self._sizes.insert(position + 1, len(self._chunks[new_key]))
+        self._dirty.add(new_key)
+
+    def _renumber(self) -> None:
+        chunks = [self._chunk(position) for position in range(len(self._keys))]
+        self._removed.update(self._keys)
+        self._keys = [number * CHUNK_KEY_GAP for number in range(len(chunks))]
+        self._chunks = dict(zip(self._keys, chunks))
+        self._dirty = set(self._keys)
+
+    def flush(self) -> None:
+        """Write changed chunks in the caller's transaction."""
+        self.cursor.executemany(
+            "DELETE FROM sequence_chunks WHERE sequence_id = ? AND chunk = ?",
+            [(self.sequence_id, key) for key in self._removed]
+        )
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO sequence_chunks (sequence_id, chunk, states) VALUES (?, ?, ?)",
+            [(self.sequence_id, key, encode_states(self._chunks[key])) for key in self._dirty]
+        )
+        self._removed = set()
+        self._dirty = set()
+
+def _apply_shot_op(editor: _ChunkEditor, op: Dict) -> Counter:
+    """Apply one shot edit, returning how it changes the (previous, next) state transitions."""
+    kind = op.get("op")
+    if kind not in ("append", "insert", "replace", "delete"):
+        raise ShotPatchError(f"Unknown op: {kind}")
+    
+    index = editor.total if kind == "append" else op.get("index")
+    last = editor.total if kind in ("append", "insert") else editor.total - 1
+    if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index <= last:
+        raise ShotPatchError(f"Index {index} is out of range for {kind} on {editor.total} shots")
+    
+    state = None
+    if kind != "delete":
+        try:
+            state = shot_to_state(op.get("shot") or {})
+        except (KeyError, TypeError, ValueError) as e:
+            raise ShotPatchError(f"Invalid shot: {e}")
+    
+    previous = editor.get(index - 1) if index > 0 else START_STATE
+    if kind in ("append", "insert"):
+        following = editor.get(index) if index < editor.total else None
+        removed = [(previous, following)]
+        added = [(previous, state), (state, following)]
+        editor.insert(index, state)
+    else:
+        current = editor.get(index)
+        following = editor.get(index + 1) if index + 1 < editor.total else None
+        removed = [(previous, current), (current, following)]
+        if kind == "replace":
+            added = [(previous, state), (state, following)]
+            editor.replace(index, state)
+        else:
+            added = [(previous, following)]
+            editor.delete(index)
+    
+    changes = Counter()
+    for transition in removed:
+        if transition[1] is not None:
+            changes[transition] -= 1
+    for transition in added:
+        if transition[1] is not None:
+            changes[transition] += 1
+    return changes
+
+def _first_page(shots: Union[bytes, str], states: bytes) -> List[Dict[str, Any]]:
+    """The shots returned with a sequence, from its first states or legacy JSON text."""
+    if isinstance(shots, str):
+        return decode_shots(shots)[:SEQUENCE_FIRST_PAGE_SHOTS]
+    return states_to_shots(states[:SEQUENCE_FIRST_PAGE_SHOTS])
+
+def _row_to_sequence(row: sqlite3.Row, states: bytes = b"") -> Dict:
+    """Build the API representation of a sequences row with the first page of its shots.
+
+    `states` needs to hold at least the first SEQUENCE_FIRST_PAGE_SHOTS states.
+    """
+    # Parse metadata and ensure it has required fields
+    metadata = json.loads(row["metadata"]) if row["metadata"] else {}
+    
+    # Ensure metadata has createdAt (fallback to row created_at if missing or null)
+    if "createdAt" not in metadata or metadata["createdAt"] is None:
+        metadata["createdAt"] = row["created_at"]
+    
+    # Ensure metadata has totalShots
+    if "totalShots" not in metadata:
+        metadata["totalShots"] = row["total_shots"]
+
+    settings = json.loads(row["settings"]) if row["settings"] else None
+    
+    shots = _first_page(row["shots"], states)
+    
+    # Shape settings and metadata exactly like SequenceResponse so routes can
+    # serialize this dict without re-validating it
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "shots": shots,
+        "nextShotsOffset": len(shots) if row["total_shots"] > len(shots) else None,
+        "settings": {
+            "minDistance": settings.get("minDistance"),
+            "maxDistance": settings.get("maxDistance"),
+            "sport": settings.get("sport")
+        } if settings else None,
+        "metadata": {
+            "totalShots": metadata["totalShots"],
+            "createdAt": metadata["createdAt"],
+            "updatedAt": metadata.get("updatedAt")
+        },
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"]
+    }
 
 class SequenceDB:
     @staticmethod
-    def create_sequence(name: str, shots: List[Dict], settings: Optional[Dict] = None) -> str:
-        """Create a new sequence and return its ID."""
+    @time_db_query("create_sequence")
+    def create_sequence(name: str, shots: List[Dict], settings: Optional[Dict] = None) -> Dict:
+        """Create a new sequence and return it."""
         sequence_id = str(uuid.uuid4())
         now = datetime.utcnow().isoformat()
+        encoded = encode_shots(shots)
         
         metadata = {
             "totalShots": len(shots),
             "createdAt": now
         }
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO sequences (id, name, shots, settings, metadata, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            sequence_id,
-            name,
-            json.dumps(shots),
-            json.dumps(settings) if settings else None,
-            json.dumps(metadata),
-            now,
-            now
-        ))
-        
-        conn.commit()
-        conn.close()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO sequences (id, name, shots, total_shots, settings, metadata, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING *
+            """, (
+                sequence_id,
+                name,
+                CHUNKED_SHOTS,
+                len(shots),
+                json.dumps(settings) if settings else None,
+                json.dumps(metadata),
+                now,
+                now
+            ))
+            row = cursor.fetchone()
+            _write_chunks(cursor, sequence_id, encoded[1:])
+            _train_transitions(cursor, _transition_counts(encoded, settings))
+            
+            conn.commit()
         
-        return sequence_id
+        return _row_to_sequence(row, encoded[1:SEQUENCE_FIRST_PAGE_SHOTS + 1])
     
     @staticmethod
+    @time_db_query("get_sequence")
     def get_sequence(sequence_id: str) -> Optional[Dict]:
         """Get a sequence by ID."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM sequences WHERE id = ?", (sequence_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if not row:
-            return None
-        
-        # Parse metadata and ensure it has required fields
-        metadata = json.loads(row["metadata"]) if row["metadata"] else {}
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Read the row and its chunks from one snapshot
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT * FROM sequences WHERE id = ?", (sequence_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            states = _read_states(cursor, sequence_id, 0, SEQUENCE_FIRST_PAGE_SHOTS)
         
-        # Ensure metadata has createdAt (fallback to row created_at if missing or null)
-        if "createdAt" not in metadata or metadata["createdAt"] is None:
-            metadata["createdAt"] = row["created_at"]
+        return _row_to_sequence(row, states)
+    
+    @staticmethod
+    @time_db_query("get_shots")
+    def get_shots(sequence_id: str, offset: int, limit: int) -> Optional[Dict]:
+        """Get up to `limit` shots of a sequence from `offset`. Returns None if not found."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("BEGIN")
+            row = cursor.execute(
+                "SELECT shots, total_shots, updated_at FROM sequences WHERE id = ?", (sequence_id,)
+            ).fetchone()
+            if not row:
+                return None
+            
+            if isinstance(row["shots"], str):
+                shots = decode_shots(row["shots"])[offset:offset + limit]
+            else:
+                shots = states_to_shots(_read_states(cursor, sequence_id, offset, limit))
         
-        # Ensure metadata has totalShots
-        if "totalShots" not in metadata:
-            shots = json.loads(row["shots"])
-            metadata["totalShots"] = len(shots)
-
+        end = offset + len(shots)
         return {
-            "id": row["id"],
-            "name": row["name"],
-            "shots": json.loads(row["shots"]),
-            "settings": json.loads(row["settings"]) if row["settings"] else None,
-            "metadata": metadata,
-            "createdAt": row["created_at"],
+            "shots": shots,
+            "offset": offset,
+            "totalShots": row["total_shots"],
+            "nextOffset": end if end < row["total_shots"] else None,
             "updatedAt": row["updated_at"]
         }
     
     @staticmethod
-    def get_all_sequences() -> List[Dict]:
-        """Get all sequences with basic info."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    @time_db_query("create_sequences")
+    def create_sequences(items: List[Dict]) -> List[Tuple[Optional[str], Optional[str]]]:
+        """Create many sequences in one transaction.
+
+        Each item has name, shots and optional settings. Returns an
+        (id, error) pair per item; items whose shots cannot be stored are
+        reported rather than failing the whole batch.
+        """
+        now = datetime.utcnow().isoformat()
+        results = []
+        rows = []
+        chunks = []
+        counts = Counter()
         
-        cursor.execute("""
-            SELECT id, name, metadata, created_at, updated_at 
-            FROM sequences 
-            ORDER BY created_at DESC
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+        for item in items:
+            try:
+                encoded = encode_shots(item["shots"])
+            except ShotCodecError as e:
+                results.append((None, str(e)))
+                continue
+            
+            sequence_id = str(uuid.uuid4())
+            settings = item.get("settings")
+            rows.append((
+                sequence_id,
+                item["name"],
+                CHUNKED_SHOTS,
+                len(item["shots"]),
+                json.dumps(settings) if settings else None,
+                json.dumps({"totalShots": len(item["shots"]), "createdAt": now}),
+                now,
+                now
+            ))
+            chunks.append((sequence_id, encoded[1:]))
+            results.append((sequence_id, None))
+            counts.update(_transition_counts(encoded, settings))
+        
+        if rows:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO sequences (id, name, shots, total_shots, settings, metadata, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                for sequence_id, states in chunks:
+                    _write_chunks(cursor, sequence_id, states)
+                _train_transitions(cursor, counts)
+                conn.commit()
+        
+        return results
+    
+    @staticmethod
+    @time_db_query("get_sequences")
+    def get_sequences(sequence_ids: List[str]) -> Dict[str, Dict]:
+        """Get many sequences by ID, keyed by ID. Missing IDs are absent."""
+        sequences = {}
+        with get_db_connection() as conn:
+            conn.execute("BEGIN")
+            for start in range(0, len(sequence_ids), BATCH_QUERY_SIZE):
+                chunk = sequence_ids[start:start + BATCH_QUERY_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT * FROM sequences WHERE id IN ({placeholders})", chunk).fetchall()
+                # Only the chunks holding each sequence's first page
+                states: Dict[str, List[bytes]] = {}
+                for row in conn.execute(f"""
+                    SELECT sequence_id, states FROM (
+                        SELECT sequence_id, chunk, states,
+                               SUM(length(states) - 1) OVER (
+                                   PARTITION BY sequence_id ORDER BY chunk
+                               ) - (length(states) - 1) AS first_shot
+                        FROM sequence_chunks
+                        WHERE sequence_id IN ({placeholders})
+                    )
+                    WHERE first_shot < ?
+                    ORDER BY sequence_id, chunk
+                """, chunk + [SEQUENCE_FIRST_PAGE_SHOTS]):
+                    states.setdefault(row["sequence_id"], []).append(decode_states(row["states"]))
+                for row in rows:
+                    sequences[row["id"]] = _row_to_sequence(row, b"".join(states.get(row["id"], ())))
+        
+        return sequences
+    
+    @staticmethod
+    @time_db_query("get_sequence_updated_at")
+    def get_sequence_updated_at(sequence_id: str) -> Optional[str]:
+        """Get just a sequence's updated_at (for conditional requests)."""
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT updated_at FROM sequences WHERE id = ?", (sequence_id,)).fetchone()
+        
+        return row["updated_at"] if row else None
+    
+    @staticmethod
+    @time_db_query("get_list_version")
+    def get_list_version() -> int:
+        """Version counter bumped by every write to the sequences table."""
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT version FROM table_versions WHERE name = 'sequences'").fetchone()
+        
+        return row["version"] if row else 0
+    
+    @staticmethod
+    @time_db_query("get_all_sequences")
+    def get_all_sequences(limit: int = 100, after: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of sequences, newest first, with the cursor for the next page."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Fetch one extra row to learn whether another page exists
+            if after is None:
+                cursor.execute("""
+                    SELECT id, name, total_shots, created_at, updated_at
+                    FROM sequences
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                """, (limit + 1,))
+            else:
+                after_created_at, after_id = decode_cursor(after)
+                cursor.execute("""
+                    SELECT id, name, total_shots, created_at, updated_at
+                    FROM sequences
+                    WHERE (created_at, id) < (?, ?)
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                """, (after_created_at, after_id, limit + 1))
+            rows = cursor.fetchall()
         
         sequences = []
-        for row in rows:
-            metadata = json.loads(row["metadata"]) if row["metadata"] else {}
+        for row in rows[:limit]:
             sequences.append({
                 "id": row["id"],
                 "name": row["name"],
-                "totalShots": metadata.get("totalShots", 0),
+                "totalShots": row["total_shots"],
                 "createdAt": row["created_at"],
                 "updatedAt": row["updated_at"]
             })
         
-        return sequences
+        next_cursor = None
+        if len(rows) > limit:
+            last = sequences[-1]
+            next_cursor = encode_cursor(last["createdAt"], last["id"])
+        
+        return sequences, next_cursor
     
     @staticmethod
+    @time_db_query("update_sequence")
     def update_sequence(sequence_id: str, name: Optional[str] = None, 
                        shots: Optional[List[Dict]] = None, 
-                       settings: Optional[Dict] = None) -> bool:
-        """Update a sequence. Returns True if updated, False if not found."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # First check if sequence exists and get current metadata
-        cursor.execute("SELECT metadata FROM sequences WHERE id = ?", (sequence_id,))
-        existing_row = cursor.fetchone()
-        if not existing_row:
-            conn.close()
-            return False
-        
-        # Parse existing metadata to preserve createdAt
-        existing_metadata = json.loads(existing_row["metadata"]) if existing_row["metadata"] else {}
-        
+                       settings: Optional[Dict] = None) -> Optional[Dict]:
+        """Update a sequence. Returns the updated sequence, or None if not found.
+
+        Only new shots or a new sport change the transition counts, so only
+        those read the old shots (under the write lock) to subtract them; other
+        updates read just the first page of shots for the response.
+        """
         now = datetime.utcnow().isoformat()
         updates = ["updated_at = ?"]
         params = [now]
@@ -157,26 +1023,22 @@ class SequenceDB:
             updates.append("name = ?")
             params.append(name)
         
+        encoded = None
         if shots is not None:
+            encoded = encode_shots(shots)
             updates.append("shots = ?")
-            params.append(json.dumps(shots))
+            params.append(CHUNKED_SHOTS)
+            updates.append("total_shots = ?")
+            params.append(len(shots))
             
             # Update metadata with new shot count, preserving createdAt
-            # Use existing createdAt or fall back to created_at from database
-            created_at = existing_metadata.get("createdAt")
-            if created_at is None:
-                # Get the created_at from the database row
-                cursor.execute("SELECT created_at FROM sequences WHERE id = ?", (sequence_id,))
-                db_row = cursor.fetchone()
-                created_at = db_row["created_at"] if db_row else now
-            
-            metadata = {
-                "totalShots": len(shots),
-                "createdAt": created_at,
-                "updatedAt": now
-            }
-            updates.append("metadata = ?")
-            params.append(json.dumps(metadata))
+            # (falling back to the row's created_at) without reading it first
+            updates.append("""metadata = json_object(
+                'totalShots', ?,
+                'createdAt', COALESCE(json_extract(metadata, '$.createdAt'), created_at),
+                'updatedAt', ?
+            )""")
+            params.extend([len(shots), now])
         
         if settings is not None:
             updates.append("settings = ?")
@@ -184,27 +1046,214 @@ class SequenceDB:
         
         params.append(sequence_id)
         
-        cursor.execute(f"""
-            UPDATE sequences 
-            SET {', '.join(updates)}
-            WHERE id = ?
-        """, params)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            old = None
+            old_states = None
+            if shots is not None or settings is not None:
+                cursor.execute("BEGIN IMMEDIATE")
+                old = cursor.execute("SELECT shots, settings FROM sequences WHERE id = ?", (sequence_id,)).fetchone()
+                # New shots or a new sport change what the sequence teaches the
+                # local generator; other settings (e.g. distances) do not
+                if old is not None and (shots is not None or _sequence_sport(settings) != _sequence_sport(old["settings"])):
+                    old_states = _read_states(cursor, sequence_id)
+                else:
+                    old = None
+            
+            cursor.execute(f"""
+                UPDATE sequences 
+                SET {', '.join(updates)}
+                WHERE id = ?
+                RETURNING *
+            """, params)
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            
+            if encoded is not None:
+                states = encoded[1:]
+                cursor.execute("DELETE FROM sequence_chunks WHERE sequence_id = ?", (sequence_id,))
+                _write_chunks(cursor, sequence_id, states)
+            elif old_states is not None:
+                states = old_states
+            else:
+                states = _read_states(cursor, sequence_id, 0, SEQUENCE_FIRST_PAGE_SHOTS)
+            
+            if old is not None:
+                counts = _transition_counts(_stored_shots(row["shots"], states), row["settings"])
+                counts.update(_transition_counts(_stored_shots(old["shots"], old_states), old["settings"], sign=-1))
+                _train_transitions(cursor, counts)
+            
+            conn.commit()
         
-        conn.commit()
-        conn.close()
+        return _row_to_sequence(row, states)
+    
+    @staticmethod
+    @time_db_query("patch_sequence")
+    def patch_sequence(sequence_id: str, ops: List[Dict]) -> Optional[Dict]:
+        """Apply shot edits atomically. Returns the updated sequence, or None if not found.
+
+        Each op is {"op": "append" | "insert" | "replace" | "delete", "index", "shot"},
+        applied in order, with indexes counted after the previous ops. Only the
+        chunks holding edited shots are rewritten, and totalShots and the
+        transition counts change by each edit's difference. Raises
+        ShotPatchError, leaving the sequence unchanged, if any op does not apply.
+        """
+        now = datetime.utcnow().isoformat()
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            row = cursor.execute("SELECT shots, settings FROM sequences WHERE id = ?", (sequence_id,)).fetchone()
+            if row is None:
+                return None
+            if isinstance(row["shots"], str):
+                raise ShotPatchError("This sequence is stored in a legacy format; replace its shots with PUT to edit them")
+            
+            editor = _ChunkEditor(cursor, sequence_id)
+            initial_total = editor.total
+            transitions = Counter()
+            for number, op in enumerate(ops):
+                try:
+                    transitions.update(_apply_shot_op(editor, op))
+                except ShotPatchError as e:
+                    raise ShotPatchError(f"Op {number}: {e}")
+            
+            if not 1 <= editor.total <= MAX_SEQUENCE_SHOTS:
+                raise ShotPatchError(f"A sequence must have between 1 and {MAX_SEQUENCE_SHOTS} shots")
+            editor.flush()
+            
+            delta = editor.total - initial_total
+            row = cursor.execute("""
+                UPDATE sequences
+                SET total_shots = total_shots + ?,
+                    updated_at = ?,
+                    metadata = json_object(
+                        'totalShots', total_shots + ?,
+                        'createdAt', COALESCE(json_extract(metadata, '$.createdAt'), created_at),
+                        'updatedAt', ?
+                    )
+                WHERE id = ?
+                RETURNING *
+            """, (delta, now, delta, now, sequence_id)).fetchone()
+            
+            sport = _sequence_sport(row["settings"])
+            counts = Counter()
+            for (previous, state), change in transitions.items():
+                counts[(ALL_SPORTS, previous, state)] += change
+                if sport:
+                    counts[(sport, previous, state)] += change
+            _train_transitions(cursor, counts)
+            
+            states = _read_states(cursor, sequence_id, 0, SEQUENCE_FIRST_PAGE_SHOTS)
+            conn.commit()
         
-        return True
+        return _row_to_sequence(row, states)
     
     @staticmethod
+    @time_db_query("delete_sequence")
     def delete_sequence(sequence_id: str) -> bool:
         """Delete a sequence. Returns True if deleted, False if not found."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM sequences WHERE id = ?", (sequence_id,))
-        deleted = cursor.rowcount > 0
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            row = cursor.execute(
+                "DELETE FROM sequences WHERE id = ? RETURNING shots, settings", (sequence_id,)
+            ).fetchone()
+            deleted = row is not None
+            if deleted:
+                states = _join_chunks(cursor.execute(
+                    "DELETE FROM sequence_chunks WHERE sequence_id = ? RETURNING chunk, states", (sequence_id,)
+                ).fetchall())
+                _train_transitions(
+                    cursor, _transition_counts(_stored_shots(row["shots"], states), row["settings"], sign=-1)
+                )
+            
+            conn.commit()
         
-        conn.commit()
-        conn.close()
+        return deleted
+    
+    @staticmethod
+    @time_db_query("delete_sequences")
+    def delete_sequences(sequence_ids: List[str]) -> List[str]:
+        """Delete many sequences in one transaction. Returns the IDs that existed."""
+        deleted = []
+        counts = Counter()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(sequence_ids), BATCH_QUERY_SIZE):
+                chunk = sequence_ids[start:start + BATCH_QUERY_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = cursor.execute(
+                    f"DELETE FROM sequences WHERE id IN ({placeholders}) RETURNING id, shots, settings", chunk
+                ).fetchall()
+                chunk_rows: Dict[str, List[sqlite3.Row]] = {}
+                for chunk_row in cursor.execute(
+                    f"DELETE FROM sequence_chunks WHERE sequence_id IN ({placeholders}) RETURNING sequence_id, chunk, states",
+                    chunk
+                ).fetchall():
+                    chunk_rows.setdefault(chunk_row["sequence_id"], []).append(chunk_row)
+                for row in rows:
+                    deleted.append(row["id"])
+                    states = _join_chunks(chunk_rows.get(row["id"], ()))
+                    counts.update(_transition_counts(_stored_shots(row["shots"], states), row["settings"], sign=-1))
+            _train_transitions(cursor, counts)
+            conn.commit()
         
-        return deleted
\ No newline at end of file
+        return deleted
+
+
+class AsyncSequenceDB:
+    """Async facade over SequenceDB; queries run on the bounded DB executor."""
+
+    @staticmethod
+    async def create_sequence(name: str, shots: List[Dict], settings: Optional[Dict] = None) -> Dict:
+        return await run_in_db_executor(SequenceDB.create_sequence, name, shots, settings)
+
+    @staticmethod
+    async def get_sequence(sequence_id: str) -> Optional[Dict]:
+        return await run_in_db_executor(SequenceDB.get_sequence, sequence_id)
+
+    @staticmethod
+    async def get_shots(sequence_id: str, offset: int, limit: int) -> Optional[Dict]:
+        return await run_in_db_executor(SequenceDB.get_shots, sequence_id, offset, limit)
+
+    @staticmethod
+    async def get_sequence_updated_at(sequence_id: str) -> Optional[str]:
+        return await run_in_db_executor(SequenceDB.get_sequence_updated_at, sequence_id)
+
+    @staticmethod
+    async def get_list_version() -> int:
+        return await run_in_db_executor(SequenceDB.get_list_version)
+
+    @staticmethod
+    async def get_all_sequences(limit: int = 100, after: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        return await run_in_db_executor(SequenceDB.get_all_sequences, limit, after)
+
+    @staticmethod
+    async def update_sequence(sequence_id: str, name: Optional[str] = None,
+                              shots: Optional[List[Dict]] = None,
+                              settings: Optional[Dict] = None) -> Optional[Dict]:
+        return await run_in_db_executor(SequenceDB.update_sequence, sequence_id, name, shots, settings)
+
+    @staticmethod
+    async def patch_sequence(sequence_id: str, ops: List[Dict]) -> Optional[Dict]:
+        return await run_in_db_executor(SequenceDB.patch_sequence, sequence_id, ops)
+
+    @staticmethod
+    async def delete_sequence(sequence_id: str) -> bool:
+        return await run_in_db_executor(SequenceDB.delete_sequence, sequence_id)
+
+    @staticmethod
+    async def create_sequences(items: List[Dict]) -> List[Tuple[Optional[str], Optional[str]]]:
+        return await run_in_db_executor(SequenceDB.create_sequences, items)
+
+    @staticmethod
+    async def get_sequences(sequence_ids: List[str]) -> Dict[str, Dict]:
+        return await run_in_db_executor(SequenceDB.get_sequences, sequence_ids)
+
+    @staticmethod
+    async def delete_sequences(sequence_ids: List[str]) -> List[str]:
+        return await run_in_db_executor(SequenceDB.delete_sequences, sequence_ids)
\ No newline at end of file
@@ -0,0 +1,224 @@
+import functools
+import math
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from .court import NUM_STATES, SHOT_STATES, state_grid, state_space
+
+class GenerationError(Exception):
+    """Raised when no sequence can satisfy the requested constraints"""
+    pass
+
+def continuous_coordinates(state: int) -> Tuple[int, int]:
+    """Coordinates of a state on the continuous 5x10 field.
+
+    Space 1 covers y=0-4 (Back=0, Front=4); Space 2 is flipped and offset to
+    y=5-9 (Front=5, Back=9) so the two fronts meet at the net.
+    """
+    x, y = state_grid(state)
+    if state_space(state) == 1:
+        return x, y
+    return x, 9 - y
+
+_COORDINATES = np.array([continuous_coordinates(state) for state in range(NUM_STATES)], dtype=np.float64)
+_SPACES = np.array([state_space(state) for state in range(NUM_STATES)])
+
+# Euclidean distance between every pair of states, computed once
+DISTANCE_MATRIX = np.sqrt(
+    ((_COORDINATES[:, None, :] - _COORDINATES[None, :, :]) ** 2).sum(axis=2)
+)
+DISTANCE_MATRIX.setflags(write=False)
+
+# Consecutive shots always alternate between the two spaces
+ALTERNATION_MASK = _SPACES[:, None] != _SPACES[None, :]
+ALTERNATION_MASK.setflags(write=False)
+
+# First shots are always in Space 1
+FIRST_SHOT_MASK = _SPACES == 1
+FIRST_SHOT_MASK.setflags(write=False)
+
+def normalize_distance_limits(min_distance: Optional[float] = None,
+                              max_distance: Optional[float] = None) -> Tuple[float, float]:
+    """Fill in open-ended limits the same way the frontend does."""
+    return (
+        float(min_distance) if min_distance is not None else 0.0,
+        float(max_distance) if max_distance is not None else math.inf
+    )
+
+class TransitionTable:
+    """Valid shot-to-shot transitions, shared by every distance range that allows the same ones."""
+
+    def __init__(self, valid: np.ndarray):
+        valid.setflags(write=False)
+        self.valid = valid
+        self.out_degree = valid.sum(axis=1)
+
+def _table_key(min_distance: float, max_distance: float) -> bytes:
+    """Cache key for a distance range: its valid-transition mask.
+
+    Only a few dozen distinct distances occur on the court, so ranges that
+    differ by less than the gap between two of them share tables and plans,
+    and user-supplied floats cannot grow the caches' key space.
+    """
+    valid = ALTERNATION_MASK & (DISTANCE_MATRIX >= min_distance) & (DISTANCE_MATRIX <= max_distance)
+    return valid.tobytes()
+
+@functools.lru_cache(maxsize=256)
+def _cached_transition_table(key: bytes) -> TransitionTable:
+    return TransitionTable(np.frombuffer(key, dtype=bool).reshape(NUM_STATES, NUM_STATES))
+
+def get_transition_table(min_distance: Optional[float] = None,
+                         max_distance: Optional[float] = None) -> TransitionTable:
+    """Return the cached transition table for a distance range."""
+    return _cached_transition_table(_table_key(*normalize_distance_limits(min_distance, max_distance)))
+
+def count_sequences(num_shots: int, min_distance: Optional[float] = None,
+                    max_distance: Optional[float] = None) -> int:
+    """Exact number of valid sequences of length `num_shots`.
+
+    Dynamic programming over the 50-state transition graph: ways[s] is the
+    number of valid prefixes ending in state s. Uses Python ints, which do
+    not overflow.
+    """
+    if num_shots < 1:
+        return 0
+    
+    table = get_transition_table(min_distance, max_distance)
+    predecessors = [np.flatnonzero(table.valid[:, state]).tolist() for state in range(NUM_STATES)]
+    
+    ways = [1 if FIRST_SHOT_MASK[state] else 0 for state in range(NUM_STATES)]
+    for _ in range(num_shots - 1):
+        ways = [sum(ways[prev] for prev in predecessors[state]) for state in range(NUM_STATES)]
+    
+    return sum(ways)
+
+def check_feasibility(num_shots: int, min_distance: Optional[float] = None,
+                      max_distance: Optional[float] = None) -> None:
+    """Raise GenerationError unless at least one valid sequence exists. O(N * 50^2)."""
+    if num_shots < 1:
+        raise GenerationError("Number of shots must be at least 1")
+    
+    table = get_transition_table(min_distance, max_distance)
+    reachable = FIRST_SHOT_MASK.copy()
+    for _ in range(num_shots - 1):
+        reachable = table.valid[reachable].any(axis=0)
+        if not reachable.any():
+            low, high = normalize_distance_limits(min_distance, max_distance)
+            raise GenerationError(
+                f"No {num_shots}-shot sequence can keep consecutive shots between "
+                f"{low:g} and {high:g} units apart"
+            )
+
+# Longest sequence whose per-step CDF tables (N x 50 x 50 floats, 2 MB at
+# 100 shots) are cached
+PRECOMPUTED_PLAN_MAX_SHOTS = 100
+
+class SamplingPlan:
+    """Per-step transition probabilities that make every valid sequence equally likely.
+
+    beta[t, s] is proportional to the number of valid completions from state s
+    at step t. Choosing each next state with probability proportional to
+    beta[t + 1] among the valid successors samples uniformly over whole
+    sequences without retries.
+
+    With `weights` (transition probabilities, rows indexed by the previous
+    state) and `first_weights`, beta sums the probability of the valid
+    completions instead, and sequences are drawn from that Markov chain
+    conditioned on satisfying the constraints.
+    """
+
+    def __init__(self, table: TransitionTable, num_shots: int,
+                 weights: Optional[np.ndarray] = None,
+                 first_weights: Optional[np.ndarray] = None,
+                 precompute: bool = True):
+        valid = table.valid.astype(np.float64)
+        if weights is not None:
+            valid = valid * weights
+        
+        beta = np.ones((num_shots, NUM_STATES))
+        for step in range(num_shots - 2, -1, -1):
+            completions = valid @ beta[step + 1]
+            # Rescale each step so counts that grow like 25^N stay in range
+            peak = completions.max()
+            beta[step] = completions / peak if peak > 0 else completions
+        
+        first = np.where(FIRST_SHOT_MASK, beta[0], 0.0)
+        if first_weights is not None:
+            first = first * first_weights
+        if first.sum() == 0:
+            raise GenerationError("No shot sequence can satisfy the distance constraints")
+        self.first_cumulative = np.cumsum(first) / first.sum()
+        
+        self.valid = valid
+        self.beta = beta
+        self.num_shots = num_shots
+        
+        # Precompute every step's CDF table when it is small enough to cache
+        self.cumulative = None
+        if precompute and num_shots <= PRECOMPUTED_PLAN_MAX_SHOTS:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.cumulative = self._cumulative(valid[None, :, :] * beta[1:, None, :])
+
+    @staticmethod
+    def _cumulative(weights: np.ndarray) -> np.ndarray:
+        cumulative = np.cumsum(weights, axis=-1)
+        return cumulative / cumulative[..., -1:]
+
+    def step_cumulative(self, step: int, previous: np.ndarray) -> np.ndarray:
+        """CDF rows over the state at `step` for each previous state."""
+        if self.cumulative is not None:
+            return self.cumulative[step - 1, previous]
+        return self._cumulative(self.valid[previous] * self.beta[step])
+
+# Bounds the plan cache at about 64 MB even when every entry is precomputed
+@functools.lru_cache(maxsize=32)
+def _cached_sampling_plan(num_shots: int, key: bytes) -> SamplingPlan:
+    return SamplingPlan(_cached_transition_table(key), num_shots)
+
+def get_sampling_plan(num_shots: int, min_distance: Optional[float] = None,
+                      max_distance: Optional[float] = None) -> SamplingPlan:
+    return _cached_sampling_plan(num_shots, _table_key(*normalize_distance_limits(min_distance, max_distance)))
+
+def _draw(cumulative: np.ndarray, draws: np.ndarray) -> np.ndarray:
+    """Index of the first entry in each CDF row that covers its draw."""
+    return (cumulative < draws[:, None]).sum(axis=1)
+
+def generate_state_batch(num_shots: int, count: int,
+                         min_distance: Optional[float] = None,
+                         max_distance: Optional[float] = None,
+                         rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Generate `count` sequences at once as a (count, num_shots) array of states.
+
+    Sequences are sampled uniformly at random from all sequences that satisfy
+    the distance constraints; there is no retry loop, so the cost does not
+    depend on how tight the constraints are.
+    """
+    if num_shots < 1 or count < 1:
+        raise GenerationError("num_shots and count must be at least 1")
+    
+    rng = rng if rng is not None else np.random.default_rng()
+    check_feasibility(num_shots, min_distance, max_distance)
+    return sample_states(get_sampling_plan(num_shots, min_distance, max_distance), count, rng)
+
+def sample_states(plan: SamplingPlan, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Draw `count` sequences from a sampling plan as a (count, num_shots) array of states."""
+    states = np.empty((count, plan.num_shots), dtype=np.uint8)
+    states[:, 0] = _draw(np.broadcast_to(plan.first_cumulative, (count, NUM_STATES)), rng.random(count))
+    
+    for step in range(1, plan.num_shots):
+        states[:, step] = _draw(plan.step_cumulative(step, states[:, step - 1]), rng.random(count))
+    
+    return states
+
+def states_to_shots(states) -> List[Dict[str, Any]]:
+    return [SHOT_STATES[state] for state in states]
+
+def generate_sequences(num_shots: int, count: int = 1,
+                       min_distance: Optional[float] = None,
+                       max_distance: Optional[float] = None,
+                       seed: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """Generate shot sequences as lists of shot dicts."""
+    batch = generate_state_batch(num_shots, count, min_distance, max_distance,
+                                 rng=np.random.default_rng(seed))
+    return [states_to_shots(row) for row in batch.tolist()]
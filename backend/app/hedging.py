@@ -0,0 +1,94 @@
+import math
+import os
+from collections import deque
+from typing import Any, Deque, Dict
+from .metrics import AI_HEDGES
+
+# Send a second upstream request once the first has been outstanding longer
+# than this percentile of recent upstream latencies
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "95"))
+# Hedges allowed per generation request, averaged over time; 0 disables hedging
+AI_HEDGE_BUDGET = float(os.getenv("AI_HEDGE_BUDGET", "0.1"))
+AI_HEDGE_MIN_DELAY = float(os.getenv("AI_HEDGE_MIN_DELAY", "0.5"))
+# Hedge delay used until enough latencies have been observed
+AI_HEDGE_INITIAL_DELAY = float(os.getenv("AI_HEDGE_INITIAL_DELAY", "5"))
+
+class HedgePolicy:
+    """Decides when to hedge a slow upstream request and how often that is allowed.
+
+    The hedge delay is a percentile of a sliding window of upstream
+    latencies, so it adapts as the upstream speeds up or slows down. Hedges
+    draw from a token budget that earns `budget` tokens per generation and
+    holds at most `burst`, capping the extra upstream load at roughly
+    budget * requests even when every request is slow.
+    """
+
+    WINDOW = 256
+    MIN_SAMPLES = 20
+
+    def __init__(self, percentile: float = AI_HEDGE_PERCENTILE, budget: float = AI_HEDGE_BUDGET,
+                 min_delay: float = AI_HEDGE_MIN_DELAY, initial_delay: float = AI_HEDGE_INITIAL_DELAY,
+                 burst: float = 10.0):
+        self.percentile = min(max(percentile, 0.0), 100.0)
+        self.budget = max(budget, 0.0)
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.burst = burst
+        self._latencies: Deque[float] = deque(maxlen=self.WINDOW)
+        self._tokens = burst if self.budget > 0 else 0.0
+
+        self._requests = 0
+        self._hedged = 0
+        self._won = 0
+        self._skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def observe(self, seconds: float) -> None:
+        """Record how long an upstream request took (or had run when cancelled)."""
+        self._latencies.append(seconds)
+
+    def delay(self) -> float:
+        """Seconds to wait on a request before hedging it."""
+        if len(self._latencies) < self.MIN_SAMPLES:
+            return max(self.initial_delay, self.min_delay)
+        ordered = sorted(self._latencies)
+        rank = max(1, math.ceil(self.percentile / 100.0 * len(ordered)))
+        return max(ordered[rank - 1], self.min_delay)
+
+    def start_request(self) -> None:
+        """Called once per generation; earns a fraction of a hedge."""
+        self._requests += 1
+        self._tokens = min(self.burst, self._tokens + self.budget)
+
+    def try_hedge(self) -> bool:
+        """Take a hedge from the budget, or report that none is left."""
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self._hedged += 1
+            return True
+        self._skipped += 1
+        AI_HEDGES.inc(result="skipped")
+        return False
+
+    def finish_hedge(self, won: bool) -> None:
+        """Record whether a hedge produced the response that was used."""
+        if won:
+            self._won += 1
+        AI_HEDGES.inc(result="won" if won else "lost")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "budget": self.budget,
+            "delaySeconds": round(self.delay(), 6),
+            "samples": len(self._latencies),
+            "requests": self._requests,
+            "hedged": self._hedged,
+            "hedgesWon": self._won,
+            "skippedNoBudget": self._skipped,
+            "budgetTokens": round(self._tokens, 3)
+        }
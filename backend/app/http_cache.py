@@ -0,0 +1,34 @@
+import hashlib
+import os
+from typing import Optional
+
+# Cache-Control for sequence reads: shared caches (CDNs) may store responses
+# but must revalidate them with the ETag before reuse
+SEQUENCE_CACHE_CONTROL = os.getenv("SEQUENCE_CACHE_CONTROL", "public, no-cache")
+
+def _strong_etag(*parts: object) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+def sequence_etag(sequence_id: str, updated_at: str) -> str:
+    """ETag for a single sequence, derived from its updated_at timestamp."""
+    return _strong_etag("sequence", sequence_id, updated_at)
+
+def shots_etag(sequence_id: str, updated_at: str, offset: int, limit: Optional[int], media_type: str) -> str:
+    """ETag for a range of a sequence's shots in one representation."""
+    return _strong_etag("shots", sequence_id, updated_at, offset, limit or "", media_type)
+
+def list_etag(version: int, limit: int, after: Optional[str]) -> str:
+    """ETag for one page of the sequence list, derived from the table version."""
+    return _strong_etag("list", version, limit, after or "")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    return any((candidate[2:] if candidate.startswith("W/") else candidate) == etag
+               for candidate in candidates)
@@ -0,0 +1,149 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .court import NUM_STATES, SHOT_STATES
+from .database import ALL_SPORTS, START_STATE, get_db_connection
+from .generator import (
+    SamplingPlan, _table_key, check_feasibility, get_transition_table, normalize_distance_limits,
+    sample_states
+)
+from .metrics import AI_LOCAL_GENERATIONS
+
+# Serve /generate-ai from the local generator when the upstream is
+# unconfigured, overloaded or failing
+AI_LOCAL_FALLBACK = os.getenv("AI_LOCAL_FALLBACK", "true").lower() in ("1", "true", "yes", "on")
+# Also fall back once the upstream has taken this many seconds; 0 waits for it
+AI_LOCAL_FALLBACK_AFTER = float(os.getenv("AI_LOCAL_FALLBACK_AFTER", "0"))
+# Pseudo-counts per previous shot pulling a sport's transitions towards the
+# all-sports model, and added to every transition of the all-sports model
+AI_LOCAL_PRIOR = float(os.getenv("AI_LOCAL_PRIOR", "5"))
+AI_LOCAL_SMOOTHING = float(os.getenv("AI_LOCAL_SMOOTHING", "0.5"))
+# Seconds between checks for newly saved sequences
+AI_LOCAL_REFRESH = float(os.getenv("AI_LOCAL_REFRESH", "5"))
+
+class LocalSequenceModel:
+    """Markov model of saved sequences that generates without the upstream.
+
+    SequenceDB keeps shot_transitions current on every write: how often each
+    shot follows another (or starts a sequence), per sport and over all
+    sports. Each sport's transition probabilities are its own counts
+    smoothed towards the all-sports model. Sampling runs the weighted
+    backward DP in SamplingPlan, so sequences follow the learned transitions
+    and always satisfy the distance constraints, without retries.
+
+    refresh() blocks on SQLite, so call it through run_in_db_executor;
+    generate() is pure CPU and fast enough for the event loop.
+    """
+
+    MAX_PLANS = 128
+
+    def __init__(self, prior: float = AI_LOCAL_PRIOR, smoothing: float = AI_LOCAL_SMOOTHING,
+                 refresh_interval: float = AI_LOCAL_REFRESH):
+        self.prior = prior
+        self.smoothing = smoothing
+        self.refresh_interval = refresh_interval
+
+        self._version: Optional[int] = None
+        self._checked = float("-inf")
+        # sport -> (first shot weights, transition probabilities); replaced whole on refresh
+        self._models: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._totals: Dict[str, int] = {}
+        # (sport, num_shots, transition mask key) -> SamplingPlan for the current models
+        self._plans: "OrderedDict[Tuple[str, int, bytes], SamplingPlan]" = OrderedDict()
+        self._rng = np.random.default_rng()
+        self._generated = 0
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self._checked >= self.refresh_interval
+
+    def refresh(self) -> None:
+        """Reload the transition counts if any saved sequence changed them."""
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT version FROM table_versions WHERE name = 'shot_transitions'").fetchone()
+            version = row["version"] if row else 0
+            if version == self._version:
+                self._checked = time.monotonic()
+                return
+            rows = conn.execute(
+                "SELECT sport, from_state, to_state, count FROM shot_transitions WHERE count > 0"
+            ).fetchall()
+
+        # Row 0 counts first shots; row s + 1 counts shots following state s
+        counts: Dict[str, np.ndarray] = {}
+        for row in rows:
+            table = counts.setdefault(row["sport"], np.zeros((NUM_STATES + 1, NUM_STATES)))
+            table[row["from_state"] - START_STATE, row["to_state"]] = row["count"]
+
+        overall = counts.get(ALL_SPORTS, np.zeros((NUM_STATES + 1, NUM_STATES))) + self.smoothing
+        overall /= overall.sum(axis=1, keepdims=True)
+        models = {ALL_SPORTS: self._split(overall)}
+        for sport, table in counts.items():
+            if sport != ALL_SPORTS:
+                probabilities = table + self.prior * overall
+                models[sport] = self._split(probabilities / probabilities.sum(axis=1, keepdims=True))
+
+        self._models = models
+        self._totals = {sport: int(table.sum()) for sport, table in counts.items()}
+        self._plans = OrderedDict()
+        self._version = version
+        self._checked = time.monotonic()
+
+    @staticmethod
+    def _split(probabilities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return probabilities[0], probabilities[1:]
+
+    def _plan(self, sport: str, num_shots: int, min_distance: Optional[float],
+              max_distance: Optional[float]) -> SamplingPlan:
+        # refresh() swaps both dicts from an executor thread (plans last), so
+        # work on the ones read here; a plan built from newer models than its
+        # dict is only dropped with that dict
+        plans = self._plans
+        models = self._models
+        table_key = _table_key(*normalize_distance_limits(min_distance, max_distance))
+        key = (sport if sport in models else ALL_SPORTS, num_shots, table_key)
+        plan = plans.get(key)
+        if plan is None:
+            first, transitions = models.get(key[0]) or self._split(
+                np.full((NUM_STATES + 1, NUM_STATES), 1.0 / NUM_STATES)
+            )
+            # One sequence per request, so skip precomputing every step's CDFs
+            plan = SamplingPlan(get_transition_table(min_distance, max_distance), num_shots,
+                                weights=transitions, first_weights=first, precompute=False)
+            plans[key] = plan
+            while len(plans) > self.MAX_PLANS:
+                plans.popitem(last=False)
+        else:
+            plans.move_to_end(key)
+        return plan
+
+    def generate(self, sport: str, num_shots: int, min_distance: Optional[float] = None,
+                 max_distance: Optional[float] = None, reason: str = "requested") -> List[Dict[str, Any]]:
+        """Sample one sequence. Raises GenerationError if the constraints cannot be met."""
+        check_feasibility(num_shots, min_distance, max_distance)
+        plan = self._plan(sport.lower(), num_shots, min_distance, max_distance)
+        states = sample_states(plan, 1, self._rng)[0]
+        self._generated += 1
+        AI_LOCAL_GENERATIONS.inc(reason=reason)
+        return [dict(SHOT_STATES[state]) for state in states.tolist()]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self._version,
+            "generated": self._generated,
+            "plans": len(self._plans),
+            "transitions": self._totals.get(ALL_SPORTS, 0),
+            "sportTransitions": {sport: total for sport, total in self._totals.items() if sport != ALL_SPORTS}
+        }
+
+# Global instance - lazy initialization
+local_model = None
+
+def get_local_model() -> LocalSequenceModel:
+    global local_model
+    if local_model is None:
+        local_model = LocalSequenceModel()
+    return local_model
@@ -1,13 +1,28 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import init_database
-from .routes import router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .database import check_database, init_database, close_pool, get_pool_stats, run_in_db_executor, shutdown_db_executor
+from .routes import ai_generation_flights, router
+from .ai_service import (
+    close_ai_service, get_ai_admission_stats, get_ai_generation_stats, get_ai_hedging_stats,
+    get_ai_pool_stats, get_ai_prompt_cache_stats, start_ai_service
+)
+from .admission import get_rate_limiter
+from .ai_cache import get_ai_cache
+from .warm_pool import get_warm_pool
+from .local_model import get_local_model
+from .metrics import CONTENT_TYPE, METRICS_DIR, REGISTRY, MetricsMiddleware, run_snapshot_writer, stats_collector
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Seconds /health waits for the database before reporting unhealthy
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+
 # Initialize database on startup
 try:
     init_database()
@@ -15,10 +30,29 @@ except Exception as e:
     print(f"Database initialization failed: {e}")
     print("Will retry database connection on first request")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared upstream AI client once instead of per request
+    ai_service = await start_ai_service()
+    # Under multiple workers, publish metrics so any worker can serve the totals
+    snapshot_writer = asyncio.ensure_future(run_snapshot_writer(METRICS_DIR)) if METRICS_DIR else None
+    # Pre-generate sequences for popular requests while the upstream is idle
+    pool = get_warm_pool()
+    pool_worker = asyncio.ensure_future(pool.run(ai_service)) if ai_service and pool.enabled else None
+    yield
+    for task in (pool_worker, snapshot_writer):
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    await close_ai_service()
+    shutdown_db_executor()
+    close_pool()
+
 app = FastAPI(
     title="Shot Sequence API",
     description="API for managing shot sequences in sports training",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for cross-origin requests
@@ -39,8 +73,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Cache", "ETag", "Retry-After", "X-Generator", "X-Total-Shots"],
 )
 
+# Outermost, so timings include CORS handling and errors become 500s
+app.add_middleware(MetricsMiddleware)
+
+# Runtime stats are read when /metrics is scraped
+REGISTRY.add_collector(stats_collector("db_pool", "Database connection pool", get_pool_stats))
+REGISTRY.add_collector(stats_collector("ai_upstream_pool", "AI upstream HTTP client", get_ai_pool_stats))
+REGISTRY.add_collector(stats_collector("ai_generation", "AI response repair", get_ai_generation_stats))
+REGISTRY.add_collector(stats_collector("ai_cache", "AI result cache", lambda: get_ai_cache().stats()))
+REGISTRY.add_collector(stats_collector("ai_pool", "AI warm pool", lambda: get_warm_pool().stats()))
+REGISTRY.add_collector(stats_collector("ai_local", "Local Markov generator", lambda: get_local_model().stats()))
+REGISTRY.add_collector(stats_collector("ai_single_flight", "AI request coalescing", ai_generation_flights.stats))
+REGISTRY.add_collector(stats_collector("ai_hedging", "Hedged AI upstream requests", get_ai_hedging_stats))
+REGISTRY.add_collector(stats_collector("ai_admission", "AI upstream concurrency limiter and queue", get_ai_admission_stats))
+REGISTRY.add_collector(stats_collector("ai_rate_limit", "Per-client AI rate limiter", lambda: get_rate_limiter().stats()))
+
 # Include API routes
 app.include_router(router)
 
@@ -50,4 +100,34 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    """Report healthy only if the database answers a query."""
+    try:
+        latency = await asyncio.wait_for(run_in_db_executor(check_database), HEALTH_CHECK_TIMEOUT)
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unhealthy", "database": {"status": "error", "error": str(e) or type(e).__name__}}
+        )
+    return {"status": "healthy", "database": {"status": "ok", "latencyMs": round(latency * 1000, 3)}}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text-format metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/stats")
+async def runtime_stats():
+    """Runtime statistics for capacity tuning."""
+    return {
+        "database": get_pool_stats(),
+        "aiUpstream": get_ai_pool_stats(),
+        "aiGeneration": get_ai_generation_stats(),
+        "aiPromptCache": get_ai_prompt_cache_stats(),
+        "aiCache": get_ai_cache().stats(),
+        "aiPool": get_warm_pool().stats(),
+        "aiLocal": get_local_model().stats(),
+        "aiSingleFlight": ai_generation_flights.stats(),
+        "aiHedging": get_ai_hedging_stats(),
+        "aiAdmission": get_ai_admission_stats(),
+        "aiRateLimit": get_rate_limiter().stats()
+    }
\ No newline at end of file
@@ -0,0 +1,433 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format, version 0.0.4 (Starlette appends the charset)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+UPSTREAM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+# With several worker processes (see gunicorn.conf.py), each writes its
+# metric values here and /metrics merges every worker's file
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+LabelValues = Tuple[str, ...]
+# (name suffix, label pairs, value)
+Sample = Tuple[str, Sequence[Tuple[str, str]], float]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, Any] = {}
+        # Updated from the event loop and from database executor threads
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _pairs(self, key: LabelValues) -> List[Tuple[str, str]]:
+        return list(zip(self.labelnames, key))
+
+    def values(self) -> Dict[LabelValues, Any]:
+        """A copy of the current values, keyed by label values."""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def combine(current: Any, other: Any) -> Any:
+        """Merge another process's value for the same labels into ours."""
+        return other if current is None else current + other
+
+    def samples(self, values: Dict[LabelValues, Any]) -> Iterable[Sample]:
+        for key, value in sorted(values.items()):
+            yield "", self._pairs(key), value
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum
+                state = self._values[key] = [[0] * len(self.buckets), 0.0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+
+    def values(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return {key: [list(state[0]), state[1]] for key, state in self._values.items()}
+
+    @staticmethod
+    def combine(current: Any, other: Any) -> Any:
+        if current is None:
+            return [list(other[0]), other[1]]
+        return [[a + b for a, b in zip(current[0], other[0])], current[1] + other[1]]
+
+    def samples(self, values: Dict[LabelValues, Any]) -> Iterable[Sample]:
+        for key, (counts, total) in sorted(values.items()):
+            pairs = self._pairs(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", pairs + [("le", _format_value(bound))], cumulative
+            yield "_sum", pairs, total
+            yield "_count", pairs, cumulative
+
+# A collector returns (name, type, help, [(label pairs, value)]) families at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, Iterable[Tuple[Sequence[Tuple[str, str]], float]]]]]
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def _collect(self) -> List[Tuple[str, str, str, List[Tuple[Sequence[Tuple[str, str]], float]]]]:
+        return [
+            (name, metric_type, documentation, list(samples))
+            for collector in self._collectors
+            for name, metric_type, documentation, samples in collector()
+        ]
+
+    def write_snapshot(self, directory: str) -> None:
+        """Write this process's metric values to directory/<pid>.json for other workers to merge."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {
+            "metrics": {
+                metric.name: [[list(key), value] for key, value in metric.values().items()]
+                for metric in metrics
+            },
+            "collected": [
+                [name, metric_type, documentation, [[list(map(list, labels)), value] for labels, value in samples]]
+                for name, metric_type, documentation, samples in self._collect()
+            ]
+        }
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _read_snapshots(directory: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """Load the latest snapshot of every other worker, live or exited."""
+        snapshots = []
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json"):
+                continue
+            pid = int(filename[:-5])
+            if pid == os.getpid():
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshots.append((pid, json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshots = self._read_snapshots(METRICS_DIR) if METRICS_DIR else []
+        for metric in metrics:
+            values = metric.values()
+            for pid, snapshot in snapshots:
+                # Counts from exited workers still count; their gauges do not
+                if metric.type == "gauge" and not _process_alive(pid):
+                    continue
+                for key, value in snapshot["metrics"].get(metric.name, []):
+                    key = tuple(key)
+                    values[key] = metric.combine(values.get(key), value)
+
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples(values):
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+        # Collected stats describe a single process and are not additive
+        # (sizes, ratios), so each live worker's are kept apart by a pid label
+        families: Dict[str, Tuple[str, str, List[Tuple[Sequence[Tuple[str, str]], float]]]] = {}
+        collected = [(os.getpid(), self._collect())] + [
+            (pid, snapshot["collected"]) for pid, snapshot in snapshots if _process_alive(pid)
+        ]
+        for pid, process_families in sorted(collected, key=lambda item: item[0]):
+            for name, metric_type, documentation, samples in process_families:
+                family = families.setdefault(name, (metric_type, documentation, []))
+                for labels, value in samples:
+                    family[2].append(([("pid", str(pid))] + [tuple(pair) for pair in labels], value))
+        for name, (metric_type, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+REGISTRY = MetricsRegistry()
+
+async def run_snapshot_writer(directory: str, interval: float = METRICS_FLUSH_INTERVAL) -> None:
+    """Periodically publish this worker's metrics until cancelled, then publish once more."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            REGISTRY.write_snapshot(directory)
+    finally:
+        REGISTRY.write_snapshot(directory)
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route template and status code.",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from request start until the full response body is sent.",
+    ("method", "route")
+)
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.gauge(
+    "http_requests_in_progress", "HTTP requests currently being served.", ("method",)
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds", "SequenceDB operation time, including waiting for a pooled connection.",
+    ("operation",), DB_BUCKETS
+)
+DB_QUERY_ERRORS = REGISTRY.counter(
+    "db_query_errors_total", "SequenceDB operations that raised, by exception type.",
+    ("operation", "error")
+)
+AI_UPSTREAM_DURATION = REGISTRY.histogram(
+    "ai_upstream_request_duration_seconds", "Messages API request time, until the last byte read.",
+    ("mode", "outcome"), UPSTREAM_BUCKETS
+)
+AI_UPSTREAM_REQUESTS = REGISTRY.counter(
+    "ai_upstream_requests_total", "Messages API requests by outcome (ok or an error class).",
+    ("mode", "outcome")
+)
+AI_UPSTREAM_TOKENS = REGISTRY.counter(
+    "ai_upstream_tokens_total", "Tokens reported in Messages API usage.", ("type",)
+)
+AI_PARSE_FAILURES = REGISTRY.counter(
+    "ai_parse_failures_total", "Upstream responses with no usable shots.", ("mode",)
+)
+
+AI_ADMISSION_WAIT = REGISTRY.histogram(
+    "ai_admission_wait_seconds", "Time AI generations spent queued for an upstream slot.",
+    (), DEFAULT_BUCKETS
+)
+AI_ADMISSION_REJECTIONS = REGISTRY.counter(
+    "ai_admission_rejections_total", "AI requests turned away before reaching the upstream.",
+    ("reason",)
+)
+AI_UPSTREAM_RETRIES = REGISTRY.counter(
+    "ai_upstream_retries_total", "Messages API requests retried, by the outcome that caused the retry.",
+    ("mode", "outcome")
+)
+AI_POOL_REQUESTS = REGISTRY.counter(
+    "ai_pool_requests_total", "AI generation requests checked against the warm pool, by result.",
+    ("result",)
+)
+AI_POOL_REFILLS = REGISTRY.counter(
+    "ai_pool_refills_total", "Background warm pool generations, by outcome.", ("outcome",)
+)
+AI_LOCAL_GENERATIONS = REGISTRY.counter(
+    "ai_local_generations_total", "Sequences from the local generator, by why it was used.", ("reason",)
+)
+AI_HEDGES = REGISTRY.counter(
+    "ai_hedged_requests_total", "Hedge requests for slow generations: won, lost, or skipped for lack of budget.",
+    ("result",)
+)
+
+def upstream_outcome(status_code: Optional[int] = None, error: Optional[BaseException] = None) -> str:
+    """Classify a Messages API result into a low-cardinality outcome label."""
+    if error is not None:
+        # httpx is imported lazily so this module stays dependency-free
+        import httpx
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(error, httpx.RequestError):
+            return "network_error"
+        return "stream_error"
+    if status_code == 200:
+        return "ok"
+    if status_code == 429:
+        return "rate_limited"
+    if status_code is not None and status_code >= 500:
+        return "server_error"
+    return "client_error"
+
+def record_usage(usage: Optional[Dict[str, Any]]) -> None:
+    """Count the token usage block of a Messages API response or stream event."""
+    if not usage:
+        return
+    for field, token_type in (
+        ("input_tokens", "input"),
+        ("output_tokens", "output"),
+        ("cache_read_input_tokens", "cache_read"),
+        ("cache_creation_input_tokens", "cache_creation")
+    ):
+        value = usage.get(field)
+        if value:
+            AI_UPSTREAM_TOKENS.inc(value, type=token_type)
+
+def time_db_query(operation: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorate a blocking SequenceDB method to record its duration and errors."""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                DB_QUERY_ERRORS.inc(operation=operation, error=type(e).__name__)
+                raise
+            finally:
+                DB_QUERY_DURATION.observe(time.perf_counter() - start, operation=operation)
+        return wrapper
+    return decorator
+
+def _snake_case(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+def stats_collector(prefix: str, documentation: str, get_stats: Callable[[], Dict[str, Any]]) -> Collector:
+    """Expose the numeric fields of a stats() dict as gauges named prefix_field.
+
+    The registry labels each sample with the pid of the worker it came from.
+    """
+    def collect():
+        # Stats getters return None for services that were never started
+        for key, value in (get_stats() or {}).items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            yield f"{prefix}_{_snake_case(key)}", "gauge", f"{documentation} ({key}).", [((), value)]
+    return collect
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, status codes and latency per route.
+
+    Requests are labelled with the matched route template (e.g.
+    /api/sequences/{sequence_id}) rather than the raw path, to keep label
+    cardinality bounded. Timing covers the whole response body, so streamed
+    responses are measured until their last event.
+    """
+
+    def __init__(self, app: Callable[..., Any]):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Any], send: Callable[..., Any]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec(method=method)
+            # The router records the matched route in the shared scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=status_code)
+            HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=route_path)
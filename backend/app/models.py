@@ -1,7 +1,10 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, StrictInt
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
+VALID_SPORTS = ["badminton", "tennis", "volleyball", "table_tennis", "pickleball"]
+MAX_SEQUENCE_SHOTS = 10000
+
 class Shot(BaseModel):
     horizontal: str = Field(..., description="Horizontal position (Left, Center Left, Center, Center Right, Right)")
     depth: str = Field(..., description="Depth position (Back, Mid Back, Mid, Mid Front, Front)")
@@ -10,17 +13,26 @@ class Shot(BaseModel):
 class SequenceSettings(BaseModel):
     minDistance: Optional[float] = Field(None, ge=0, description="Minimum distance between shots")
     maxDistance: Optional[float] = Field(None, ge=0, description="Maximum distance between shots")
+    sport: Optional[str] = Field(None, max_length=50, description="Sport the sequence is for; trains that sport's local generator")
 
 class SequenceCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=100, description="Sequence name")
-    shots: List[Shot] = Field(..., min_items=1, max_items=100, description="List of shots in sequence")
+    shots: List[Shot] = Field(..., min_items=1, max_items=MAX_SEQUENCE_SHOTS, description="List of shots in sequence")
     settings: Optional[SequenceSettings] = Field(None, description="Generation settings")
 
 class SequenceUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100, description="Updated sequence name")
-    shots: Optional[List[Shot]] = Field(None, min_items=1, max_items=100, description="Updated shots list")
+    shots: Optional[List[Shot]] = Field(None, min_items=1, max_items=MAX_SEQUENCE_SHOTS, description="Updated shots list")
     settings: Optional[SequenceSettings] = Field(None, description="Updated settings")
 
+class ShotPatchOp(BaseModel):
+    op: str = Field(..., description="append, insert, replace or delete")
+    index: Optional[StrictInt] = Field(None, ge=0, description="Shot index for insert, replace and delete, counted after earlier ops")
+    shot: Optional[Shot] = Field(None, description="Shot to append, insert or replace with")
+
+class SequencePatch(BaseModel):
+    ops: List[ShotPatchOp] = Field(..., min_items=1, max_items=MAX_SEQUENCE_SHOTS, description="Shot edits, applied in order and atomically")
+
 class SequenceMetadata(BaseModel):
     totalShots: int
     createdAt: str
@@ -29,12 +41,19 @@ class SequenceMetadata(BaseModel):
 class SequenceResponse(BaseModel):
     id: str
     name: str
-    shots: List[Shot]
+    shots: List[Shot] = Field(..., description="First page of shots; fetch the rest from /sequences/{id}/shots")
+    nextShotsOffset: Optional[int] = Field(None, description="Offset of the first shot not included, or null if all are")
     settings: Optional[SequenceSettings]
     metadata: Optional[SequenceMetadata]
     createdAt: str
     updatedAt: str
 
+class ShotsPage(BaseModel):
+    shots: List[Shot]
+    offset: int
+    totalShots: int
+    nextOffset: Optional[int] = Field(None, description="Offset of the next page, or null after the last shot")
+
 class SequenceListItem(BaseModel):
     id: str
     name: str
@@ -51,8 +70,37 @@ class AIGenerationRequest(BaseModel):
     numShots: int = Field(..., ge=1, le=100, description="Number of shots to generate")
     minDistance: Optional[float] = Field(None, ge=0, description="Minimum distance between consecutive shots")
     maxDistance: Optional[float] = Field(None, ge=0, description="Maximum distance between consecutive shots")
+    mode: str = Field("ai", description="ai (falls back to the local generator if the upstream is unavailable) or local")
 
 class AIGenerationResponse(BaseModel):
     shots: List[Shot] = Field(..., description="Generated shot sequence")
     sport: str = Field(..., description="Sport type used for generation")
-    purpose: str = Field(..., description="Training objective used")
\ No newline at end of file
+    purpose: str = Field(..., description="Training objective used")
+
+class GenerationRequest(BaseModel):
+    numShots: int = Field(..., ge=1, le=100, description="Number of shots per sequence")
+    count: int = Field(1, ge=1, le=10000, description="Number of sequences to generate")
+    minDistance: Optional[float] = Field(None, ge=0, description="Minimum distance between consecutive shots")
+    maxDistance: Optional[float] = Field(None, ge=0, description="Maximum distance between consecutive shots")
+    seed: Optional[int] = Field(None, description="Random seed for reproducible output")
+
+class GenerationResponse(BaseModel):
+    sequences: List[List[Shot]] = Field(..., description="Generated shot sequences")
+
+class BatchCreateRequest(BaseModel):
+    sequences: List[Dict[str, Any]] = Field(..., min_items=1, max_items=5000, description="Sequences to create, each shaped like SequenceCreate")
+
+class BatchIdsRequest(BaseModel):
+    ids: List[str] = Field(..., min_items=1, max_items=5000, description="Sequence IDs")
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    id: Optional[str] = None
+    status: int = Field(..., description="HTTP-style status for this item")
+    error: Optional[str] = None
+    sequence: Optional[SequenceResponse] = None
+
+class BatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
\ No newline at end of file
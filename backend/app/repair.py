@@ -0,0 +1,151 @@
+"""Local repair of generated shot sequences.
+
+AI responses are often nearly right: one shot in the wrong space, a
+misspelled position, one shot too many, or a pair of shots that breaks the
+distance limits. Rather than discarding the whole response, repair_sequence
+finds the valid sequence that changes the fewest shots (Viterbi search over
+the 50 shot states), preferring replacements close to the original.
+"""
+import difflib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .court import (
+    DEPTH_POSITIONS,
+    HORIZONTAL_POSITIONS,
+    NUM_STATES,
+    SHOT_STATES,
+    STATES_PER_SPACE
+)
+from .generator import FIRST_SHOT_MASK, check_feasibility, get_transition_table, GenerationError
+
+class RepairError(ValueError):
+    """Raised when a response cannot be repaired into a valid sequence"""
+    pass
+
+# Changing a shot costs 1; among changes, prefer ones near the original position
+_NEARBY_WEIGHT = 0.01
+
+def _normalize_name(value: str) -> str:
+    return re.sub(r"[\s_\-]+", " ", value).strip().lower()
+
+def snap_position(value: Any, positions: List[str]) -> Optional[int]:
+    """Map a possibly malformed position to the nearest valid index, or None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return min(max(int(value), 0), len(positions) - 1)
+    if not isinstance(value, str):
+        return None
+    
+    normalized = [_normalize_name(name) for name in positions]
+    name = _normalize_name(value)
+    if name in normalized:
+        return normalized.index(name)
+    if name.isdigit():
+        return min(int(name), len(positions) - 1)
+    
+    matches = difflib.get_close_matches(name, normalized, n=1, cutoff=0.6)
+    return normalized.index(matches[0]) if matches else None
+
+def preferred_grid(shot: Any) -> Optional[Tuple[int, int]]:
+    """Grid coordinates a raw shot asks for, or None if it is unusable."""
+    if not isinstance(shot, dict):
+        return None
+    horizontal = snap_position(shot.get("horizontal"), HORIZONTAL_POSITIONS)
+    depth = snap_position(shot.get("depth"), DEPTH_POSITIONS)
+    if horizontal is None or depth is None:
+        return None
+    return horizontal, depth
+
+def _state_costs(grid: Optional[Tuple[int, int]], space: int, rng: np.random.Generator) -> np.ndarray:
+    """Cost of placing each state at a position whose raw shot asked for `grid`."""
+    costs = np.full(NUM_STATES, np.inf)
+    offset = (space - 1) * STATES_PER_SPACE
+    depth_count = len(DEPTH_POSITIONS)
+    
+    for within in range(STATES_PER_SPACE):
+        x, y = divmod(within, depth_count)
+        if grid is None:
+            # Missing or padded shot: any position, ties broken at random
+            costs[offset + within] = 1 + _NEARBY_WEIGHT * rng.random()
+        elif (x, y) == grid:
+            costs[offset + within] = 0.0
+        else:
+            costs[offset + within] = 1 + _NEARBY_WEIGHT * float(np.hypot(x - grid[0], y - grid[1]))
+    
+    return costs
+
+def repair_sequence(raw_shots: List[Any], num_shots: int,
+                    min_distance: Optional[float] = None,
+                    max_distance: Optional[float] = None,
+                    rng: Optional[np.random.Generator] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """Return (shots, number of shots changed) for the closest valid sequence.
+
+    Fixes space alternation, trims or pads to `num_shots`, snaps unknown or
+    out-of-range positions and resolves distance violations.
+    """
+    try:
+        check_feasibility(num_shots, min_distance, max_distance)
+    except GenerationError as e:
+        raise RepairError(str(e))
+    
+    rng = rng if rng is not None else np.random.default_rng()
+    table = get_transition_table(min_distance, max_distance)
+    
+    grids = [preferred_grid(shot) for shot in raw_shots[:num_shots]]
+    grids += [None] * (num_shots - len(grids))
+    
+    # Viterbi: best[s] is the minimum cost of a valid prefix ending in state s
+    transition_cost = np.where(table.valid, 0.0, np.inf)
+    best = np.where(FIRST_SHOT_MASK, _state_costs(grids[0], 1, rng), np.inf)
+    back_pointers = []
+    for step in range(1, num_shots):
+        totals = best[:, None] + transition_cost
+        back_pointers.append(totals.argmin(axis=0))
+        best = totals.min(axis=0) + _state_costs(grids[step], step % 2 + 1, rng)
+    
+    if not np.isfinite(best.min()):
+        raise RepairError("No valid sequence satisfies the constraints")
+    
+    states = [int(best.argmin())]
+    for pointers in reversed(back_pointers):
+        states.append(int(pointers[states[-1]]))
+    states.reverse()
+    
+    changed = sum(
+        1 for step, state in enumerate(states)
+        if step >= len(raw_shots) or dict(SHOT_STATES[state]) != raw_shots[step]
+    ) + max(len(raw_shots) - num_shots, 0)
+    
+    return [dict(SHOT_STATES[state]) for state in states], changed
+
+def repair_next_shot(raw_shot: Any, step: int, previous_state: Optional[int], num_shots: int,
+                     min_distance: Optional[float] = None,
+                     max_distance: Optional[float] = None,
+                     rng: Optional[np.random.Generator] = None) -> Tuple[int, bool]:
+    """Greedy one-shot repair for streaming: (state, changed) for shot `step` of `num_shots`.
+
+    Chooses the valid successor of `previous_state` closest to what the raw
+    shot asked for. Because valid transitions are symmetric, any state that
+    has a successor can always be continued, so greedy choices never strand
+    the rest of the sequence; only a first shot that another shot follows
+    needs one.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    table = get_transition_table(min_distance, max_distance)
+    
+    costs = _state_costs(preferred_grid(raw_shot), step % 2 + 1, rng)
+    if previous_state is None:
+        allowed = FIRST_SHOT_MASK & (table.out_degree > 0) if num_shots > 1 else FIRST_SHOT_MASK
+    else:
+        allowed = table.valid[previous_state]
+    costs = np.where(allowed, costs, np.inf)
+    
+    if not np.isfinite(costs.min()):
+        raise RepairError("No valid shot satisfies the constraints")
+    
+    state = int(costs.argmin())
+    return state, dict(SHOT_STATES[state]) != raw_shot
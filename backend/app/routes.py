@@ -1,61 +1,312 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+import asyncio
+import json
+import orjson
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
 from .models import (
     SequenceCreate, 
     SequenceUpdate, 
+    SequencePatch,
     SequenceResponse, 
     SequenceListItem,
+    ShotsPage,
     ErrorResponse,
     AIGenerationRequest,
-    AIGenerationResponse
+    AIGenerationResponse,
+    GenerationRequest,
+    GenerationResponse,
+    SequenceSettings,
+    BatchCreateRequest,
+    BatchIdsRequest,
+    BatchResponse,
+    VALID_SPORTS
 )
-from .database import SequenceDB
-from .ai_service import get_ai_service, AIGenerationError
+from .database import AsyncSequenceDB, run_in_db_executor
+from .ai_cache import get_ai_cache, make_cache_key
+from .warm_pool import get_warm_pool
+from .local_model import AI_LOCAL_FALLBACK, AI_LOCAL_FALLBACK_AFTER, get_local_model
+from .singleflight import SingleFlight
+from .http_cache import SEQUENCE_CACHE_CONTROL, etag_matches, list_etag, sequence_etag, shots_etag
+from .generator import GenerationError, check_feasibility, generate_sequences
+from .ai_service import get_ai_service, AIGenerationError, AIUpstreamError
+from .admission import AdmissionRejected, get_rate_limiter, retry_after_header
 
 router = APIRouter(prefix="/api", tags=["sequences"])
 
+def _trusted_json(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """Serialize data that was validated on write, skipping response_model re-validation.
+
+    Returning a Response directly bypasses FastAPI's validate-then-encode
+    step; orjson then serializes the plain dicts. response_model is kept on
+    the routes for the API docs.
+    """
+    return ORJSONResponse(content=content, status_code=status_code, headers=headers)
+
+# Concurrent identical AI requests share one upstream call
+ai_generation_flights = SingleFlight()
+# Requests that find the local model stale share one reload of its counts
+local_model_refreshes = SingleFlight()
+
+def _check_settings_feasible(settings: Optional[SequenceSettings], num_shots: int) -> None:
+    """Reject distance settings that no sequence of this length can satisfy."""
+    if settings is None:
+        return
+    try:
+        check_feasibility(num_shots, settings.minDistance, settings.maxDistance)
+    except GenerationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid settings: {str(e)}")
+
 @router.post("/sequences", response_model=SequenceResponse, status_code=status.HTTP_201_CREATED)
 async def create_sequence(sequence: SequenceCreate):
     """Create a new shot sequence."""
     try:
+        _check_settings_feasible(sequence.settings, len(sequence.shots))
+        
         # Convert shots to dict format for database
         shots_data = [shot.dict() for shot in sequence.shots]
         settings_data = sequence.settings.dict() if sequence.settings else None
         
-        sequence_id = SequenceDB.create_sequence(
+        # The insert returns the stored row, so there is no re-read
+        created_sequence = await AsyncSequenceDB.create_sequence(
             name=sequence.name,
             shots=shots_data,
             settings=settings_data
         )
         
-        # Return the created sequence
-        created_sequence = SequenceDB.get_sequence(sequence_id)
-        if not created_sequence:
-            raise HTTPException(status_code=500, detail="Failed to create sequence")
+        return _trusted_json(created_sequence, status_code=status.HTTP_201_CREATED)
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def _batch_response(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    succeeded = sum(1 for result in results if result["status"] < 400)
+    # Fill every BatchItemResult field, as response_model validation would
+    results = [
+        {
+            "index": result["index"],
+            "id": result.get("id"),
+            "status": result["status"],
+            "error": result.get("error"),
+            "sequence": result.get("sequence")
+        }
+        for result in results
+    ]
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+@router.post("/sequences/batch", response_model=BatchResponse)
+async def create_sequences_batch(batch: BatchCreateRequest):
+    """Create many sequences in one transaction, reporting errors per item."""
+    try:
+        results = []
+        valid_items = []
+        
+        for index, item in enumerate(batch.sequences):
+            try:
+                sequence = SequenceCreate(**item)
+                _check_settings_feasible(sequence.settings, len(sequence.shots))
+            except ValidationError as e:
+                results.append({"index": index, "status": 422, "error": str(e)})
+                continue
+            except HTTPException as e:
+                results.append({"index": index, "status": e.status_code, "error": e.detail})
+                continue
+            
+            valid_items.append((index, {
+                "name": sequence.name,
+                "shots": [shot.dict() for shot in sequence.shots],
+                "settings": sequence.settings.dict() if sequence.settings else None
+            }))
+            results.append(None)
         
-        return created_sequence
+        created = await AsyncSequenceDB.create_sequences([item for _, item in valid_items])
+        for (index, _), (sequence_id, error) in zip(valid_items, created):
+            if error:
+                results[index] = {"index": index, "status": 400, "error": error}
+            else:
+                results[index] = {"index": index, "id": sequence_id, "status": 201}
+        
+        return _trusted_json(_batch_response(results))
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/sequences/batch/get", response_model=BatchResponse)
+async def get_sequences_batch(batch: BatchIdsRequest):
+    """Fetch many sequences by ID in one request."""
+    try:
+        found = await AsyncSequenceDB.get_sequences(batch.ids)
+        results = []
+        for index, sequence_id in enumerate(batch.ids):
+            sequence = found.get(sequence_id)
+            if sequence:
+                results.append({"index": index, "id": sequence_id, "status": 200, "sequence": sequence})
+            else:
+                results.append({"index": index, "id": sequence_id, "status": 404, "error": "Sequence not found"})
+        
+        return _trusted_json(_batch_response(results))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.post("/sequences/batch/delete", response_model=BatchResponse)
+async def delete_sequences_batch(batch: BatchIdsRequest):
+    """Delete many sequences in one transaction."""
+    try:
+        deleted = set(await AsyncSequenceDB.delete_sequences(batch.ids))
+        results = []
+        for index, sequence_id in enumerate(batch.ids):
+            if sequence_id in deleted:
+                results.append({"index": index, "id": sequence_id, "status": 204})
+                # A repeated ID only counts as deleted once
+                deleted.discard(sequence_id)
+            else:
+                results.append({"index": index, "id": sequence_id, "status": 404, "error": "Sequence not found"})
+        
+        return _trusted_json(_batch_response(results))
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": SEQUENCE_CACHE_CONTROL}
+    )
+
 @router.get("/sequences", response_model=List[SequenceListItem])
-async def get_all_sequences():
-    """Get all saved sequences (summary view)."""
+async def get_all_sequences(
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of sequences to return"),
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get saved sequences (summary view), newest first, one page at a time."""
     try:
-        sequences = SequenceDB.get_all_sequences()
-        return sequences
+        # Read the version before the page so the ETag is never newer than the data
+        etag = list_etag(await AsyncSequenceDB.get_list_version(), limit, after)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        
+        sequences, next_cursor = await AsyncSequenceDB.get_all_sequences(limit=limit, after=after)
+        headers = {"ETag": etag, "Cache-Control": SEQUENCE_CACHE_CONTROL}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return _trusted_json(sequences, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.get("/sequences/{sequence_id}", response_model=SequenceResponse)
-async def get_sequence(sequence_id: str):
+async def get_sequence(
+    sequence_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
     """Get a specific sequence by ID."""
     try:
-        sequence = SequenceDB.get_sequence(sequence_id)
+        # Answer conditional requests from updated_at alone, without loading shots
+        if if_none_match:
+            updated_at = await AsyncSequenceDB.get_sequence_updated_at(sequence_id)
+            if updated_at is None:
+                raise HTTPException(status_code=404, detail="Sequence not found")
+            etag = sequence_etag(sequence_id, updated_at)
+            if etag_matches(if_none_match, etag):
+                return _not_modified(etag)
+        
+        sequence = await AsyncSequenceDB.get_sequence(sequence_id)
         if not sequence:
             raise HTTPException(status_code=404, detail="Sequence not found")
         
-        return sequence
+        return _trusted_json(sequence, headers={
+            "ETag": sequence_etag(sequence_id, sequence["updatedAt"]),
+            "Cache-Control": SEQUENCE_CACHE_CONTROL
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Default and maximum shots per JSON page; NDJSON streams read this many per query
+SHOTS_PAGE_SIZE = 100
+SHOTS_PAGE_MAX = 1000
+
+def _wants_ndjson(accept: Optional[str]) -> bool:
+    return bool(accept) and any(
+        part.split(";")[0].strip() == NDJSON_MEDIA_TYPE for part in accept.split(",")
+    )
+
+async def _stream_shots(sequence_id: str, first_page: Dict[str, Any], limit: Optional[int]):
+    """Yield shots as NDJSON lines, reading one page at a time so memory stays flat."""
+    page = first_page
+    sent = 0
+    while True:
+        for shot in page["shots"]:
+            yield orjson.dumps(shot) + b"\n"
+        sent += len(page["shots"])
+        
+        offset = page["nextOffset"]
+        if offset is None or (limit is not None and sent >= limit):
+            return
+        
+        page_size = SHOTS_PAGE_MAX if limit is None else min(SHOTS_PAGE_MAX, limit - sent)
+        try:
+            page = await AsyncSequenceDB.get_shots(sequence_id, offset, page_size)
+        except Exception as e:
+            yield orjson.dumps({"error": f"Internal server error: {str(e)}", "offset": offset}) + b"\n"
+            return
+        # Pages come from separate reads; stop rather than splice two versions together
+        if page is None or page["updatedAt"] != first_page["updatedAt"]:
+            yield orjson.dumps({"error": "Sequence changed while streaming", "offset": offset}) + b"\n"
+            return
+
+@router.get("/sequences/{sequence_id}/shots", response_model=ShotsPage)
+async def get_sequence_shots(
+    sequence_id: str,
+    offset: int = Query(0, ge=0, description="Index of the first shot to return"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum shots to return; JSON pages default to 100 and allow at most 1000, NDJSON defaults to every remaining shot"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Read a range of a sequence's shots as a JSON page, or stream them as NDJSON (Accept: application/x-ndjson)."""
+    try:
+        ndjson = _wants_ndjson(accept)
+        if not ndjson:
+            limit = limit or SHOTS_PAGE_SIZE
+            if limit > SHOTS_PAGE_MAX:
+                raise HTTPException(status_code=400, detail=f"limit must be at most {SHOTS_PAGE_MAX}")
+        media_type = NDJSON_MEDIA_TYPE if ndjson else "application/json"
+        
+        if if_none_match:
+            updated_at = await AsyncSequenceDB.get_sequence_updated_at(sequence_id)
+            if updated_at is None:
+                raise HTTPException(status_code=404, detail="Sequence not found")
+            etag = shots_etag(sequence_id, updated_at, offset, limit, media_type)
+            if etag_matches(if_none_match, etag):
+                return _not_modified(etag)
+        
+        page_size = min(limit, SHOTS_PAGE_MAX) if limit else SHOTS_PAGE_MAX
+        page = await AsyncSequenceDB.get_shots(sequence_id, offset, page_size)
+        if page is None:
+            raise HTTPException(status_code=404, detail="Sequence not found")
+        
+        headers = {
+            "ETag": shots_etag(sequence_id, page["updatedAt"], offset, limit, media_type),
+            "Cache-Control": SEQUENCE_CACHE_CONTROL,
+            "X-Total-Shots": str(page["totalShots"])
+        }
+        if ndjson:
+            return StreamingResponse(_stream_shots(sequence_id, page, limit), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+        
+        del page["updatedAt"]
+        return _trusted_json(page, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -65,10 +316,9 @@ async def get_sequence(sequence_id: str):
 async def update_sequence(sequence_id: str, sequence_update: SequenceUpdate):
     """Update an existing sequence."""
     try:
-        # Check if sequence exists
-        existing = SequenceDB.get_sequence(sequence_id)
-        if not existing:
-            raise HTTPException(status_code=404, detail="Sequence not found")
+        # A settings-only update must still allow at least one transition
+        num_shots = len(sequence_update.shots) if sequence_update.shots else 2
+        _check_settings_feasible(sequence_update.settings, num_shots)
         
         # Prepare update data
         shots_data = None
@@ -79,23 +329,56 @@ async def update_sequence(sequence_id: str, sequence_update: SequenceUpdate):
         if sequence_update.settings:
             settings_data = sequence_update.settings.dict()
         
-        # Update sequence
-        success = SequenceDB.update_sequence(
+        # Update sequence; a single UPDATE ... RETURNING yields the final row
+        updated_sequence = await AsyncSequenceDB.update_sequence(
             sequence_id=sequence_id,
             name=sequence_update.name,
             shots=shots_data,
             settings=settings_data
         )
         
-        if not success:
+        if not updated_sequence:
             raise HTTPException(status_code=404, detail="Sequence not found")
         
-        # Return updated sequence
-        updated_sequence = SequenceDB.get_sequence(sequence_id)
-        return updated_sequence
+        return _trusted_json(updated_sequence)
     
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+SHOT_PATCH_OPS = ("append", "insert", "replace", "delete")
+
+def _patch_ops(patch: SequencePatch) -> List[Dict[str, Any]]:
+    """Check each op has the fields it needs and convert it for the database."""
+    ops = []
+    for number, op in enumerate(patch.ops):
+        if op.op not in SHOT_PATCH_OPS:
+            raise HTTPException(status_code=400, detail=f"Op {number}: op must be one of {', '.join(SHOT_PATCH_OPS)}")
+        if op.op != "append" and op.index is None:
+            raise HTTPException(status_code=400, detail=f"Op {number}: {op.op} needs an index")
+        if op.op != "delete" and op.shot is None:
+            raise HTTPException(status_code=400, detail=f"Op {number}: {op.op} needs a shot")
+        ops.append({"op": op.op, "index": op.index, "shot": op.shot.dict() if op.shot else None})
+    return ops
+
+@router.patch("/sequences/{sequence_id}", response_model=SequenceResponse)
+async def patch_sequence(sequence_id: str, patch: SequencePatch):
+    """Append, insert, replace or delete individual shots without resending the sequence."""
+    try:
+        # All ops apply in one transaction, or none do
+        patched_sequence = await AsyncSequenceDB.patch_sequence(sequence_id, _patch_ops(patch))
+        if not patched_sequence:
+            raise HTTPException(status_code=404, detail="Sequence not found")
+        
+        return _trusted_json(patched_sequence)
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -103,7 +386,7 @@ async def update_sequence(sequence_id: str, sequence_update: SequenceUpdate):
 async def delete_sequence(sequence_id: str):
     """Delete a sequence."""
     try:
-        success = SequenceDB.delete_sequence(sequence_id)
+        success = await AsyncSequenceDB.delete_sequence(sequence_id)
         if not success:
             raise HTTPException(status_code=404, detail="Sequence not found")
         
@@ -113,46 +396,311 @@ async def delete_sequence(sequence_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@router.post("/sequences/generate-ai", response_model=AIGenerationResponse)
-async def generate_ai_sequence(request: AIGenerationRequest):
-    """Generate a shot sequence using AI based on sport and training purpose."""
-    try:
-        # Validate sport
-        valid_sports = ["badminton", "tennis", "volleyball", "table_tennis", "pickleball"]
-        if request.sport.lower() not in valid_sports:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid sport. Must be one of: {', '.join(valid_sports)}"
+@router.post("/sequences/generate", response_model=GenerationResponse)
+async def generate_sequence_batch(request: GenerationRequest):
+    """Generate one or more random sequences that respect the distance constraints."""
+    try:
+        sequences = await run_in_threadpool(
+            generate_sequences,
+            num_shots=request.numShots,
+            count=request.count,
+            min_distance=request.minDistance,
+            max_distance=request.maxDistance,
+            seed=request.seed
+        )
+        
+        # Shots come straight from the validated state table, so skip
+        # re-validating potentially hundreds of thousands of them
+        return _trusted_json({"sequences": sequences})
+    
+    except GenerationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+AI_MODES = ["ai", "local"]
+
+def _validate_ai_request(request: AIGenerationRequest) -> str:
+    """Check an AI generation request up front and return its normalized sport."""
+    sport = request.sport.lower()
+    if sport not in VALID_SPORTS:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Invalid sport. Must be one of: {', '.join(VALID_SPORTS)}"
+        )
+    
+    if request.mode not in AI_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Must be one of: {', '.join(AI_MODES)}")
+    
+    # Reject impossible distance constraints before touching the AI service
+    try:
+        check_feasibility(request.numShots, request.minDistance, request.maxDistance)
+    except GenerationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return sport
+
+class AIServiceUnavailable(HTTPException):
+    """The AI service is not configured or could not be created."""
+    pass
+
+def _require_ai_service():
+    try:
+        return get_ai_service()
+    except ValueError as e:
+        if "ANTHROPIC_API_KEY" in str(e):
+            raise AIServiceUnavailable(
+                status_code=500, 
+                detail="AI service not configured: ANTHROPIC_API_KEY environment variable is required"
             )
+        raise AIServiceUnavailable(status_code=500, detail=f"AI service initialization failed: {str(e)}")
+
+# Upstream failures the local generator stands in for when fallback is enabled
+LOCAL_FALLBACK_ERRORS = (AIServiceUnavailable, AdmissionRejected, AIUpstreamError, asyncio.TimeoutError)
+
+def _fallback_reason(error: Exception) -> str:
+    if isinstance(error, AIServiceUnavailable):
+        return "unconfigured"
+    if isinstance(error, AdmissionRejected):
+        return "overloaded"
+    if isinstance(error, asyncio.TimeoutError):
+        return "slow"
+    return "upstream_error"
+
+async def _generate_locally(sport: str, request: AIGenerationRequest, reason: str) -> List[Dict[str, Any]]:
+    """Sample a sequence from the Markov model of saved sequences."""
+    model = get_local_model()
+    if model.is_stale():
+        await local_model_refreshes.do("refresh", lambda: run_in_db_executor(model.refresh))
+    return model.generate(sport, request.numShots, request.minDistance, request.maxDistance, reason=reason)
+
+def _retry_later(status_code: int, detail: str, retry_after: Optional[float]) -> HTTPException:
+    headers = {"Retry-After": retry_after_header(retry_after)} if retry_after is not None else None
+    return HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+async def _check_rate_limit(raw_request: Request) -> None:
+    """Spend one of the client's upstream request tokens, or reject with 429."""
+    limiter = get_rate_limiter()
+    if not limiter.enabled:
+        return
+    client = raw_request.client.host if raw_request.client else "unknown"
+    wait = await run_in_db_executor(limiter.acquire, client)
+    if wait > 0:
+        raise _retry_later(429, "Too many AI generation requests; slow down", wait)
+
+def _bypasses_cache(cache_control: Optional[str]) -> bool:
+    if cache_control is None:
+        return False
+    cache_control = cache_control.lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+@router.post("/sequences/generate-ai", response_model=AIGenerationResponse)
+async def generate_ai_sequence(
+    request: AIGenerationRequest,
+    raw_request: Request,
+    response: Response,
+    cache_control: Optional[str] = Header(None)
+):
+    """Generate a shot sequence using AI based on sport and training purpose.
+
+    With `mode: local`, or when the AI service is unconfigured, overloaded
+    or failing, the sequence comes from a local Markov model of saved
+    sequences instead (marked `X-Generator: local`). Popular requests are served from a warm pool of pre-generated
+    sequences, each used once. Other results are cached per normalized
+    request; send `Cache-Control: no-cache` to force a fresh generation.
+    Requests that start an upstream call are rate limited
+    per client (429) and queued behind a concurrency limit (503 when full),
+    both with Retry-After.
+    """
+    try:
+        sport = _validate_ai_request(request)
+        if request.mode == "local":
+            shots = await _generate_locally(sport, request, "requested")
+            response.headers["X-Generator"] = "local"
+            return AIGenerationResponse(shots=shots, sport=sport, purpose=request.purpose)
+        
+        cache = get_ai_cache()
+        cache_key = make_cache_key(sport, request.purpose, request.numShots,
+                                   request.minDistance, request.maxDistance)
+        bypass_cache = _bypasses_cache(cache_control)
+        
+        pool = get_warm_pool()
+        pool.record_request(cache_key, sport, request.purpose, request.numShots,
+                            request.minDistance, request.maxDistance)
+        if pool.is_hot(cache_key):
+            # A pooled sequence has never been served, so it is as fresh as a
+            # new generation and is used even when bypassing the cache
+            pooled_shots = await run_in_db_executor(pool.take, cache_key)
+            if pooled_shots is not None:
+                response.headers["X-Cache"] = "POOL"
+                return AIGenerationResponse(shots=pooled_shots, sport=sport, purpose=request.purpose)
+        
+        if bypass_cache:
+            cache.record_bypass()
+        else:
+            cached_shots = await run_in_db_executor(cache.get, cache_key)
+            if cached_shots is not None:
+                response.headers["X-Cache"] = "HIT"
+                return AIGenerationResponse(shots=cached_shots, sport=sport, purpose=request.purpose)
         
-        # Generate sequence using AI service
         try:
-            ai_service = get_ai_service()
-        except ValueError as e:
-            if "ANTHROPIC_API_KEY" in str(e):
-                raise HTTPException(
-                    status_code=500, 
-                    detail="AI service not configured: ANTHROPIC_API_KEY environment variable is required"
+            # Generate sequence using AI service
+            ai_service = _require_ai_service()
+            
+            async def generate_and_store():
+                shots = await ai_service.generate_sequence(
+                    sport=sport,
+                    purpose=request.purpose,
+                    num_shots=request.numShots,
+                    min_distance=request.minDistance,
+                    max_distance=request.maxDistance
                 )
-            raise HTTPException(status_code=500, detail=f"AI service initialization failed: {str(e)}")
-        
-        shots = await ai_service.generate_sequence(
-            sport=request.sport.lower(),
-            purpose=request.purpose,
-            num_shots=request.numShots,
-            min_distance=request.minDistance,
-            max_distance=request.maxDistance
-        )
+                await run_in_db_executor(cache.store, cache_key, [shot.dict() for shot in shots])
+                return shots
+            
+            # Only a request that starts an upstream call spends a rate limit
+            # token; one joining a generation already in flight costs nothing
+            if not ai_generation_flights.in_flight(cache_key):
+                await _check_rate_limit(raw_request)
+            
+            # An in-flight generation is as fresh as a new one, so bypassing
+            # requests are coalesced too
+            flight = ai_generation_flights.do(cache_key, generate_and_store)
+            if AI_LOCAL_FALLBACK and AI_LOCAL_FALLBACK_AFTER > 0:
+                # Giving up here leaves the shared generation running, so its
+                # result still reaches the cache
+                shots = await asyncio.wait_for(flight, AI_LOCAL_FALLBACK_AFTER)
+            else:
+                shots = await flight
+        except LOCAL_FALLBACK_ERRORS as e:
+            if not AI_LOCAL_FALLBACK:
+                raise
+            shots = await _generate_locally(sport, request, _fallback_reason(e))
+            response.headers["X-Generator"] = "local"
+            return AIGenerationResponse(shots=shots, sport=sport, purpose=request.purpose)
+        response.headers["X-Cache"] = "BYPASS" if bypass_cache else "MISS"
         
         return AIGenerationResponse(
             shots=shots,
-            sport=request.sport.lower(),
+            sport=sport,
             purpose=request.purpose
         )
         
+    except AdmissionRejected as e:
+        raise _retry_later(e.status_code, e.detail, e.retry_after)
+    except AIUpstreamError as e:
+        raise _retry_later(e.status_code, f"AI generation failed: {str(e)}", e.retry_after)
     except AIGenerationError as e:
         raise HTTPException(status_code=400, detail=f"AI generation failed: {str(e)}")
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/sequences/generate-ai/stream")
+async def stream_ai_sequence(
+    request: AIGenerationRequest,
+    raw_request: Request,
+    cache_control: Optional[str] = Header(None)
+):
+    """Generate a shot sequence using AI, streamed as Server-Sent Events.
+
+    Emits a `shot` event (`{"index", "shot"}`) as soon as each shot is
+    produced, then a `done` event, or an `error` event if generation fails
+    part-way through. The response starts with the first shot, so rate
+    limiting, a full queue or an upstream failure before it get a status code.
+    `mode: local` and the local fallback work as for /sequences/generate-ai.
+    """
+    local_shots = None
+    try:
+        sport = _validate_ai_request(request)
+        if request.mode == "local":
+            local_shots = await _generate_locally(sport, request, "requested")
+        
+        cache = get_ai_cache()
+        cache_key = make_cache_key(sport, request.purpose, request.numShots,
+                                   request.minDistance, request.maxDistance)
+        bypass_cache = _bypasses_cache(cache_control)
+        
+        cached_shots = None
+        if local_shots is None:
+            if bypass_cache:
+                cache.record_bypass()
+            else:
+                cached_shots = await run_in_db_executor(cache.get, cache_key)
+        
+        shot_stream = None
+        first_shot = None
+        if cached_shots is None and local_shots is None:
+            try:
+                ai_service = _require_ai_service()
+                await _check_rate_limit(raw_request)
+                shot_stream = ai_service.stream_sequence(
+                    sport=sport,
+                    purpose=request.purpose,
+                    num_shots=request.numShots,
+                    min_distance=request.minDistance,
+                    max_distance=request.maxDistance
+                )
+                try:
+                    first_shot = await shot_stream.__anext__()
+                except StopAsyncIteration:
+                    raise AIUpstreamError("AI stream ended before the first shot")
+            except LOCAL_FALLBACK_ERRORS as e:
+                if not AI_LOCAL_FALLBACK:
+                    raise
+                shot_stream = None
+                local_shots = await _generate_locally(sport, request, _fallback_reason(e))
+    except AdmissionRejected as e:
+        raise _retry_later(e.status_code, e.detail, e.retry_after)
+    except AIUpstreamError as e:
+        raise _retry_later(e.status_code, f"AI generation failed: {str(e)}", e.retry_after)
+    except AIGenerationError as e:
+        raise HTTPException(status_code=400, detail=f"AI generation failed: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+    async def events():
+        shots = []
+        try:
+            if cached_shots is not None or local_shots is not None:
+                for shot in (cached_shots if cached_shots is not None else local_shots):
+                    shots.append(shot)
+                    yield _sse_event("shot", {"index": len(shots) - 1, "shot": shot})
+            else:
+                shots.append(first_shot.dict())
+                yield _sse_event("shot", {"index": 0, "shot": shots[0]})
+                async for shot in shot_stream:
+                    shots.append(shot.dict())
+                    yield _sse_event("shot", {"index": len(shots) - 1, "shot": shots[-1]})
+                
+                await run_in_db_executor(cache.store, cache_key, shots)
+            
+            yield _sse_event("done", {"sport": sport, "purpose": request.purpose, "totalShots": len(shots)})
+        
+        except AIGenerationError as e:
+            yield _sse_event("error", {"detail": f"AI generation failed: {str(e)}"})
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Internal server error: {str(e)}"})
+    
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Disable proxy buffering so events flush immediately
+    }
+    if local_shots is not None:
+        headers["X-Generator"] = "local"
+    else:
+        headers["X-Cache"] = "HIT" if cached_shots is not None else ("BYPASS" if bypass_cache else "MISS")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Release the upstream slot even if the client left before the first event
+        background=BackgroundTask(shot_stream.aclose) if shot_stream is not None else None,
+        headers=headers
+    )
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""Compact binary encoding for shot lists.
+
+Format version 1 is a one-byte version header followed by one byte per shot
+holding its state number (see court.py). Columns written before the codec
+existed hold JSON text and are still decoded transparently.
+"""
+import json
+from typing import List, Dict, Any, Union
+from .court import NUM_STATES, SHOT_STATES, shot_to_state
+
+CODEC_VERSION = 1
+
+class ShotCodecError(ValueError):
+    """Raised for shot data that cannot be encoded or decoded"""
+    pass
+
+def encode_states(states: List[int]) -> bytes:
+    return bytes([CODEC_VERSION]) + bytes(states)
+
+def encode_shots(shots: List[Dict[str, Any]]) -> bytes:
+    """Encode a list of shot dicts."""
+    try:
+        return encode_states([shot_to_state(shot) for shot in shots])
+    except ValueError as e:
+        raise ShotCodecError(str(e))
+
+def decode_states(data: bytes) -> bytes:
+    """Return the raw state bytes of an encoded shot list."""
+    if not data or data[0] != CODEC_VERSION:
+        raise ShotCodecError(f"Unsupported shot codec version: {data[0] if data else None}")
+    
+    states = data[1:]
+    if states and max(states) >= NUM_STATES:
+        raise ShotCodecError("Corrupt shot data: state out of range")
+    return states
+
+def states_to_shots(states: bytes) -> List[Dict[str, Any]]:
+    """Expand raw state bytes into shot dicts."""
+    return [dict(SHOT_STATES[state]) for state in states]
+
+def decode_shots(data: Union[bytes, str]) -> List[Dict[str, Any]]:
+    """Decode a stored shots column into a list of shot dicts."""
+    if isinstance(data, str):
+        # Legacy JSON text column
+        return json.loads(data)
+    
+    return states_to_shots(decode_states(data))
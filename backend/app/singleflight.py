@@ -0,0 +1,46 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one shared call.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight await the same task. Each waiter is shielded, so a
+    cancelled waiter (e.g. a disconnected client) does not cancel the shared
+    call, and an exception is raised to every waiter.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self._started = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            self._started += 1
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        else:
+            self._coalesced += 1
+        
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a call for key is running, so do() would join it."""
+        return key in self._calls
+
+    def _finish(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inFlight": len(self._calls),
+            "started": self._started,
+            "coalesced": self._coalesced
+        }
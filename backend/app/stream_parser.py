@@ -0,0 +1,64 @@
+import json
+from typing import Any, List
+
+class IncrementalArrayParser:
+    """Parse the elements of a JSON array as its text arrives in pieces.
+
+    Text before the opening '[' is ignored. Each time an element object at
+    the top level of the array closes, it is decoded and returned from feed(),
+    so callers can act on elements before the rest of the array has arrived.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._element: List[str] = []
+
+    def feed(self, text: str) -> List[Any]:
+        """Consume more text and return any elements it completed."""
+        elements = []
+        
+        for char in text:
+            if self.finished:
+                break
+            
+            if not self.started:
+                if char == "[":
+                    self.started = True
+                continue
+            
+            if self._depth == 0:
+                # Between elements: only an object opening or the array end matters
+                if char == "{":
+                    self._depth = 1
+                    self._element = [char]
+                elif char == "]":
+                    self.finished = True
+                continue
+            
+            self._element.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        elements.append(json.loads("".join(self._element)))
+                    except json.JSONDecodeError:
+                        # Skip a malformed element; the caller pads missing shots
+                        pass
+                    self._element = []
+        
+        return elements
@@ -0,0 +1,295 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+from .admission import AdmissionRejected
+from .ai_service import AIGenerationError, ClaudeAIService
+from .database import DATA_DIR, get_db_connection, run_in_db_executor
+from .metrics import AI_POOL_REFILLS, AI_POOL_REQUESTS
+from .shot_codec import decode_shots, encode_shots
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where we run a single process
+    fcntl = None
+
+# Pre-generated sequences kept per popular request. Refills are upstream
+# calls nobody asked for yet, so the pool is opt-in: 0 (the default) disables it
+AI_POOL_SIZE = int(os.getenv("AI_POOL_SIZE", "0"))
+# How many of the most requested keys are pooled, and how popular they must be
+AI_POOL_KEYS = int(os.getenv("AI_POOL_KEYS", "20"))
+AI_POOL_MIN_DEMAND = float(os.getenv("AI_POOL_MIN_DEMAND", "3"))
+# Request counts halve over this many seconds, so the pool follows current traffic
+AI_POOL_DEMAND_HALF_LIFE = float(os.getenv("AI_POOL_DEMAND_HALF_LIFE", "3600"))
+# Pooled sequences older than this are discarded unserved
+AI_POOL_TTL = float(os.getenv("AI_POOL_TTL", "21600"))
+# Upstream generations the refill worker may spend per hour
+AI_POOL_BUDGET_PER_HOUR = int(os.getenv("AI_POOL_BUDGET_PER_HOUR", "60"))
+AI_POOL_INTERVAL = float(os.getenv("AI_POOL_INTERVAL", "10"))
+# Only refill while the upstream limiter is less loaded than this fraction
+AI_POOL_IDLE_LOAD = float(os.getenv("AI_POOL_IDLE_LOAD", "0.5"))
+
+LOCK_PATH = os.path.join(DATA_DIR, "ai_pool.lock")
+
+class WarmPool:
+    """Reservoirs of pre-generated AI sequences for the most requested keys.
+
+    Every worker counts requests per cache key and periodically adds them to
+    a shared, decaying demand table. One worker at a time (whichever holds
+    the lock file) refills the reservoirs of the hottest keys while the
+    upstream is idle, within an hourly generation budget. Each pooled
+    sequence is served exactly once, so every request gets its own variant.
+
+    Methods that touch SQLite block, so call them through run_in_db_executor.
+    """
+
+    def __init__(self, size: int = AI_POOL_SIZE, keys: int = AI_POOL_KEYS,
+                 min_demand: float = AI_POOL_MIN_DEMAND, half_life: float = AI_POOL_DEMAND_HALF_LIFE,
+                 ttl: float = AI_POOL_TTL, budget_per_hour: int = AI_POOL_BUDGET_PER_HOUR,
+                 interval: float = AI_POOL_INTERVAL, idle_load: float = AI_POOL_IDLE_LOAD,
+                 lock_path: str = LOCK_PATH):
+        self.size = size
+        self.keys = keys
+        self.min_demand = min_demand
+        self.half_life = half_life
+        self.ttl = ttl
+        self.budget_per_hour = budget_per_hour
+        self.interval = interval
+        self.idle_load = idle_load
+        self.lock_path = lock_path
+
+        self._lock = threading.Lock()
+        # key -> [request params, requests since the last flush]
+        self._demand: Dict[str, List[Any]] = {}
+        # Keys the pool may hold sequences for, refreshed on every flush
+        self._hot_keys: Set[str] = set()
+        self._lock_file = None
+        self._refill_times: Deque[float] = deque()
+
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "refills": 0,
+            "refillFailures": 0,
+            "expired": 0
+        }
+        self._pooled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and self.keys > 0
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def record_request(self, key: str, sport: str, purpose: str, num_shots: int,
+                       min_distance: Optional[float], max_distance: Optional[float]) -> None:
+        """Count a generation request towards its key's demand (in memory, non-blocking)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._demand.get(key)
+            if entry is None:
+                self._demand[key] = [(sport, purpose, num_shots, min_distance, max_distance), 1]
+            else:
+                entry[1] += 1
+
+    def is_hot(self, key: str) -> bool:
+        """Whether the pool may hold sequences for `key`; lets misses skip the database."""
+        return key in self._hot_keys
+
+    def take(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Remove and return one pooled sequence for `key`, or None if there is none."""
+        if not self.enabled:
+            return None
+        with get_db_connection() as conn:
+            row = conn.execute("""
+                DELETE FROM ai_pool WHERE id = (
+                    SELECT id FROM ai_pool WHERE key = ? AND created_at > ? ORDER BY id LIMIT 1
+                )
+                RETURNING shots
+            """, (key, time.time() - self.ttl)).fetchone()
+            conn.commit()
+
+        if row is None:
+            self._count("misses")
+            AI_POOL_REQUESTS.inc(result="miss")
+            return None
+        self._count("hits")
+        AI_POOL_REQUESTS.inc(result="hit")
+        return decode_shots(row["shots"])
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** (max(now - updated_at, 0.0) / self.half_life)
+
+    def flush_demand(self) -> None:
+        """Add this worker's request counts to the shared demand table and refresh the hot keys."""
+        with self._lock:
+            demand, self._demand = self._demand, {}
+
+        now = time.time()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+
+            if demand:
+                placeholders = ", ".join("?" * len(demand))
+                current = {
+                    row["key"]: self._decayed(row["score"], row["updated_at"], now)
+                    for row in cursor.execute(
+                        f"SELECT key, score, updated_at FROM ai_pool_demand WHERE key IN ({placeholders})",
+                        list(demand)
+                    )
+                }
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO ai_pool_demand
+                        (key, sport, purpose, num_shots, min_distance, max_distance, score, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (key, *params, current.get(key, 0.0) + count, now)
+                    for key, (params, count) in demand.items()
+                ])
+
+            # Forget keys whose demand has decayed to nothing
+            cursor.execute("DELETE FROM ai_pool_demand WHERE updated_at < ?", (now - 10 * self.half_life,))
+            # A stored score only decays, so keys below the threshold can be skipped
+            rows = cursor.execute(
+                "SELECT key, score, updated_at FROM ai_pool_demand WHERE score >= ?", (self.min_demand,)
+            ).fetchall()
+            conn.commit()
+
+        ranked = sorted(
+            ((self._decayed(row["score"], row["updated_at"], now), row["key"]) for row in rows),
+            reverse=True
+        )
+        self._hot_keys = {key for score, key in ranked[:self.keys] if score >= self.min_demand}
+
+    def next_refill(self) -> Optional[Dict[str, Any]]:
+        """Pick the hot key with the emptiest reservoir, dropping expired sequences first."""
+        if not self._hot_keys:
+            return None
+
+        now = time.time()
+        placeholders = ", ".join("?" * len(self._hot_keys))
+        with get_db_connection() as conn:
+            expired = conn.execute("DELETE FROM ai_pool WHERE created_at <= ?", (now - self.ttl,)).rowcount
+            rows = conn.execute(f"""
+                SELECT d.key, d.sport, d.purpose, d.num_shots, d.min_distance, d.max_distance,
+                       (SELECT COUNT(*) FROM ai_pool p WHERE p.key = d.key) AS pooled
+                FROM ai_pool_demand d WHERE d.key IN ({placeholders})
+            """, list(self._hot_keys)).fetchall()
+            self._pooled = conn.execute("SELECT COUNT(*) FROM ai_pool").fetchone()[0]
+            conn.commit()
+
+        if expired:
+            self._count("expired", expired)
+        candidates = [row for row in rows if row["pooled"] < self.size]
+        if not candidates:
+            return None
+        row = min(candidates, key=lambda row: row["pooled"])
+        return {
+            "key": row["key"],
+            "sport": row["sport"],
+            "purpose": row["purpose"],
+            "num_shots": row["num_shots"],
+            "min_distance": row["min_distance"],
+            "max_distance": row["max_distance"]
+        }
+
+    def put(self, key: str, shots: List[Dict[str, Any]]) -> None:
+        with get_db_connection() as conn:
+            conn.execute(
+                "INSERT INTO ai_pool (key, shots, created_at) VALUES (?, ?, ?)",
+                (key, encode_shots(shots), time.time())
+            )
+            conn.commit()
+        self._pooled += 1
+
+    def _budget_left(self) -> bool:
+        cutoff = time.monotonic() - 3600
+        while self._refill_times and self._refill_times[0] <= cutoff:
+            self._refill_times.popleft()
+        return len(self._refill_times) < self.budget_per_hour
+
+    def _try_lead(self) -> bool:
+        """Become the refilling worker if no other process holds the lock file."""
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            self._lock_file = True
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release_lead(self) -> None:
+        if self._lock_file not in (None, True):
+            # Closing the file drops the lock, so another worker can take over
+            self._lock_file.close()
+        self._lock_file = None
+
+    async def _refill(self, ai_service: ClaudeAIService) -> None:
+        while self._budget_left() and ai_service.limiter.load() < self.idle_load:
+            target = await run_in_db_executor(self.next_refill)
+            if target is None:
+                return
+            key = target.pop("key")
+
+            self._refill_times.append(time.monotonic())
+            try:
+                shots = await ai_service.generate_sequence(**target)
+            except (AIGenerationError, AdmissionRejected) as e:
+                self._count("refillFailures")
+                AI_POOL_REFILLS.inc(outcome="failed")
+                print(f"Warm pool refill failed: {e}")
+                return
+            await run_in_db_executor(self.put, key, [shot.dict() for shot in shots])
+            self._count("refills")
+            AI_POOL_REFILLS.inc(outcome="ok")
+
+    async def run(self, ai_service: ClaudeAIService) -> None:
+        """Flush demand and, in the leading worker, refill reservoirs until cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    await run_in_db_executor(self.flush_demand)
+                    if self._try_lead():
+                        await self._refill(ai_service)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Keep the worker alive through transient database errors
+                    print(f"Warm pool worker error: {e}")
+        finally:
+            self._release_lead()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update({
+            "size": self.size,
+            "hotKeys": len(self._hot_keys),
+            "leader": self._lock_file is not None,
+            "pooled": self._pooled,
+            "refillsLastHour": len(self._refill_times),
+            "budgetPerHour": self.budget_per_hour
+        })
+        return stats
+
+# Global instance - lazy initialization
+warm_pool = None
+
+def get_warm_pool() -> WarmPool:
+    global warm_pool
+    if warm_pool is None:
+        warm_pool = WarmPool()
+    return warm_pool
@@ -0,0 +1,125 @@
+"""Compare FastAPI's validate-then-serialize response path with the trusted orjson path.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_serialization [--iterations N] [--json]
+
+Each case serializes the same payload twice: once the way FastAPI does for
+a route that returns a dict under a response_model (validate against the
+model, jsonable_encoder, json.dumps), and once the way the read routes do
+now (ORJSONResponse over the plain dict). Times are CPU seconds from
+time.process_time, so they measure work done rather than wall-clock noise.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.generator import generate_sequences
+from app.models import BatchResponse, SequenceListItem, SequenceResponse
+from app.routes import _batch_response
+
+def _sequence(index: int, shots: List[Dict]) -> Dict:
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "id": f"00000000-0000-0000-0000-{index:012d}",
+        "name": f"Sequence {index}",
+        "shots": shots,
+        "nextShotsOffset": None,
+        "settings": {"minDistance": 0.0, "maxDistance": 4.0, "sport": None},
+        "metadata": {"totalShots": len(shots), "createdAt": now, "updatedAt": None},
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+def build_cases() -> List[Dict[str, Any]]:
+    """Build the payloads served by the read routes at realistic sizes."""
+    shots_100 = generate_sequences(100, 100, seed=1)
+    sequences = [_sequence(i, shots) for i, shots in enumerate(shots_100)]
+    list_items = [
+        {
+            "id": seq["id"],
+            "name": seq["name"],
+            "totalShots": len(seq["shots"]),
+            "createdAt": seq["createdAt"],
+            "updatedAt": seq["updatedAt"]
+        }
+        for seq in sequences
+    ] * 10
+    batch = _batch_response([
+        {"index": i, "id": seq["id"], "status": 200, "sequence": seq}
+        for i, seq in enumerate(sequences)
+    ])
+    return [
+        {"name": "GET /sequences/{id} (100 shots)", "model": SequenceResponse, "content": sequences[0]},
+        {"name": "GET /sequences?limit=1000", "model": List[SequenceListItem], "content": list_items},
+        {"name": "POST /sequences/batch/get (100 x 100 shots)", "model": BatchResponse, "content": batch}
+    ]
+
+def _validated(model: Any, content: Any) -> Callable[[], bytes]:
+    field = create_response_field(name="Response", type_=model)
+
+    def run() -> bytes:
+        encoded = asyncio.run(serialize_response(field=field, response_content=content))
+        return JSONResponse(content=encoded).body
+
+    return run
+
+def _trusted(content: Any) -> Callable[[], bytes]:
+    def run() -> bytes:
+        return ORJSONResponse(content=content).body
+
+    return run
+
+def _measure(func: Callable[[], bytes], iterations: int) -> float:
+    func()
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations
+
+def run_benchmark(iterations: int) -> List[Dict[str, Any]]:
+    results = []
+    for case in build_cases():
+        validated = _validated(case["model"], case["content"])
+        trusted = _trusted(case["content"])
+        # Both paths must produce the same document
+        assert json.loads(validated()) == json.loads(trusted()), case["name"]
+
+        validated_s = _measure(validated, iterations)
+        trusted_s = _measure(trusted, iterations)
+        results.append({
+            "case": case["name"],
+            "bytes": len(trusted()),
+            "validatedUs": round(validated_s * 1e6, 1),
+            "trustedUs": round(trusted_s * 1e6, 1),
+            "speedup": round(validated_s / trusted_s, 1) if trusted_s else None
+        })
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.iterations)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'case':<46} {'bytes':>9} {'validated us':>13} {'trusted us':>11} {'speedup':>8}")
+    for row in results:
+        print(
+            f"{row['case']:<46} {row['bytes']:>9} {row['validatedUs']:>13} "
+            f"{row['trustedUs']:>11} {str(row['speedup']) + 'x':>8}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare two run_benchmarks result files route by route.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+Prints p50, p99 and throughput for each route present in both files, with
+the relative change. Routes whose p99 got worse by more than --threshold
+percent are marked, and the exit status is 1 if any were.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Tuple
+
+def _index(results: Dict[str, Any]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    routes = {}
+    for dataset in results.get("datasets", []):
+        for route in dataset["routes"]:
+            routes[(f"{dataset['sequences']}", route["route"])] = route
+    for route in results.get("upstream", {}).get("routes", []):
+        routes[("upstream", route["route"])] = route
+    return routes
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Flag routes whose p99 regressed by more than this percentage")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = _index(json.load(f))
+    with open(args.candidate) as f:
+        candidate = _index(json.load(f))
+
+    regressions = 0
+    print(f"{'dataset':<9} {'route':<60} {'p50 ms':>17} {'p99 ms':>17} {'rps':>15}")
+    for key in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[key], candidate[key]
+        p50 = _change(old["latencyMs"]["p50"], new["latencyMs"]["p50"])
+        p99 = _change(old["latencyMs"]["p99"], new["latencyMs"]["p99"])
+        rps = _change(old["throughputRps"], new["throughputRps"])
+        flag = ""
+        if p99 > args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{key[0]:<9} {key[1]:<60} "
+              f"{new['latencyMs']['p50']:>9.2f} {p50:>+6.1f}% "
+              f"{new['latencyMs']['p99']:>9.2f} {p99:>+6.1f}% "
+              f"{new['throughputRps']:>7.1f} {rps:>+6.1f}%{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
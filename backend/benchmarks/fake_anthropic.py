@@ -0,0 +1,224 @@
+"""Local stand-in for the Anthropic Messages API, used to load-test /generate-ai offline.
+
+Run it on its own and point the backend at it:
+
+    python -m benchmarks.fake_anthropic --port 8765 --latency 0.8 --error-rate 0.05
+    ANTHROPIC_API_URL=http://127.0.0.1:8765/v1/messages ANTHROPIC_API_KEY=fake uvicorn app.main:app
+
+Behaviour is configured with FAKE_ANTHROPIC_* environment variables (or the
+matching command-line flags) and can be changed while running with
+POST /control. GET /stats reports how many requests were served and how.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+HORIZONTAL = ["Left", "Center Left", "Center", "Center Right", "Right"]
+DEPTH = ["Back", "Mid Back", "Mid", "Mid Front", "Front"]
+
+def _default_config() -> Dict[str, Any]:
+    return {
+        # Seconds before the response (or the first streamed event) is sent
+        "latency": float(os.getenv("FAKE_ANTHROPIC_LATENCY", "0.5")),
+        # Uniform jitter applied to latency, as a fraction of it
+        "jitter": float(os.getenv("FAKE_ANTHROPIC_JITTER", "0.2")),
+        # Fraction of requests that take slow_latency instead, to model a latency tail
+        "slow_rate": float(os.getenv("FAKE_ANTHROPIC_SLOW_RATE", "0")),
+        "slow_latency": float(os.getenv("FAKE_ANTHROPIC_SLOW_LATENCY", "10")),
+        # Delay between streamed text chunks
+        "chunk_delay": float(os.getenv("FAKE_ANTHROPIC_CHUNK_DELAY", "0.005")),
+        "chunk_size": int(os.getenv("FAKE_ANTHROPIC_CHUNK_SIZE", "16")),
+        # Fraction of requests answered with error_status (529 overloaded by default)
+        "error_rate": float(os.getenv("FAKE_ANTHROPIC_ERROR_RATE", "0")),
+        "error_status": int(os.getenv("FAKE_ANTHROPIC_ERROR_STATUS", "529")),
+        # Fraction of requests answered with 429 and a retry-after header
+        "rate_limit_rate": float(os.getenv("FAKE_ANTHROPIC_RATE_LIMIT_RATE", "0")),
+        "retry_after": float(os.getenv("FAKE_ANTHROPIC_RETRY_AFTER", "1")),
+        # Fraction of successful responses with a missing shot and an invalid value
+        "malformed_rate": float(os.getenv("FAKE_ANTHROPIC_MALFORMED_RATE", "0")),
+        # Shortest cache_control prefix that is cached, in estimated tokens
+        # (the real API's minimum for Sonnet models is 1024)
+        "cache_min_tokens": int(os.getenv("FAKE_ANTHROPIC_CACHE_MIN_TOKENS", "1024")),
+        "seed": os.getenv("FAKE_ANTHROPIC_SEED")
+    }
+
+config = _default_config()
+counters = {"requests": 0, "streamed": 0, "slow": 0, "ok": 0, "errors": 0, "rateLimited": 0, "malformed": 0, "cacheReads": 0}
+# Prompt prefixes written to the simulated prompt cache
+prompt_cache = set()
+rng = random.Random(config["seed"])
+
+app = FastAPI(title="Fake Anthropic Messages API")
+
+def _error_body(error_type: str, message: str) -> Dict[str, Any]:
+    return {"type": "error", "error": {"type": error_type, "message": message}}
+
+def _requested_shots(body: Dict[str, Any]) -> int:
+    """Find the shot count the prompt asks for, wherever the prompt text lives."""
+    text = json.dumps(body.get("system", "")) + json.dumps(body.get("messages", []))
+    match = re.search(r"exactly (\d+) shots", text)
+    return int(match.group(1)) if match else 10
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _input_usage(body: Dict[str, Any]) -> Dict[str, int]:
+    """Split input tokens like the real API does for cache_control breakpoints.
+
+    Everything up to the last system block marked for caching is the
+    cacheable prefix: the first request writes it, later identical ones
+    read it.
+    """
+    system = body.get("system", "")
+    blocks = [{"type": "text", "text": system}] if isinstance(system, str) else list(system)
+    prefix = ""
+    for i, block in enumerate(blocks):
+        if block.get("cache_control"):
+            prefix = json.dumps(blocks[:i + 1])
+    total = _estimate_tokens(json.dumps(blocks) + json.dumps(body.get("messages", [])))
+    usage = {"input_tokens": total, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+
+    cached = _estimate_tokens(prefix) if prefix else 0
+    if cached and cached >= config["cache_min_tokens"]:
+        usage["input_tokens"] = total - cached
+        if prefix in prompt_cache:
+            usage["cache_read_input_tokens"] = cached
+            counters["cacheReads"] += 1
+        else:
+            prompt_cache.add(prefix)
+            usage["cache_creation_input_tokens"] = cached
+    return usage
+
+def _shots(num_shots: int, malformed: bool) -> List[Dict[str, Any]]:
+    shots = [
+        {"horizontal": rng.choice(HORIZONTAL), "depth": rng.choice(DEPTH), "space": i % 2 + 1}
+        for i in range(num_shots)
+    ]
+    if malformed and shots:
+        # Drop the last shot and break alternation so the backend has to repair
+        shots = shots[:-1] or shots
+        shots[0]["space"] = 2
+        shots[0]["horizontal"] = "Centre-ish"
+    return shots
+
+async def _sleep_latency() -> None:
+    latency = config["latency"]
+    if rng.random() < config["slow_rate"]:
+        counters["slow"] += 1
+        latency = config["slow_latency"]
+    if latency > 0:
+        jitter = latency * config["jitter"]
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    body = await request.json()
+    counters["requests"] += 1
+    await _sleep_latency()
+
+    roll = rng.random()
+    if roll < config["rate_limit_rate"]:
+        counters["rateLimited"] += 1
+        return JSONResponse(
+            _error_body("rate_limit_error", "Number of requests has exceeded your rate limit"),
+            status_code=429,
+            headers={"retry-after": f"{config['retry_after']:g}"}
+        )
+    if roll < config["rate_limit_rate"] + config["error_rate"]:
+        counters["errors"] += 1
+        return JSONResponse(
+            _error_body("overloaded_error", "Overloaded"),
+            status_code=config["error_status"]
+        )
+
+    malformed = rng.random() < config["malformed_rate"]
+    if malformed:
+        counters["malformed"] += 1
+    text = "Here is the sequence:\n" + json.dumps(_shots(_requested_shots(body), malformed))
+    usage = {**_input_usage(body), "output_tokens": _estimate_tokens(text)}
+    message = {
+        "id": f"msg_fake_{counters['requests']}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "fake"),
+        "stop_reason": "end_turn",
+        "usage": usage
+    }
+    counters["ok"] += 1
+
+    if not body.get("stream"):
+        return {**message, "content": [{"type": "text", "text": text}]}
+
+    counters["streamed"] += 1
+
+    async def events():
+        yield _sse("message_start", {"type": "message_start", "message": {**message, "content": [], "usage": {**usage, "output_tokens": 1}}})
+        yield _sse("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        size = max(1, config["chunk_size"])
+        for start in range(0, len(text), size):
+            yield _sse("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text[start:start + size]}})
+            if config["chunk_delay"] > 0:
+                await asyncio.sleep(config["chunk_delay"])
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield _sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": usage["output_tokens"]}})
+        yield _sse("message_stop", {"type": "message_stop"})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/control")
+async def control(request: Request):
+    """Update any config key, e.g. {"latency": 2.0, "error_rate": 0.1}."""
+    updates = await request.json()
+    unknown = set(updates) - set(config)
+    if unknown:
+        return JSONResponse({"detail": f"Unknown keys: {sorted(unknown)}"}, status_code=400)
+    config.update(updates)
+    if "seed" in updates:
+        rng.seed(updates["seed"])
+    return config
+
+@app.post("/reset")
+async def reset():
+    for key in counters:
+        counters[key] = 0
+    prompt_cache.clear()
+    return counters
+
+@app.get("/stats")
+async def stats():
+    return {"config": config, **counters, "time": time.time()}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float)
+    parser.add_argument("--jitter", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--rate-limit-rate", type=float)
+    parser.add_argument("--malformed-rate", type=float)
+    parser.add_argument("--slow-rate", type=float)
+    parser.add_argument("--slow-latency", type=float)
+    args = parser.parse_args()
+
+    for key in ("latency", "jitter", "error_rate", "rate_limit_rate", "malformed_rate", "slow_rate", "slow_latency"):
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""Latency and throughput benchmarks for every backend route.
+
+Run from the backend directory:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --sizes 1000 --requests 200 --only sequences
+
+The suite starts the FastAPI app from app/main.py under uvicorn in a
+subprocess, with DATA_DIR pointing at a fresh temporary directory and
+ANTHROPIC_API_URL pointing at benchmarks.fake_anthropic running in a
+second subprocess. The database is seeded through the batch endpoint to
+each size in --sizes in turn (1k, 10k, 100k by default) and every route is
+measured at each size. The AI routes are then measured once against the
+fake upstream, with and without injected failures and a slow
+response tail (hedged unless --no-hedge is given).
+
+Latencies are measured by the client, so they include HTTP overhead on
+both sides. Results are written as JSON; compare two runs with
+benchmarks.compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.generator import generate_sequences
+from app.routes import VALID_SPORTS
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Largest payload the batch create endpoint accepts
+SEED_BATCH_SIZE = 5000
+
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(name: str, latencies: List[float], statuses: Dict[int, int], errors: int,
+              elapsed: float, concurrency: int, first_byte: Optional[List[float]] = None) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    completed = len(latencies)
+
+    def ms(values: List[float]) -> Dict[str, float]:
+        return {
+            "mean": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+            "p50": round(percentile(values, 50) * 1000, 3),
+            "p95": round(percentile(values, 95) * 1000, 3),
+            "p99": round(percentile(values, 99) * 1000, 3),
+            "max": round(values[-1] * 1000, 3) if values else 0.0
+        }
+
+    result = {
+        "route": name,
+        "requests": completed + errors,
+        "concurrency": concurrency,
+        "statusCounts": {str(code): count for code, count in sorted(statuses.items())},
+        "transportErrors": errors,
+        "elapsedSeconds": round(elapsed, 3),
+        "throughputRps": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latencyMs": ms(latencies)
+    }
+    if first_byte is not None:
+        result["firstByteMs"] = ms(sorted(first_byte))
+    return result
+
+async def measure(client: httpx.AsyncClient, name: str, make_request: Callable[[int], RequestSpec],
+                  requests: int, concurrency: int, stream: bool = False,
+                  on_response: Optional[Callable[[httpx.Response], None]] = None) -> Dict[str, Any]:
+    """Issue `requests` requests from `concurrency` workers and summarize latencies."""
+    latencies: List[float] = []
+    first_byte: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            method, url, kwargs = make_request(index)
+            start = time.perf_counter()
+            try:
+                if stream:
+                    async with client.stream(method, url, **kwargs) as response:
+                        first = None
+                        async for _ in response.aiter_raw():
+                            if first is None:
+                                first = time.perf_counter() - start
+                        first_byte.append(first if first is not None else time.perf_counter() - start)
+                else:
+                    response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if on_response:
+                on_response(response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+    return summarize(name, latencies, statuses, errors, elapsed, concurrency,
+                     first_byte if stream else None)
+
+class ServerProcess:
+    """A uvicorn subprocess that is ready once `health_path` answers."""
+
+    def __init__(self, target: List[str], port: int, env: Dict[str, str], health_path: str):
+        self.target = target
+        self.port = port
+        self.env = env
+        self.health_path = health_path
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "ServerProcess":
+        self.process = subprocess.Popen(
+            [sys.executable, *self.target],
+            cwd=BACKEND_DIR,
+            env={**os.environ, **self.env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{' '.join(self.target)} exited: {self.process.stderr.read().decode()}")
+            try:
+                if httpx.get(self.base_url + self.health_path, timeout=1).status_code < 500:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"{' '.join(self.target)} did not become ready")
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+class Seeder:
+    """Grows the database through POST /api/sequences/batch, remembering the ids."""
+
+    def __init__(self, client: httpx.AsyncClient, num_shots: int, rng: random.Random):
+        self.client = client
+        self.num_shots = num_shots
+        self.rng = rng
+        self.ids: List[str] = []
+        # A pool of valid shot lists, reused across seeded sequences
+        self.shot_pool = generate_sequences(num_shots, 1000, seed=rng.randrange(2 ** 32))
+
+    def payload(self, count: int, prefix: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": f"{prefix} {len(self.ids) + i}",
+                "shots": self.rng.choice(self.shot_pool),
+                "settings": {"minDistance": None, "maxDistance": None}
+            }
+            for i in range(count)
+        ]
+
+    async def seed_to(self, target: int) -> float:
+        started = time.perf_counter()
+        while len(self.ids) < target:
+            count = min(SEED_BATCH_SIZE, target - len(self.ids))
+            response = await self.client.post(
+                "/api/sequences/batch", json={"sequences": self.payload(count, "Seed")}, timeout=300
+            )
+            response.raise_for_status()
+            self.ids.extend(result["id"] for result in response.json()["results"] if result["id"])
+        return time.perf_counter() - started
+
+async def _deep_cursor(client: httpx.AsyncClient, depth: int) -> Optional[str]:
+    """Walk the list to roughly `depth` items in and return the cursor there."""
+    cursor = None
+    walked = 0
+    while walked < depth:
+        params = {"limit": 1000}
+        if cursor:
+            params["after"] = cursor
+        response = await client.get("/api/sequences", params=params)
+        cursor = response.headers.get("X-Next-Cursor")
+        walked += 1000
+        if not cursor:
+            break
+    return cursor
+
+def _print_result(result: Dict[str, Any]) -> None:
+    line = (f"  {result['route']:<56} p50 {result['latencyMs']['p50']:>9.2f} ms  "
+            f"p99 {result['latencyMs']['p99']:>9.2f} ms  {result['throughputRps']:>8.1f} rps")
+    if "upstream" in result:
+        line += f"  upstream calls {result['upstream']['requests']}"
+    print(line, flush=True)
+
+async def bench_dataset(client: httpx.AsyncClient, seeder: Seeder, size: int,
+                        args: argparse.Namespace, data_dir: str) -> Dict[str, Any]:
+    seed_seconds = await seeder.seed_to(size)
+    rng = seeder.rng
+    requests = args.requests
+    ids = list(seeder.ids)
+
+    first_page = await client.get("/api/sequences", params={"limit": 100})
+    list_etag = first_page.headers.get("ETag", "")
+    deep_cursor = await _deep_cursor(client, len(ids) // 2)
+    sample = ids[rng.randrange(len(ids))]
+    sample_etag = (await client.get(f"/api/sequences/{sample}")).headers.get("ETag", "")
+
+    created: List[str] = []
+    batch_created: List[List[str]] = []
+    batch_requests = max(1, requests // 10)
+
+    def random_id() -> str:
+        return ids[rng.randrange(len(ids))]
+
+    def record_created(response: httpx.Response) -> None:
+        if response.status_code == 201:
+            created.append(response.json()["id"])
+
+    def record_batch(response: httpx.Response) -> None:
+        if response.status_code == 200:
+            batch_created.append([result["id"] for result in response.json()["results"] if result["id"]])
+
+    # (name, request factory, request count, response hook). The create
+    # scenarios record their ids and the delete scenarios remove them again,
+    # so the seeded size is unchanged for the next dataset.
+    scenarios: List[Tuple[str, Callable[[int], RequestSpec], int, Optional[Callable[[httpx.Response], None]]]] = [
+        ("GET /", lambda i: ("GET", "/", {}), requests, None),
+        ("GET /health", lambda i: ("GET", "/health", {}), requests, None),
+        ("GET /stats", lambda i: ("GET", "/stats", {}), requests, None),
+        ("GET /api/sequences?limit=100",
+         lambda i: ("GET", "/api/sequences", {"params": {"limit": 100}}), requests, None),
+        ("GET /api/sequences?limit=1000",
+         lambda i: ("GET", "/api/sequences", {"params": {"limit": 1000}}), requests, None),
+        ("GET /api/sequences?limit=100&after=<middle>",
+         lambda i: ("GET", "/api/sequences", {"params": {"limit": 100, "after": deep_cursor} if deep_cursor else {"limit": 100}}),
+         requests, None),
+        ("GET /api/sequences (If-None-Match)",
+         lambda i: ("GET", "/api/sequences", {"params": {"limit": 100}, "headers": {"If-None-Match": list_etag}}),
+         requests, None),
+        ("GET /api/sequences/{id}", lambda i: ("GET", f"/api/sequences/{random_id()}", {}), requests, None),
+        ("GET /api/sequences/{id} (If-None-Match)",
+         lambda i: ("GET", f"/api/sequences/{sample}", {"headers": {"If-None-Match": sample_etag}}), requests, None),
+        ("POST /api/sequences/batch/get (100 ids)",
+         lambda i: ("POST", "/api/sequences/batch/get", {"json": {"ids": rng.sample(ids, min(100, len(ids)))}}),
+         requests, None),
+        ("POST /api/sequences/generate (100 x 20 shots)",
+         lambda i: ("POST", "/api/sequences/generate", {"json": {"numShots": 20, "count": 100, "minDistance": 1, "maxDistance": 3}}),
+         requests, None),
+        ("POST /api/sequences", lambda i: ("POST", "/api/sequences", {"json": seeder.payload(1, "Bench")[0]}),
+         requests, record_created),
+        ("PUT /api/sequences/{id}",
+         lambda i: ("PUT", f"/api/sequences/{random_id()}", {"json": {"name": f"Renamed {i}", "shots": rng.choice(seeder.shot_pool)}}),
+         requests, None),
+        ("DELETE /api/sequences/{id}", lambda i: ("DELETE", f"/api/sequences/{created[i]}", {}),
+         requests, None),
+        ("POST /api/sequences/batch (100 items)",
+         lambda i: ("POST", "/api/sequences/batch", {"json": {"sequences": seeder.payload(100, "Bench batch")}}),
+         batch_requests, record_batch),
+        ("POST /api/sequences/batch/delete (100 ids)",
+         lambda i: ("POST", "/api/sequences/batch/delete", {"json": {"ids": batch_created[i]}}),
+         batch_requests, None),
+    ]
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if args.only in scenario[0]]
+
+    routes = []
+    for name, make_request, count, on_response in scenarios:
+        if name.startswith("DELETE"):
+            count = min(count, len(created))
+        elif "batch/delete" in name:
+            count = min(count, len(batch_created))
+        if not count:
+            continue
+        result = await measure(client, name, make_request, count, args.concurrency, on_response=on_response)
+        routes.append(result)
+        _print_result(result)
+
+    db_path = Path(data_dir) / "sequences.db"
+    return {
+        "sequences": size,
+        "seedSeconds": round(seed_seconds, 3),
+        "databaseBytes": db_path.stat().st_size if db_path.exists() else None,
+        "routes": routes
+    }
+
+async def bench_upstream(client: httpx.AsyncClient, fake_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Load-test the AI routes against the fake Messages API."""
+    no_cache = {"Cache-Control": "no-cache"}
+    def body(i: int) -> Dict[str, Any]:
+        return {"sport": VALID_SPORTS[i % len(VALID_SPORTS)], "purpose": f"drill {i}", "numShots": 20,
+                "minDistance": 1, "maxDistance": 3}
+
+    scenarios = [
+        ("POST /api/sequences/generate-ai (cache miss)", {},
+         lambda i: ("POST", "/api/sequences/generate-ai", {"json": body(i), "headers": no_cache}), False),
+        ("POST /api/sequences/generate-ai (cache hit)", {},
+         lambda i: ("POST", "/api/sequences/generate-ai", {"json": body(0)}), False),
+        ("POST /api/sequences/generate-ai (identical concurrent misses)", {},
+         lambda i: ("POST", "/api/sequences/generate-ai", {"json": body(-1 - i // args.ai_concurrency)}), False),
+        ("POST /api/sequences/generate-ai/stream", {},
+         lambda i: ("POST", "/api/sequences/generate-ai/stream", {"json": body(i), "headers": no_cache}), True),
+        (f"POST /api/sequences/generate-ai (malformed {args.malformed_rate:g})", {"malformed_rate": args.malformed_rate},
+         lambda i: ("POST", "/api/sequences/generate-ai", {"json": body(i), "headers": no_cache}), False),
+        (f"POST /api/sequences/generate-ai (errors {args.error_rate:g})", {"error_rate": args.error_rate},
+         lambda i: ("POST", "/api/sequences/generate-ai", {"json": body(i), "headers": no_cache}), False),
+        (f"POST /api/sequences/generate-ai (429s {args.rate_limit_rate:g})", {"rate_limit_rate": args.rate_limit_rate, "retry_after": 0.2},
+         lambda i: ("POST", "/api/sequences/generate-ai", {"json": body(i), "headers": no_cache}), False),
+        (f"POST /api/sequences/generate-ai (slow tail {args.slow_rate:g})",
+         {"slow_rate": args.slow_rate, "slow_latency": args.slow_latency},
+         lambda i: ("POST", "/api/sequences/generate-ai", {"json": body(i), "headers": no_cache}), False),
+    ]
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if args.only in scenario[0]]
+
+    baseline = {"latency": args.upstream_latency, "jitter": 0.2, "error_rate": 0.0,
+                "rate_limit_rate": 0.0, "malformed_rate": 0.0, "slow_rate": 0.0}
+    routes = []
+    async with httpx.AsyncClient(base_url=fake_url) as fake:
+        for name, overrides, make_request, stream in scenarios:
+            await fake.post("/control", json={**baseline, **overrides})
+            await fake.post("/reset")
+            result = await measure(client, name, make_request, args.ai_requests, args.ai_concurrency, stream=stream)
+            result["upstream"] = (await fake.get("/stats")).json()
+            result["hedging"] = (await client.get("/stats")).json()["aiHedging"]
+            routes.append(result)
+            _print_result(result)
+    return {"fakeLatencySeconds": args.upstream_latency, "routes": routes}
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    data_dir = tempfile.mkdtemp(prefix="shot-sequence-bench-")
+    fake_port = _free_port()
+    app_port = _free_port()
+
+    fake = ServerProcess(
+        ["-m", "benchmarks.fake_anthropic", "--port", str(fake_port), "--latency", str(args.upstream_latency)],
+        fake_port, {"FAKE_ANTHROPIC_SEED": str(args.seed)}, "/stats"
+    )
+    app_env = {
+        "DATA_DIR": data_dir,
+        "ANTHROPIC_API_KEY": "benchmark",
+        "ANTHROPIC_API_URL": f"http://127.0.0.1:{fake_port}/v1/messages",
+        # Every benchmark request comes from one client address
+        "AI_RATE_LIMIT_PER_MINUTE": "0",
+        # Background refills would add upstream calls to the measured scenarios
+        "AI_POOL_SIZE": "0"
+    }
+    if args.no_hedge:
+        app_env["AI_HEDGE_BUDGET"] = "0"
+    server = ServerProcess(
+        ["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning", "--no-access-log"],
+        app_port, app_env, "/health"
+    )
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+            "dataDir": data_dir,
+            "args": vars(args)
+        },
+        "datasets": []
+    }
+
+    with fake, server:
+        limits = httpx.Limits(max_connections=max(args.concurrency, args.ai_concurrency))
+        async with httpx.AsyncClient(base_url=server.base_url, limits=limits, timeout=120) as client:
+            seeder = Seeder(client, args.shots, rng)
+            for size in args.sizes:
+                print(f"Dataset: {size} sequences", flush=True)
+                results["datasets"].append(await bench_dataset(client, seeder, size, args, data_dir))
+            if not args.skip_upstream:
+                print(f"Upstream: fake Messages API, {args.upstream_latency:g}s latency", flush=True)
+                results["upstream"] = await bench_upstream(client, fake.base_url, args)
+            results["serverStats"] = (await client.get("/stats")).json()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark every backend route")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Comma-separated dataset sizes, seeded cumulatively")
+    parser.add_argument("--shots", type=int, default=20, help="Shots per seeded sequence")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per route and dataset size")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--ai-requests", type=int, default=100, help="Requests per AI scenario")
+    parser.add_argument("--ai-concurrency", type=int, default=20)
+    parser.add_argument("--upstream-latency", type=float, default=0.5, help="Fake upstream latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="Injected upstream error rate")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.1, help="Injected upstream 429 rate")
+    parser.add_argument("--malformed-rate", type=float, default=0.5, help="Injected malformed response rate")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Fraction of slow upstream responses")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="Latency of slow upstream responses")
+    parser.add_argument("--no-hedge", action="store_true", help="Disable hedged AI requests, for comparison")
+    parser.add_argument("--skip-upstream", action="store_true", help="Skip the AI route scenarios")
+    parser.add_argument("--only", help="Only run scenarios whose name contains this text")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    args = parser.parse_args()
+    args.sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+        print(f"Wrote {args.output}")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Gunicorn configuration for multi-process serving:
+#   gunicorn app.main:app -c gunicorn.conf.py
+import glob
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Each async worker has its own event loop, connection pool and upstream
+# HTTP client. os.cpu_count() reports the host's cores, not the container's
+# share, so default to a small fixed count and let deployments raise it.
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Heartbeat timeout for a blocked worker; async requests may run longer
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Time in-flight requests (including SSE streams) get to finish on restart
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers periodically if set, e.g. to bound memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# X-Forwarded-* headers set the client address used for rate limiting, so
+# only a local proxy is trusted by default. Deployments behind a platform
+# proxy opt in with its addresses (or "*" if it is the only way in).
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+# Set when on_starting creates the metrics directory, so on_exit removes it
+_created_metrics_dir = None
+
+def on_starting(server):
+    """Runs once in the master before any worker is forked."""
+    global _created_metrics_dir
+    # Workers publish metrics snapshots here so /metrics reports totals. Set
+    # before importing app modules: workers inherit the master's imports.
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+            os.remove(path)
+    else:
+        _created_metrics_dir = tempfile.mkdtemp(prefix="shot-sequence-metrics-")
+        os.environ["METRICS_DIR"] = _created_metrics_dir
+
+    # Migrate the schema once here, so workers starting together only find
+    # it current instead of queueing on the write lock
+    from app.database import init_database
+    init_database()
+    server.log.info("Schema migrated; metrics shared through %s", os.environ["METRICS_DIR"])
+
+def on_exit(server):
+    if _created_metrics_dir:
+        shutil.rmtree(_created_metrics_dir, ignore_errors=True)
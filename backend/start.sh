@@ -4,5 +4,6 @@
 # Use PORT environment variable if available, default to 8000
 PORT=${PORT:-8000}
 
-# Start the application
-exec uvicorn app.main:app --host 0.0.0.0 --port $PORT
\ No newline at end of file
+# Start gunicorn with WEB_CONCURRENCY uvicorn workers (see gunicorn.conf.py)
+export PORT
+exec gunicorn app.main:app -c gunicorn.conf.py
\ No newline at end of file
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import tempfile
+
+import httpx
+import pytest
+
+# app.database reads DATA_DIR at import, so point it at a scratch directory
+# before any test imports the app; never touch the committed sequences.db
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="shot-sequence-tests-")
+os.environ.pop("ANTHROPIC_API_KEY", None)
+os.environ.pop("METRICS_DIR", None)
+
+from benchmarks import fake_anthropic  # noqa: E402
+
+@pytest.fixture
+def fake_upstream():
+    """The benchmarks' fake Messages API, reset to instant, error-free responses."""
+    fake_anthropic.config.update(fake_anthropic._default_config())
+    fake_anthropic.config.update({"latency": 0.0, "jitter": 0.0, "chunk_delay": 0.0})
+    fake_anthropic.rng.seed(0)
+    for key in fake_anthropic.counters:
+        fake_anthropic.counters[key] = 0
+    fake_anthropic.prompt_cache.clear()
+    return fake_anthropic
+
+@pytest.fixture
+def ai_service(fake_upstream):
+    """A ClaudeAIService whose client talks to the fake API in-process."""
+    from app.ai_service import ClaudeAIService
+
+    service = ClaudeAIService(api_key="test", api_url="http://fake-anthropic/v1/messages")
+    service._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_upstream.app))
+    service.retry_base_delay = 0.01
+    yield service
+    asyncio.run(service.close())
@@ -0,0 +1,189 @@
+import json
+import random
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from app import database
+from app.court import NUM_STATES
+from app.database import SequenceDB, ShotPatchError, init_database
+from app.shot_codec import states_to_shots
+
+@pytest.fixture(autouse=True)
+def migrated():
+    init_database()
+
+def shot(state):
+    return states_to_shots(bytes([state]))[0]
+
+def stored_transitions(cursor):
+    return {
+        (row["sport"], row["from_state"], row["to_state"]): row["count"]
+        for row in cursor.execute("SELECT sport, from_state, to_state, count FROM shot_transitions")
+        if row["count"]
+    }
+
+def recounted_transitions(cursor):
+    """Transition counts rebuilt from scratch out of every stored sequence."""
+    counts = Counter()
+    for row in cursor.execute("SELECT id, shots, settings FROM sequences").fetchall():
+        states = database._read_states(cursor, row["id"]) if isinstance(row["shots"], bytes) else b""
+        counts.update(database._transition_counts(database._stored_shots(row["shots"], states), row["settings"]))
+    return {key: count for key, count in counts.items() if count}
+
+def chunk_sizes(cursor, sequence_id):
+    return [row["size"] for row in cursor.execute(
+        "SELECT length(states) - 1 AS size FROM sequence_chunks WHERE sequence_id = ? ORDER BY chunk",
+        (sequence_id,)
+    )]
+
+def random_op(rng, total):
+    kind = rng.choice(["append", "insert", "replace", "delete"] if total > 1 else ["append", "insert", "replace"])
+    op = {"op": kind}
+    if kind == "insert":
+        op["index"] = rng.randint(0, total)
+    elif kind in ("replace", "delete"):
+        op["index"] = rng.randrange(total)
+    if kind != "delete":
+        op["shot"] = shot(rng.randrange(NUM_STATES))
+    return op
+
+def apply_to_list(states, op):
+    if op["op"] == "append":
+        states.append(op["shot"])
+    elif op["op"] == "insert":
+        states.insert(op["index"], op["shot"])
+    elif op["op"] == "replace":
+        states[op["index"]] = op["shot"]
+    else:
+        del states[op["index"]]
+
+@pytest.mark.parametrize("chunk_shots,key_gap", [(4, 4), (5, 1 << 20), (64, 1 << 20)])
+def test_random_patches_match_a_plain_list(monkeypatch, chunk_shots, key_gap):
+    # Tiny chunks and key gaps force splits, merges and renumbering
+    monkeypatch.setattr(database, "SEQUENCE_CHUNK_SHOTS", chunk_shots)
+    monkeypatch.setattr(database, "CHUNK_KEY_GAP", key_gap)
+    rng = random.Random(chunk_shots)
+    expected = [shot(rng.randrange(NUM_STATES)) for _ in range(30)]
+    sequence = SequenceDB.create_sequence("patched", expected, {"sport": "tennis"})
+
+    for _ in range(150):
+        ops = []
+        for _ in range(rng.randint(1, 4)):
+            # Later ops index into the list as earlier ops left it
+            ops.append(random_op(rng, len(expected)))
+            apply_to_list(expected, ops[-1])
+        SequenceDB.patch_sequence(sequence["id"], ops)
+
+        page = SequenceDB.get_shots(sequence["id"], 0, 1000)
+        assert page["shots"] == expected
+
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        sizes = chunk_sizes(cursor, sequence["id"])
+        assert sum(sizes) == len(expected)
+        assert all(0 < size <= chunk_shots for size in sizes)
+        assert stored_transitions(cursor) == recounted_transitions(cursor)
+
+    stored = SequenceDB.get_sequence(sequence["id"])
+    assert stored["metadata"]["totalShots"] == len(expected)
+
+def test_failed_patch_leaves_sequence_and_counts_unchanged():
+    sequence = SequenceDB.create_sequence("atomic", [shot(state) for state in range(10)], {"sport": "padel"})
+    with database.get_db_connection() as conn:
+        before = stored_transitions(conn.cursor())
+
+    with pytest.raises(ShotPatchError):
+        SequenceDB.patch_sequence(sequence["id"], [
+            {"op": "delete", "index": 0},
+            {"op": "replace", "index": True, "shot": shot(3)}
+        ])
+
+    assert SequenceDB.get_shots(sequence["id"], 0, 100)["shots"] == [shot(state) for state in range(10)]
+    with database.get_db_connection() as conn:
+        assert stored_transitions(conn.cursor()) == before
+
+def test_migrations_upgrade_a_baseline_database(tmp_path, monkeypatch):
+    path = tmp_path / "baseline.db"
+    conn = sqlite3.connect(path)
+    # The schema and JSON shot lists written before any migration existed
+    conn.execute("""
+        CREATE TABLE sequences (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            shots TEXT NOT NULL,
+            settings TEXT,
+            metadata TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    long_states = [state % NUM_STATES for state in range(150)]
+    legacy_shots = [{"horizontal": "Centre-ish", "depth": "Back", "space": 1}]
+    conn.executemany("INSERT INTO sequences (id, name, shots, settings) VALUES (?, ?, ?, ?)", [
+        ("short", "Short", json.dumps(states_to_shots(bytes([1, 2, 3]))), json.dumps({"sport": "tennis"})),
+        ("long", "Long", json.dumps(states_to_shots(bytes(long_states))), None),
+        ("legacy", "Legacy", json.dumps(legacy_shots), None)
+    ])
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, "DATABASE_PATH", str(path))
+    monkeypatch.setattr(database, "SEQUENCE_CHUNK_SHOTS", 64)
+    init_database()
+
+    conn = database._connect()
+    try:
+        cursor = conn.cursor()
+        assert cursor.execute("PRAGMA user_version").fetchone()[0] == len(database.MIGRATIONS)
+
+        rows = {row["id"]: row for row in cursor.execute("SELECT id, shots, total_shots FROM sequences")}
+        assert {key: row["total_shots"] for key, row in rows.items()} == {"short": 3, "long": 150, "legacy": 1}
+        assert rows["short"]["shots"] == rows["long"]["shots"] == database.CHUNKED_SHOTS
+        # Positions the codec cannot represent stay as JSON text
+        assert json.loads(rows["legacy"]["shots"]) == legacy_shots
+
+        assert database._read_states(cursor, "short") == bytes([1, 2, 3])
+        assert database._read_states(cursor, "long") == bytes(long_states)
+        assert database._read_states(cursor, "long", 100, 20) == bytes(long_states[100:120])
+        assert chunk_sizes(cursor, "long") == [64, 64, 22]
+
+        transitions = stored_transitions(cursor)
+        assert transitions == recounted_transitions(cursor)
+        assert transitions[("tennis", database.START_STATE, 1)] == 1
+        assert transitions[(database.ALL_SPORTS, database.START_STATE, 0)] == 1
+
+        tables = {row["name"] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"ai_cache", "table_versions", "rate_limits", "ai_pool", "ai_pool_demand",
+                "shot_transitions", "sequence_chunks"} <= tables
+    finally:
+        conn.close()
+
+    # Already current: a second run is a no-op
+    init_database()
+
+def test_updates_read_old_shots_only_when_counts_change(monkeypatch):
+    shots = [shot(state % NUM_STATES) for state in range(300)]
+    sequence = SequenceDB.create_sequence("updated", shots, {"sport": "tennis", "minDistance": 1.0})
+    reads = []
+    read_states = database._read_states
+
+    def recording_read_states(cursor, sequence_id, offset=0, limit=None):
+        reads.append(limit)
+        return read_states(cursor, sequence_id, offset, limit)
+
+    monkeypatch.setattr(database, "_read_states", recording_read_states)
+
+    updated = SequenceDB.update_sequence(sequence["id"], settings={"sport": "tennis", "minDistance": 2.0})
+    assert reads == [database.SEQUENCE_FIRST_PAGE_SHOTS]
+    assert updated["shots"] == shots[:database.SEQUENCE_FIRST_PAGE_SHOTS]
+    assert updated["settings"]["minDistance"] == 2.0
+
+    reads.clear()
+    SequenceDB.update_sequence(sequence["id"], settings={"sport": "padel"})
+    assert reads == [None]
+
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        assert stored_transitions(cursor) == recounted_transitions(cursor)
@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+from app.hedging import HedgePolicy
+
+def stub_upstream(ai_service, fake_upstream, primary_seconds, hedge_seconds):
+    """Replace upstream calls: each generation's first request is the primary, later ones hedges."""
+    calls = []
+
+    async def request_completion(sport, prompt):
+        seconds = primary_seconds if not calls else hedge_seconds
+        calls.append(seconds)
+        await asyncio.sleep(seconds)
+        return json.dumps(fake_upstream._shots(6, malformed=False))
+
+    ai_service._request_completion = request_completion
+    return calls
+
+def generate(ai_service, calls):
+    calls.clear()
+    return asyncio.run(ai_service.generate_sequence("tennis", "hedging", 6))
+
+def test_losing_hedges_do_not_drag_the_delay_down(ai_service, fake_upstream):
+    ai_service.hedging = HedgePolicy(percentile=50, budget=1.0, min_delay=0.0, initial_delay=0.015, burst=100)
+    calls = stub_upstream(ai_service, fake_upstream, primary_seconds=0.03, hedge_seconds=1.0)
+
+    for _ in range(HedgePolicy.MIN_SAMPLES + 5):
+        assert len(generate(ai_service, calls)) == 6
+
+    stats = ai_service.hedging.stats()
+    assert stats["hedged"] > 0
+    assert stats["hedgesWon"] == 0
+    # Only primaries were observed, so the delay tracks their latency
+    # instead of the time the cancelled hedges happened to run
+    assert stats["samples"] == HedgePolicy.MIN_SAMPLES + 5
+    assert stats["delaySeconds"] >= 0.025
+
+def test_hedge_wins_against_a_slow_primary(ai_service, fake_upstream):
+    ai_service.hedging = HedgePolicy(budget=1.0, min_delay=0.0, initial_delay=0.02, burst=1)
+    calls = stub_upstream(ai_service, fake_upstream, primary_seconds=1.0, hedge_seconds=0.01)
+
+    shots = generate(ai_service, calls)
+
+    assert len(shots) == 6
+    assert len(calls) == 2
+    stats = ai_service.hedging.stats()
+    assert stats["hedged"] == 1
+    assert stats["hedgesWon"] == 1
+    # The winning hedge and the censored primary are both observed
+    assert stats["samples"] == 2
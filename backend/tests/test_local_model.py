@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+from app import routes
+from app.local_model import LocalSequenceModel
+from app.models import AIGenerationRequest
+
+def test_equivalent_distance_limits_share_a_plan():
+    model = LocalSequenceModel()
+
+    # No court distance lies between 1.1 and 1.101, so both allow the same transitions
+    model.generate("tennis", 10, 1.1, 6.0)
+    model.generate("tennis", 10, 1.101, 6.0)
+    model.generate("tennis", 10, None, None)
+    model.generate("tennis", 10, 0.0, float("inf"))
+
+    assert model.stats()["plans"] == 2
+
+class SwappingPlans(OrderedDict):
+    """A plan cache that lets refresh() replace it while a lookup is in progress."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def get(self, key, default=None):
+        plan = super().get(key, default)
+        self.model._plans = OrderedDict()
+        return plan
+
+def test_refresh_between_plan_lookup_and_reuse():
+    model = LocalSequenceModel()
+    model.generate("tennis", 8)
+    plans = SwappingPlans(model)
+    plans.update(model._plans)
+    model._plans = plans
+
+    assert len(model.generate("tennis", 8)) == 8
+
+def test_stale_model_is_refreshed_once_for_concurrent_requests(monkeypatch):
+    model = LocalSequenceModel(refresh_interval=3600)
+    refreshes = []
+    release = threading.Event()
+
+    def refresh():
+        refreshes.append(1)
+        release.wait(5)
+        model._checked = float("inf")
+
+    monkeypatch.setattr(model, "refresh", refresh)
+    monkeypatch.setattr(routes, "get_local_model", lambda: model)
+    request = AIGenerationRequest(sport="tennis", purpose="local", numShots=6)
+
+    async def run():
+        calls = [asyncio.ensure_future(routes._generate_locally("tennis", request, "requested")) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*calls)
+
+    results = asyncio.run(run())
+
+    assert len(refreshes) == 1
+    assert [len(shots) for shots in results] == [6] * 5
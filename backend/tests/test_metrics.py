@@ -0,0 +1,44 @@
+import json
+import os
+
+from app import metrics
+
+def write_worker_snapshot(directory, pid, pool_size, requests):
+    snapshot = {
+        "metrics": {"requests_total": [[["GET"], requests]]},
+        "collected": [["db_pool_size", "gauge", "Pool (size).", [[[], pool_size]]]]
+    }
+    with open(os.path.join(directory, f"{pid}.json"), "w") as f:
+        json.dump(snapshot, f)
+
+def test_worker_stats_are_labelled_by_pid(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    registry = metrics.MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("method",))
+    requests.inc(2, method="GET")
+    registry.add_collector(metrics.stats_collector("db_pool", "Pool", lambda: {"size": 4, "name": "x"}))
+
+    live_pid = os.getppid()
+    write_worker_snapshot(tmp_path, live_pid, 5, 3)
+    # Not a running process: its counts survive, its gauges do not
+    write_worker_snapshot(tmp_path, 2 ** 22 + 1, 6, 10)
+
+    lines = registry.render().splitlines()
+
+    assert 'requests_total{method="GET"} 15.0' in lines
+    pool_lines = [line for line in lines if line.startswith("db_pool_size{")]
+    assert sorted(pool_lines) == sorted([
+        f'db_pool_size{{pid="{os.getpid()}"}} 4.0',
+        f'db_pool_size{{pid="{live_pid}"}} 5.0'
+    ])
+    assert lines.count("# TYPE db_pool_size gauge") == 1
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    registry = metrics.MetricsRegistry()
+    registry.add_collector(metrics.stats_collector("ai_cache", "Cache", lambda: {"hitCount": 7}))
+    registry.write_snapshot(str(tmp_path))
+
+    with open(tmp_path / f"{os.getpid()}.json") as f:
+        snapshot = json.load(f)
+
+    assert snapshot["collected"] == [["ai_cache_hit_count", "gauge", "Cache (hitCount).", [[[], 7]]]]
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+
+from app import routes
+from app.models import Shot
+
+class SlowService:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def generate_sequence(self, sport, purpose, num_shots, min_distance=None, max_distance=None):
+        self.calls += 1
+        await self.release.wait()
+        return [Shot(horizontal="Left", depth="Back", space=i % 2 + 1) for i in range(num_shots)]
+
+def test_coalesced_requests_do_not_spend_rate_limit_tokens(monkeypatch):
+    from app.main import app
+
+    service = SlowService()
+    charged = []
+
+    async def check_rate_limit(raw_request):
+        charged.append(raw_request.client)
+
+    monkeypatch.setattr(routes, "_require_ai_service", lambda: service)
+    monkeypatch.setattr(routes, "_check_rate_limit", check_rate_limit)
+    monkeypatch.setattr(routes, "AI_LOCAL_FALLBACK", False)
+
+    async def run():
+        body = {"sport": "tennis", "purpose": "coalesced rate limit", "numShots": 4}
+        headers = {"Cache-Control": "no-cache"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            requests = [
+                asyncio.ensure_future(client.post("/api/sequences/generate-ai", json=body, headers=headers))
+                for _ in range(3)
+            ]
+            while routes.ai_generation_flights.stats()["coalesced"] < 2:
+                await asyncio.sleep(0.01)
+            service.release.set()
+            return await asyncio.gather(*requests)
+
+    monkeypatch.setattr(routes.ai_generation_flights, "_coalesced", 0)
+    responses = asyncio.run(asyncio.wait_for(run(), 10))
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert service.calls == 1
+    assert len(charged) == 1
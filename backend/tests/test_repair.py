@@ -0,0 +1,65 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.court import SHOT_STATES, shot_to_state
+from app.generator import get_transition_table
+from app.repair import RepairError, repair_next_shot, repair_sequence
+
+def assert_valid(shots, num_shots, min_distance=None, max_distance=None):
+    assert len(shots) == num_shots
+    states = [shot_to_state(shot) for shot in shots]
+    table = get_transition_table(min_distance, max_distance)
+    assert states[0] < 25
+    assert all(table.valid[a, b] for a, b in zip(states, states[1:]))
+
+def test_valid_sequence_is_unchanged():
+    shots = [dict(SHOT_STATES[state]) for state in (0, 30, 5, 40)]
+    repaired, changed = repair_sequence(shots, 4)
+    assert repaired == shots
+    assert changed == 0
+
+def test_fixes_typos_spaces_and_length():
+    raw = [
+        {"horizontal": "center-left", "depth": "Back", "space": 1},
+        {"horizontal": "Right", "depth": "Frnt", "space": 1},
+        {"horizontal": "Left", "depth": "Mid", "space": 1},
+    ]
+    repaired, changed = repair_sequence(raw, 4, rng=np.random.default_rng(0))
+    assert_valid(repaired, 4)
+    # Typos snap to the position they name; the wrong space and the padding are changes
+    assert repaired[0] == {"horizontal": "Center Left", "depth": "Back", "space": 1}
+    assert (repaired[1]["horizontal"], repaired[1]["depth"]) == ("Right", "Front")
+    assert changed == 3
+
+def test_resolves_distance_violations():
+    raw = [dict(SHOT_STATES[state]) for state in (0, 25, 0, 25, 0)]
+    repaired, changed = repair_sequence(raw, 5, 3.0, 6.0, rng=np.random.default_rng(0))
+    assert_valid(repaired, 5, 3.0, 6.0)
+    assert changed > 0
+
+def test_infeasible_constraints_raise():
+    with pytest.raises(RepairError):
+        repair_sequence([], 3, 20.0, 30.0)
+
+def test_greedy_repair_never_strands_the_sequence():
+    rng = np.random.default_rng(3)
+    previous = None
+    states = []
+    for step in range(30):
+        previous, _ = repair_next_shot({"horizontal": "Left", "depth": "Back", "space": 1}, step, previous, 30,
+                                       2.0, 3.0, rng=rng)
+        states.append(previous)
+    assert_valid([dict(SHOT_STATES[state]) for state in states], 30, 2.0, 3.0)
+
+def test_malformed_upstream_responses_are_repaired(ai_service, fake_upstream):
+    fake_upstream.config["malformed_rate"] = 1.0
+
+    shots = asyncio.run(ai_service.generate_sequence("tennis", "footwork", 8, 1.0, 6.0))
+
+    assert_valid([shot.dict() for shot in shots], 8, 1.0, 6.0)
+    assert fake_upstream.counters["requests"] == 1
+    stats = ai_service.generation_stats()
+    assert stats["repairedResponses"] == 1
+    assert stats["repairedShots"] >= 2
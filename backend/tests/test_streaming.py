@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import routes
+from app.court import SHOT_STATES
+from app.generator import check_feasibility
+from app.repair import repair_next_shot
+from app.stream_parser import IncrementalArrayParser
+
+ARRAY = (
+    'Sure! Here it is: [{"horizontal": "Left", "depth": "Back", "space": 1},\n'
+    ' {"horizontal": "Right", "depth": "Front", "space": 2, "note": "a \\"quoted\\" [bracket] {brace}"},'
+    ' {"horizontal": "Center", "depth": "Mid", "space": 1, "nested": {"x": [1, 2]}}] trailing text'
+)
+EXPECTED = json.loads(ARRAY[ARRAY.index("["):ARRAY.rindex("]") + 1])
+
+def parse(pieces):
+    parser = IncrementalArrayParser()
+    elements = []
+    for piece in pieces:
+        elements.extend(parser.feed(piece))
+    return elements, parser
+
+def test_parses_one_character_at_a_time():
+    elements, parser = parse(ARRAY)
+    assert elements == EXPECTED
+    assert parser.finished
+
+@pytest.mark.parametrize("split", range(1, len(ARRAY)))
+def test_parses_across_every_chunk_boundary(split):
+    elements, _ = parse([ARRAY[:split], ARRAY[split:]])
+    assert elements == EXPECTED
+
+def test_elements_arrive_as_soon_as_they_close():
+    parser = IncrementalArrayParser()
+    first_end = ARRAY.index("},") + 1
+    assert parser.feed(ARRAY[:first_end]) == EXPECTED[:1]
+    assert parser.feed(ARRAY[first_end:]) == EXPECTED[1:]
+
+async def collect(stream):
+    return [shot.dict() async for shot in stream]
+
+def stream_with_chunk_size(ai_service, fake_upstream, chunk_size):
+    fake_upstream.config["chunk_size"] = chunk_size
+    fake_upstream.rng.seed(42)
+    return asyncio.run(collect(ai_service.stream_sequence("badminton", "rallies", 12)))
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7])
+def test_streams_the_same_shots_at_any_chunk_size(ai_service, fake_upstream, chunk_size):
+    whole = stream_with_chunk_size(ai_service, fake_upstream, 100000)
+    shots = stream_with_chunk_size(ai_service, fake_upstream, chunk_size)
+
+    assert len(shots) == 12
+    assert shots == whole
+    assert ai_service.generation_stats()["repairedResponses"] == 0
+
+def test_truncated_stream_is_padded(ai_service, fake_upstream):
+    fake_upstream.config["malformed_rate"] = 1.0
+
+    shots = asyncio.run(collect(ai_service.stream_sequence("tennis", "serves", 6)))
+
+    assert len(shots) == 6
+    assert [shot["space"] for shot in shots] == [1, 2, 1, 2, 1, 2]
+    assert ai_service.generation_stats()["repairedResponses"] == 1
+
+def test_single_shot_needs_no_valid_successor(ai_service, fake_upstream):
+    # No two court positions are 50 apart, but a one-shot sequence has no transitions
+    check_feasibility(1, 50.0, None)
+    state, _ = repair_next_shot(None, 0, None, 1, 50.0, None)
+    assert SHOT_STATES[state]["space"] == 1
+
+    shots = asyncio.run(collect(ai_service.stream_sequence("tennis", "one serve", 1, 50.0, None)))
+
+    assert len(shots) == 1
+    assert shots[0]["space"] == 1
+
+class EmptyStreamService:
+    def stream_sequence(self, **kwargs):
+        async def shots():
+            return
+            yield
+        return shots()
+
+def test_stream_ending_before_the_first_shot_is_a_502(monkeypatch):
+    monkeypatch.setattr(routes, "_require_ai_service", lambda: EmptyStreamService())
+    monkeypatch.setattr(routes, "AI_LOCAL_FALLBACK", False)
+    from app.main import app
+
+    response = TestClient(app).post(
+        "/api/sequences/generate-ai/stream",
+        json={"sport": "tennis", "purpose": "empty stream", "numShots": 4},
+        headers={"Cache-Control": "no-cache"}
+    )
+
+    assert response.status_code == 502
+    assert "before the first shot" in response.json()["detail"]
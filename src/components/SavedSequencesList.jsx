@@ -4,7 +4,9 @@ import { sequenceApi } from '../utils/api';
 
 const SavedSequencesList = ({ isOpen, onLoadSequence, onClose }) => {
   const [sequences, setSequences] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
   useEffect(() => {
@@ -19,8 +21,9 @@ const SavedSequencesList = ({ isOpen, onLoadSequence, onClose }) => {
     try {
       setIsLoading(true);
       setError('');
-      const data = await sequenceApi.getAllSequences();
-      setSequences(data);
+      const page = await sequenceApi.getSequences();
+      setSequences(page.sequences);
+      setNextCursor(page.nextCursor);
     } catch (err) {
       setError(err.message || 'Failed to load sequences');
     } finally {
@@ -28,6 +31,22 @@ const SavedSequencesList = ({ isOpen, onLoadSequence, onClose }) => {
     }
   };
 
+  // Later pages are only fetched when asked for, so opening the list stays
+  // cheap however large the library grows
+  const loadMoreSequences = async () => {
+    try {
+      setIsLoadingMore(true);
+      setError('');
+      const page = await sequenceApi.getSequences({ after: nextCursor });
+      setSequences((loaded) => [...loaded, ...page.sequences]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      setError(err.message || 'Failed to load sequences');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleLoadSequence = async (sequenceId) => {
     try {
       const sequence = await sequenceApi.getSequence(sequenceId);
@@ -45,7 +64,8 @@ const SavedSequencesList = ({ isOpen, onLoadSequence, onClose }) => {
 
     try {
       await sequenceApi.deleteSequence(sequenceId);
-      await loadSequences(); // Refresh the list
+      // Drop it locally rather than reloading, which would discard the pages loaded so far
+      setSequences((loaded) => loaded.filter((sequence) => sequence.id !== sequenceId));
     } catch (err) {
       setError(err.message || 'Failed to delete sequence');
     }
@@ -130,6 +150,16 @@ const SavedSequencesList = ({ isOpen, onLoadSequence, onClose }) => {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <Button
+                  variant="outline"
+                  onClick={loadMoreSequences}
+                  disabled={isLoadingMore}
+                  className="w-full"
+                >
+                  {isLoadingMore ? 'Loading...' : 'Load more'}
+                </Button>
+              )}
             </div>
           )}
         </div>
@@ -36,19 +36,34 @@ export const sequenceApi = {
   // Check if backend is available
   isBackendAvailable,
 
-  // Get all sequences (summary view)
-  async getAllSequences() {
+  // Get one page of sequences (summary view), newest first. Pass the returned
+  // nextCursor as `after` to fetch the next page; it is null after the last one
+  async getSequences({ after = null, limit = 50 } = {}) {
     if (!(await isBackendAvailable())) {
       throw new ApiError('Backend service is not available', 503);
     }
-    const response = await fetch(`${API_BASE_URL}/api/sequences`);
-    return handleResponse(response);
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (after) {
+      params.set('after', after);
+    }
+    const response = await fetch(`${API_BASE_URL}/api/sequences?${params}`);
+    const sequences = await handleResponse(response);
+    return { sequences, nextCursor: response.headers.get('X-Next-Cursor') };
   },
 
-  // Get specific sequence by ID
+  // Get specific sequence by ID, with every page of its shots
   async getSequence(id) {
     const response = await fetch(`${API_BASE_URL}/api/sequences/${id}`);
-    return handleResponse(response);
+    const sequence = await handleResponse(response);
+    let offset = sequence.nextShotsOffset;
+    while (offset !== null && offset !== undefined) {
+      const page = await handleResponse(
+        await fetch(`${API_BASE_URL}/api/sequences/${id}/shots?offset=${offset}&limit=1000`)
+      );
+      sequence.shots.push(...page.shots);
+      offset = page.nextOffset;
+    }
+    return sequence;
   },
 
   // Create new sequence